@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Hot-path benchmarks for krim, with a stored baseline and regression check.
+
+Usage:
+  python bench.py                  # run; compare against bench_baseline.json (saved on first run)
+  python bench.py --save           # run and overwrite the baseline
+  python bench.py --threshold 0.5  # fail if anything is >50% slower than baseline (default 0.3)
+  python bench.py -k compact       # only benchmarks whose name contains "compact"
+
+Each benchmark reports the median of several timed runs. Baselines are
+machine-specific: save one per machine/CI runner, don't compare across them.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# ensure krim package is importable
+sys.path.insert(0, os.path.dirname(__file__))
+
+BASELINE = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+
+BENCHES = []
+
+
+def bench(name, repeat=5, warmup=True):
+    """Register a setup fn that returns the callable to time; setup runs once, untimed."""
+    def wrap(fn):
+        BENCHES.append((name, fn, repeat, warmup))
+        return fn
+    return wrap
+
+
+# ============================================================
+# FIXTURES
+# ============================================================
+
+def conversation(n_messages=10_000):
+    """Claude-format history: tool_use/tool_result cycles with realistic payloads."""
+    msgs = [{"role": "system", "content": "system prompt " * 200}]
+    for i in range(n_messages // 2):
+        msgs.append({"role": "assistant", "content": [
+            {"type": "text", "text": f"step {i}: checking the thing"},
+            {"type": "tool_use", "id": f"t{i}", "name": "bash", "input": {"command": f"grep -rn foo{i} src/"}},
+        ]})
+        msgs.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": f"t{i}", "content": f"src/mod{i}.py:{i}: foo = {i}\n" * 20},
+        ]})
+    return msgs
+
+
+def big_file(td, n_lines=50_000):
+    path = os.path.join(td, "big.py")
+    with open(path, "w") as f:
+        for i in range(n_lines):
+            f.write(f"def function_{i}(arg_{i}):\n" if i % 10 == 0 else f"    value_{i} = compute({i}, arg)\n")
+    return path
+
+
+ECHO_SERVER = r'''
+import json, sys
+def send(msg):
+    data = json.dumps(msg).encode()
+    sys.stdout.buffer.write(b"Content-Length: %d\r\n\r\n" % len(data) + data)
+    sys.stdout.buffer.flush()
+while True:
+    length = 0
+    while True:
+        line = sys.stdin.buffer.readline()
+        if not line:
+            sys.exit(0)
+        if not line.strip():
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    msg = json.loads(sys.stdin.buffer.read(length))
+    if "id" not in msg:
+        continue
+    if msg["method"] == "tools/list":
+        result = {"tools": [{"name": "echo", "inputSchema": {"properties": {"text": {"type": "string"}}}}]}
+    elif msg["method"] == "tools/call":
+        result = {"content": [{"type": "text", "text": msg["params"]["arguments"]["text"]}]}
+    else:
+        result = {}
+    send({"jsonrpc": "2.0", "id": msg["id"], "result": result})
+'''
+
+
+# ============================================================
+# BENCHMARKS
+# ============================================================
+
+@bench("estimate_message_tokens: 10k messages")
+def b_estimate():
+    from krim.compaction import estimate_message_tokens
+    msgs = conversation()
+    return lambda: estimate_message_tokens(msgs)
+
+
+@bench("compact: 10k messages", repeat=3)
+def b_compact():
+    from krim.compaction import compact
+    msgs = conversation()
+    return lambda: compact(msgs)
+
+
+@bench("_fuzzy_find: 50k-line file", repeat=1, warmup=False)  # pure python, seconds per call
+def b_fuzzy():
+    from krim.tools.edit import _fuzzy_find
+    with tempfile.TemporaryDirectory() as td:
+        with open(big_file(td)) as f:
+            content = f.read()
+    old = "def function_25000(arg_25000):\n    value_25001 = compute(25001, arg)\n    valeu_25002 = compute(25002, arg)"
+    return lambda: _fuzzy_find(content, old)
+
+
+@bench("ReadTool: 50k-line file")
+def b_read():
+    from krim.tools.read import ReadTool
+    td = tempfile.mkdtemp()
+    path = big_file(td)
+    tool = ReadTool()
+    run = lambda: tool.run(path, offset=40_000, limit=2000)
+    run.cleanup = lambda: shutil.rmtree(td)
+    return run
+
+
+@bench("BashTool: spawn `true`", repeat=20)
+def b_bash():
+    from krim.tools.bash import BashTool
+    tool = BashTool()
+    tool.configure(deny_patterns=[], allow_commands=[], ask_by_default=False)
+    return lambda: tool.run("true")
+
+
+@bench("truncate: 10MB string", repeat=10)
+def b_truncate():
+    from krim.truncate import truncate
+    text = "x" * (10 * 1024 * 1024)
+    return lambda: truncate(text, 30_000)
+
+
+@bench("MCP round-trip: echo 1KB", repeat=50)
+def b_mcp():
+    from krim.mcp import McpServer, McpServerConfig
+    td = tempfile.mkdtemp()
+    script = os.path.join(td, "echo.py")
+    with open(script, "w") as f:
+        f.write(ECHO_SERVER)
+    server = McpServer(McpServerConfig(name="echo", command=[sys.executable, script]))
+    server.start()
+    payload = "y" * 1024
+    run = lambda: server.call_tool("echo", {"text": payload})
+
+    def cleanup():
+        server.stop()
+        shutil.rmtree(td)
+    run.cleanup = cleanup
+    return run
+
+
+@bench("render: 5k streamed deltas (plain)")
+def b_render():
+    from rich.console import Console
+    from krim.render import PlainRenderer
+    out = Console(file=open(os.devnull, "w"), force_terminal=True)
+    deltas = [f"token{i} " for i in range(5000)]
+
+    def run():
+        with PlainRenderer(out) as r:
+            for d in deltas:
+                r.write(d)
+    run.cleanup = out.file.close
+    return run
+
+
+@bench("Agent.run: 50 replayed tool turns", repeat=3)
+def b_agent():
+    import contextlib
+    import io
+    from krim.agent import Agent
+    from krim.models.replay import ReplayModel
+    from krim.tools.read import ReadTool
+    td = tempfile.mkdtemp()
+    path = big_file(td, n_lines=200)
+    fixture = os.path.join(td, "replay.jsonl")
+    with open(fixture, "w") as f:
+        for i in range(50):
+            call = {"id": f"t{i}", "name": "read", "args": {"path": path, "offset": i + 1, "limit": 100}}
+            f.write(json.dumps({"t": "response", "chunks": ["reading "] * 20, "tool_calls": [call]}) + "\n")
+        f.write(json.dumps({"t": "response", "chunks": ["done"]}) + "\n")
+
+    def run():
+        agent = Agent(ReplayModel(fixture, delay=0, latency=0), "claude", "sys", [ReadTool()], max_turns=60)
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.run("go")
+    run.cleanup = lambda: shutil.rmtree(td)
+    return run
+
+
+# ============================================================
+# RUNNER
+# ============================================================
+
+def measure(setup, repeat, warmup=True):
+    run = setup()
+    if warmup:
+        run()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+    cleanup = getattr(run, "cleanup", None)
+    if cleanup:
+        cleanup()
+    return statistics.median(times)
+
+
+def _fmt(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.0f}µs"
+
+
+def main():
+    p = argparse.ArgumentParser(description="krim hot-path benchmarks")
+    p.add_argument("--save", action="store_true", help="overwrite the baseline with this run")
+    p.add_argument("--threshold", type=float, default=0.3, help="allowed slowdown vs baseline (0.3 = 30%%)")
+    p.add_argument("--baseline", default=BASELINE)
+    p.add_argument("-k", default="", help="only run benchmarks whose name contains this")
+    args = p.parse_args()
+
+    baseline = {}
+    if os.path.isfile(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+
+    results = {}
+    regressions = []
+    for name, setup, repeat, warmup in BENCHES:
+        if args.k not in name:
+            continue
+        t = measure(setup, repeat, warmup)
+        results[name] = t
+        line = f"  {name:<40} {_fmt(t):>10}"
+        base = baseline.get(name)
+        if base:
+            ratio = t / base
+            line += f"   x{ratio:.2f} vs {_fmt(base)}"
+            if ratio > 1 + args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save or not baseline:
+        data = {
+            "machine": f"{platform.node()} {platform.machine()} py{platform.python_version()}",
+            "results": results,
+        }
+        if os.path.isfile(args.baseline) and not args.save:
+            with open(args.baseline) as f:
+                data["results"] = {**json.load(f).get("results", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"\nbaseline saved: {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for name in regressions:
+            print(f"  {name}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,12 @@ Usage:
   krim --provider claude --model claude-sonnet-4-5-20250929 "refactor this"
   krim --provider openai --model gpt-4o "add tests"
   krim --max-turns 20 "big refactor task"
+  krim --fast "big task, cheap follow-ups"   # easy turns -> provider's small model
+  krim --fast-model claude-haiku-4-5-20251001 "route easy turns"
   krim --skill deploy "ship it"
   krim --auto-commit "fix and commit"
+  krim --resume                # continue the last session
+  krim --subtask "port a/" --subtask "port b/"   # parallel, one git worktree each
   krim                         # interactive mode
 """
 
@@ -14,20 +18,36 @@ from __future__ import annotations
 
 import argparse
 import atexit
+import os
 import sys
+import threading
 
 from rich.console import Console
 
-from krim import __version__
+from krim import __version__, cancellation, profiling, tracing
+from krim.checkpoints import CheckpointStore, format_checkpoints
+from krim.cmdcache import CommandCache
 from krim.config import load_config, KrimConfig
-from krim.models import create_model, DEFAULT_MODELS
+from krim.models import create_model, DEFAULT_MODELS, FAST_MODELS
+from krim.models.replay import RecordingModel
+from krim.models.router import RouterModel
 from krim.agent import Agent
+from krim.session import Session, sessions_dir
+from krim.spill import ResultStore
 from krim.tools import create_tools, get_tool
 from krim.tools.bash import BashTool
+from krim.tools.glob import GlobTool
+from krim.tools.parallel import ParallelTool
+from krim.tools.test import TestTool
+from krim.tools.result import ResultTool
 from krim.mcp import load_mcp_config, start_mcp_servers
 from krim.skills import discover_skills, inject_skill
 from krim.prompt import build_system_prompt
-from krim.git import is_git_repo, commit_dirty, auto_commit, undo
+from krim.render import RENDER_MODES
+from krim.git import is_git_repo, commit_dirty, auto_commit, undo, repo_root
+from krim.testworker import TestWorker, WorkerError
+from krim.watch import MODES as WATCH_MODES, FileIndex, Watcher
+from krim.subtasks import SUBTASK_PROMPT, format_results, run_subtasks
 from krim.ui import print_banner, print_banner_oneliner, create_session, prompt_input
 
 console = Console()
@@ -46,19 +66,27 @@ def _handle_slash_command(cmd: str, agent: Agent, config: KrimConfig, verbose: b
             "  /compact   - force context compaction\n"
             "  /config    - show current config\n"
             "  /undo      - undo last krim commit\n"
+            "  /rewind N  - restore files to before checkpoint N (no N: list them)\n"
             "  /verbose   - toggle verbose mode\n"
-            "  exit       - quit interactive mode"
+            "  exit       - quit interactive mode\n"
+            "  ctrl-c     - cancel the running request (twice to quit)"
         )
     elif command == "/tokens":
         from krim.compaction import estimate_message_tokens
         tokens = estimate_message_tokens(agent.messages)
         console.print(f"[dim]messages: {len(agent.messages)} | ~{tokens:,} tokens[/]")
         console.print(f"[dim]total turns: {agent.total_turns} | total tool calls: {agent.total_tool_calls}[/]")
+        model = agent.model.inner if isinstance(agent.model, RecordingModel) else agent.model
+        if isinstance(model, RouterModel):
+            counts = model.counts
+            console.print(f"[dim]routing: strong {counts['strong']} | fast {counts['fast']}[/]")
     elif command == "/compact":
         agent.force_compact()
     elif command == "/config":
         console.print(f"[dim]provider: {config.provider}[/]")
         console.print(f"[dim]model: {config.model or 'default'}[/]")
+        if config.fast_model:
+            console.print(f"[dim]fast_model: {config.fast_model}[/]")
         console.print(f"[dim]max_turns: {config.max_turns}[/]")
         console.print(f"[dim]auto_commit: {config.auto_commit}[/]")
         console.print(f"[dim]safety: {'ask' if config.ask_by_default else 'off'}[/]")
@@ -70,6 +98,8 @@ def _handle_slash_command(cmd: str, agent: Agent, config: KrimConfig, verbose: b
             console.print(f"[dim]rules: {len(config.rules)} loaded[/]")
     elif command == "/undo":
         undo()
+    elif command == "/rewind":
+        _rewind(agent, parts[1].strip() if len(parts) > 1 else "")
     elif command == "/verbose":
         agent.verbose = not agent.verbose
         console.print(f"[dim]verbose: {'on' if agent.verbose else 'off'}[/]")
@@ -77,16 +107,52 @@ def _handle_slash_command(cmd: str, agent: Agent, config: KrimConfig, verbose: b
         console.print(f"[dim]unknown command: {command}. try /help[/]")
 
 
-def parse_args():
+def _rewind(agent: Agent, arg: str):
+    store = getattr(get_tool(agent.tools, "write"), "checkpoints", None)
+    if store is None:
+        console.print("[yellow]checkpoints are off[/]")
+        return
+    if not arg:
+        console.print(format_checkpoints(store.entries), markup=False, highlight=False)
+        return
+    try:
+        checkpoint_id = int(arg.lstrip("#"))
+    except ValueError:
+        console.print("[dim]usage: /rewind N[/]")
+        return
+    restored = store.rewind(checkpoint_id)
+    if not restored:
+        console.print(f"[yellow]no checkpoint #{checkpoint_id} or later[/]")
+        return
+    for r in restored:
+        note = " [yellow](changed outside krim since; overwritten)[/]" if r.changed_since else ""
+        console.print(f"[dim]rewind: {r.action} {r.path}[/]{note}")
+    # the model still remembers its edits: tell it what happened
+    agent.add_note(f"[files rewound to before checkpoint #{checkpoint_id}: "
+                   + ", ".join(f"{r.path} ({r.action})" for r in restored) + "]")
+
+
+def _warm(worker: TestWorker):
+    try:
+        worker.start()
+    except WorkerError as e:
+        console.print(f"[yellow]test worker: {e} (the test tool will retry)[/]")
+
+
+def parse_args(argv: list[str] | None = None):
     p = argparse.ArgumentParser(
         prog="krim",
         description="Thin CLI agent. Trust the model, keep the harness light.",
     )
     p.add_argument("prompt", nargs="?", help="task to perform (omit for interactive mode)")
-    p.add_argument("--provider", "-p", default=None, choices=["claude", "openai"],
-                   help="model provider (default: from config or claude)")
+    p.add_argument("--provider", "-p", default=None, choices=["claude", "openai", "replay"],
+                   help="model provider (default: from config or claude; replay plays back a --record fixture)")
     p.add_argument("--model", "-m", default=None,
                    help="model name (default: provider's default)")
+    p.add_argument("--fast", action="store_true",
+                   help="route easy turns (summaries, short tool follow-ups) to the provider's small model")
+    p.add_argument("--fast-model", default=None, metavar="MODEL",
+                   help="like --fast, with MODEL as the fast model")
     p.add_argument("--max-turns", "-t", type=int, default=None,
                    help="max agent turns (default: from config or 10)")
     p.add_argument("--skill", "-s", default=None,
@@ -99,14 +165,30 @@ def parse_args():
                    help="auto-commit after agent edits")
     p.add_argument("--no-safety", action="store_true",
                    help="disable bash safety prompts (auto-allow all)")
+    p.add_argument("--resume", "-r", nargs="?", const="", default=None, metavar="ID",
+                   help="resume a saved session (default: the most recent)")
+    p.add_argument("--subtask", action="append", default=None, metavar="TASK",
+                   help="run a subtask in its own git worktree; repeat to run several in parallel")
+    p.add_argument("--record", default=None, metavar="PATH",
+                   help="record model responses to a replay fixture")
+    p.add_argument("--profile", action="store_true",
+                   help="print a timing breakdown on exit")
+    p.add_argument("--profile-out", default=None, metavar="PATH",
+                   help="also write the spans to PATH: .json as a Chrome trace, .prof as cProfile stats (implies --profile)")
+    p.add_argument("--trace", default=None, metavar="DEST",
+                   help="export OTLP-JSON traces to a file or collector URL (overrides config)")
+    p.add_argument("--render", default=None, choices=RENDER_MODES,
+                   help="how streamed output is shown (default: from config or auto)")
     p.add_argument("--verbose", action="store_true",
                    help="show debug info (token counts, config details)")
     p.add_argument("--version", "-v", action="version", version=f"krim {__version__}")
-    return p.parse_args()
+    return p.parse_args(argv)
 
 
 def main():
     args = parse_args()
+    if args.profile or args.profile_out:
+        atexit.register(profiling.start(args.profile_out).finish)
 
     # load layered config
     config = load_config()
@@ -114,6 +196,12 @@ def main():
     # CLI flags override config
     provider = args.provider or config.provider
     model_name = args.model or config.model or DEFAULT_MODELS.get(provider, "gpt-4o")
+    fast_model = args.fast_model or ("" if args.fast else config.fast_model)
+    if fast_model == "":
+        fast_model = FAST_MODELS.get(provider)
+    if provider == "replay":
+        model_name = args.model  # the fixture; config.model names a real model
+        fast_model = None
     max_turns = args.max_turns if args.max_turns is not None else config.max_turns
     do_auto_commit = args.auto_commit if args.auto_commit is not None else config.auto_commit
 
@@ -121,6 +209,16 @@ def main():
     if args.no_safety:
         config.ask_by_default = False
 
+    # tracing: off unless there's somewhere to export to
+    trace_export = args.trace or config.tracing.get("export")
+    if trace_export:
+        tracing.start(
+            trace_export,
+            sample=float(config.tracing.get("sample", 1.0)),
+            service_name=config.tracing.get("service_name", "krim"),
+        )
+        atexit.register(tracing.stop)
+
     # list skills
     if args.list_skills:
         skills = discover_skills(config.global_dir, config.project_dir)
@@ -139,23 +237,104 @@ def main():
         print_banner_oneliner(provider, model_name, max_turns)
         if config.project_dir:
             console.print(f"[dim]config: {config.project_dir}[/]")
+    if fast_model and fast_model != model_name:
+        console.print(f"[dim]routing: easy turns -> {fast_model}[/]")
     if verbose:
         console.print(f"[dim]verbose: on | safety: {'ask' if config.ask_by_default else 'off'}[/]")
         console.print(f"[dim]deny_patterns: {len(config.deny_patterns)} | allow_commands: {len(config.allow_commands)}[/]")
 
+    # session log: resume an old one or start fresh
+    session = None
+    resumed = None
+    session_root = sessions_dir(config.project_dir, config.global_dir)
+    if args.resume is not None:
+        try:
+            session = Session.open(session_root, args.resume or None)
+        except FileNotFoundError as e:
+            console.print(f"[red]{e}[/]")
+            sys.exit(1)
+        resumed = session.load()
+        if resumed.provider and resumed.provider != provider:
+            console.print(f"[red]session {session.id} was recorded with provider '{resumed.provider}', not '{provider}'[/]")
+            sys.exit(1)
+    elif config.save_sessions:
+        try:
+            session = Session.create(session_root, provider, model_name)
+        except OSError as e:
+            console.print(f"[yellow]session: not saving ({e})[/]")
+    if session:
+        atexit.register(session.close)
+
     # create model
-    model = create_model(provider, model_name)
+    try:
+        model = create_model(provider, model_name, fast_model=fast_model, routing=config.routing)
+    except TypeError as e:
+        console.print(f"[red]invalid routing config: {e}[/]")
+        sys.exit(1)
+    except (ValueError, OSError) as e:
+        console.print(f"[red]{e}[/]")
+        sys.exit(1)
+    if args.record:
+        model = RecordingModel(model, args.record)
+        atexit.register(model.close)
+
+    # large outputs spill here (kept with the session, else removed at exit)
+    results_root = (config.project_dir or config.global_dir) / "results"
+    results = ResultStore(results_root / (session.id if session else f"pid-{os.getpid()}"))
+    if not session:
+        atexit.register(results.cleanup)
 
     # create tools and configure bash safety
+    command_cache = CommandCache(config.allow_commands) if config.command_cache else None
     tools = create_tools()
+    tools.append(ResultTool(results))
+    if config.checkpoints:
+        store = CheckpointStore((config.project_dir or config.global_dir) / "checkpoints")
+        for name in ("write", "edit"):
+            get_tool(tools, name).checkpoints = store
     bash_tool = get_tool(tools, "bash")
     if isinstance(bash_tool, BashTool):
-        bash_tool.configure(
-            deny_patterns=config.deny_patterns,
-            allow_commands=config.allow_commands,
-            ask_by_default=config.ask_by_default,
-            max_output_chars=config.max_output_chars,
+        try:
+            bash_tool.configure(
+                deny_patterns=config.deny_patterns,
+                allow_commands=config.allow_commands,
+                ask_by_default=config.ask_by_default,
+                max_output_chars=config.max_output_chars,
+                results=results,
+                limits=config.bash_limits,
+                cache=command_cache,
+            )
+        except (TypeError, ValueError) as e:
+            console.print(f"[red]invalid bash_limits config: {e}[/]")
+            sys.exit(1)
+
+    # working-tree watcher: caches hear about changes instead of re-checking
+    if config.watch != "off":
+        if config.watch not in WATCH_MODES:
+            console.print(f"[red]invalid watch mode '{config.watch}' (expected one of: {', '.join(WATCH_MODES)})[/]")
+            sys.exit(1)
+        watcher = Watcher(repo_root() or os.getcwd(), config.watch)
+        backend = watcher.start()
+        atexit.register(watcher.stop)
+        glob_tool = get_tool(tools, "glob")
+        if isinstance(glob_tool, GlobTool):
+            glob_tool.index = FileIndex(watcher)
+        if command_cache:
+            command_cache.watch(watcher)
+        if verbose:
+            console.print(f"[dim]watch: {backend} on {watcher.root}[/]")
+
+    # warm pytest worker: starts preloading now, in the background
+    test_worker = None
+    if config.test_worker.get("enabled"):
+        test_worker = TestWorker(
+            root=os.getcwd(),
+            python=config.test_worker.get("python"),
+            preload=config.test_worker.get("preload"),
         )
+        threading.Thread(target=_warm, args=(test_worker,), daemon=True).start()
+        atexit.register(test_worker.stop)
+        tools.append(TestTool(test_worker, bash_tool))
 
     # load MCP tools
     mcp_tools = []
@@ -163,7 +342,12 @@ def main():
     if not args.no_mcp:
         configs = load_mcp_config(config.global_dir, config.project_dir)
         if configs:
-            mcp_tools, mcp_servers = start_mcp_servers(configs)
+            mcp_tools, mcp_servers = start_mcp_servers(
+                configs,
+                cache_path=config.global_dir / "mcp-cache.json",
+                daemon_socket=config.global_dir / "mcpd.sock" if config.mcp_daemon else None,
+                results=results,
+            )
             if mcp_tools:
                 console.print(f"[dim]mcp: {len(mcp_tools)} tool(s) loaded[/]")
 
@@ -182,11 +366,66 @@ def main():
         console.print(f"[dim]skill: {args.skill} active[/]")
 
     # build system prompt
-    extra_tool_names = [t.name for t in mcp_tools]
+    extra_tool_names = [t.name for t in mcp_tools] + (["test"] if test_worker else [])
     system_prompt = build_system_prompt(config, extra_tool_names)
     for skill in active_skills:
         system_prompt = inject_skill(system_prompt, skill)
 
+    # parallel subtasks: each gets a fresh model and tools rooted in its worktree
+    def make_subagent(root: str, origin: str, out: Console) -> Agent:
+        sub_tools = create_tools()
+        for t in sub_tools:
+            t.root, t.origin = root, origin
+        sub_tools.append(ResultTool(results))
+        sub_bash = get_tool(sub_tools, "bash")
+        if isinstance(sub_bash, BashTool):
+            sub_bash.configure(
+                deny_patterns=config.deny_patterns,
+                allow_commands=config.allow_commands,
+                ask_by_default=config.ask_by_default,
+                max_output_chars=config.max_output_chars,
+                cwd=root,
+                results=results,
+                limits=config.bash_limits,
+                cache=command_cache,
+            )
+            if test_worker:
+                sub_tools.append(TestTool(test_worker, sub_bash))
+        return Agent(
+            model=create_model(provider, model_name, fast_model=fast_model, routing=config.routing),
+            provider=provider,
+            system_prompt=system_prompt + "\n\n" + SUBTASK_PROMPT.format(root=root),
+            tools=sub_tools,
+            mcp_tools=mcp_tools,
+            max_turns=max_turns,
+            verbose=verbose,
+            render="off",
+            out=out,
+        )
+
+    subtask_logs = (config.project_dir or config.global_dir) / "subtasks"
+    in_repo = is_git_repo()
+    if in_repo and config.max_parallel > 0:
+        tools.append(ParallelTool(
+            lambda tasks: format_results(
+                run_subtasks(tasks, make_subagent, subtask_logs, config.max_parallel, auto_commit=do_auto_commit))
+        ))
+
+    if args.subtask:
+        if not in_repo:
+            console.print("[red]--subtask needs a git repository[/]")
+            sys.exit(1)
+        token = cancellation.CancelToken()
+        try:
+            with cancellation.scope(token), cancellation.on_sigint(token):
+                subtask_results = run_subtasks(args.subtask, make_subagent, subtask_logs,
+                                               max(1, config.max_parallel), auto_commit=do_auto_commit)
+        except RuntimeError as e:
+            console.print(f"[red]--subtask: {e}[/]")
+            sys.exit(1)
+        console.print(format_results(subtask_results), markup=False)
+        return
+
     # create agent
     agent = Agent(
         model=model,
@@ -196,7 +435,14 @@ def main():
         mcp_tools=mcp_tools,
         max_turns=max_turns,
         verbose=verbose,
+        session=session,
+        render=args.render or config.render,
     )
+    if resumed:
+        agent.restore(resumed)
+        console.print(f"[dim]resumed session {session.id}: {len(resumed.messages)} messages, ~{resumed.tokens:,} tokens[/]")
+    elif session and is_interactive:
+        console.print(f"[dim]session: {session.id}[/]")
 
     # git: protect uncommitted changes
     if do_auto_commit and is_git_repo():
@@ -230,7 +476,10 @@ def main():
             _handle_slash_command(stripped, agent, config, verbose)
             continue
 
-        agent.run(user_input)
+        # ctrl-c cancels this request, not the session
+        token = cancellation.CancelToken()
+        with cancellation.on_sigint(token):
+            agent.run(user_input, cancel=token)
 
         if do_auto_commit and is_git_repo():
             auto_commit(f"krim: {stripped[:60]}")
@@ -0,0 +1,244 @@
+"""Warm pytest worker. Runs in the project's Python (via -c); must not import krim.
+
+argv: ROOT PRELOAD_JSON
+
+Startup: import pytest and the PRELOAD modules, then run one collect-only
+pass in a forked child to learn what the test suite imports, and import the
+modules that aren't project code (third-party and stdlib - the slow part,
+and not something the agent edits). A virtualenv inside ROOT (.venv, or
+wherever sys.prefix / site-packages are) is not project code. Project
+modules are never kept: every run forks a fresh child that imports them
+from disk. PRELOAD modules are kept whatever their path.
+
+Protocol, one JSON object per line:
+  <- {"ready": true, "modules": N, "seconds": S}
+  -> {"args": [...], "cwd": "...", "result": "/path.json", "log": "/path.log"}
+  <- {"exit": CODE} | {"stale": "path"} (a preloaded module changed: restart me)
+The child writes its summary to `result` and its pytest output to `log`.
+"""
+
+import importlib
+import json
+import os
+import site
+import sys
+import sysconfig
+import time
+
+ROOT = os.path.realpath(sys.argv[1])
+PRELOAD = json.loads(sys.argv[2]) if len(sys.argv) > 2 else []
+_real = {}
+ENV_DIRS = {".venv", "venv", ".tox", ".nox", "site-packages", "dist-packages", "__pypackages__"}
+
+
+def _realpath(path):
+    if path not in _real:
+        _real[path] = os.path.realpath(path)
+    return _real[path]
+
+
+def _env_roots():
+    """Interpreter/site-packages directories that sit inside ROOT (a project-local virtualenv)."""
+    paths = {sys.prefix, sys.exec_prefix, sys.base_prefix}
+    paths.update(p for p in sysconfig.get_paths().values() if p)
+    try:
+        paths.update(site.getsitepackages())
+        paths.add(site.getusersitepackages())
+    except AttributeError:  # old virtualenv's site.py
+        pass
+    real = {os.path.realpath(p) for p in paths}
+    return [p for p in real if p.startswith(ROOT + os.sep)]
+
+
+ENVS = _env_roots()
+
+
+def _in_root(path):
+    """Is this the project's own code (re-imported every run), as opposed to a dependency?"""
+    p = _realpath(path)
+    if not (p == ROOT or p.startswith(ROOT + os.sep)):
+        return False
+    if any(p.startswith(env + os.sep) for env in ENVS):
+        return False
+    return not ENV_DIRS.intersection(p[len(ROOT) + 1:].split(os.sep))
+
+
+def _explicit(name):
+    return any(name == p or name.startswith(p + ".") for p in PRELOAD)
+
+
+def _module_file(mod):
+    path = getattr(mod, "__file__", None)
+    return path if isinstance(path, str) else None
+
+
+def _quiet():
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+
+def _discover():
+    """Module names a collect-only run imports that aren't project code (found in a throwaway child)."""
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        _quiet()
+        names = []
+        try:
+            import pytest
+            os.chdir(ROOT)
+            sys.path.insert(0, ROOT)
+            pytest.main(["--collect-only", "-q", "-p", "no:cacheprovider"])
+            for name, mod in list(sys.modules.items()):
+                path = _module_file(mod)
+                if path and not _in_root(path):
+                    names.append(name)
+        except BaseException:
+            pass
+        os.write(w, json.dumps(names).encode())
+        os._exit(0)
+    os.close(w)
+    chunks = []
+    while True:
+        chunk = os.read(r, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(r)
+    os.waitpid(pid, 0)
+    try:
+        return json.loads(b"".join(chunks) or b"[]")
+    except ValueError:
+        return []
+
+
+def _preload():
+    import pytest  # noqa: F401
+    for name in PRELOAD + _discover():
+        if name in sys.modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except BaseException:
+            pass
+    # anything from the project that slipped in (imported by a dependency) must be re-imported fresh
+    for name, mod in list(sys.modules.items()):
+        path = _module_file(mod)
+        if path and _in_root(path) and not _explicit(name):
+            del sys.modules[name]
+
+
+def _snapshot():
+    mtimes = {}
+    for mod in list(sys.modules.values()):
+        path = _module_file(mod)
+        if path:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                pass
+    return mtimes
+
+
+def _changed(mtimes):
+    for path, mtime in mtimes.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return path
+        except OSError:
+            return path
+    return None
+
+
+class _Collector:
+    """pytest plugin: counts outcomes and keeps failure reports."""
+
+    def __init__(self):
+        self.counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0, "xfailed": 0, "xpassed": 0}
+        self.failures = []
+
+    def _fail(self, nodeid, when, report):
+        text = getattr(report, "longreprtext", "") or str(report.longrepr or "")
+        self.failures.append({"nodeid": nodeid, "when": when, "message": text[-4000:]})
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.counts["errors"] += 1
+            self._fail(report.nodeid or "(collection)", "collect", report)
+
+    def pytest_runtest_logreport(self, report):
+        xfail = hasattr(report, "wasxfail")
+        if report.when == "call":
+            if report.passed:
+                self.counts["xpassed" if xfail else "passed"] += 1
+            elif report.skipped:
+                self.counts["xfailed" if xfail else "skipped"] += 1
+            else:
+                self.counts["failed"] += 1
+                self._fail(report.nodeid, "call", report)
+        elif report.skipped:
+            self.counts["skipped"] += 1
+        elif report.failed:
+            self.counts["errors"] += 1
+            self._fail(report.nodeid, report.when, report)
+
+
+def _run(req):
+    """Fork a child for one pytest run; returns its exit code."""
+    pid = os.fork()
+    if pid == 0:
+        log = os.open(req["log"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(log, 1)
+        os.dup2(log, 2)
+        code = 3
+        summary = {}
+        try:
+            import pytest
+            os.chdir(req["cwd"])
+            sys.path.insert(0, req["cwd"])
+            collector = _Collector()
+            start = time.perf_counter()
+            code = int(pytest.main(list(req["args"]), plugins=[collector]))
+            summary = {"counts": collector.counts, "failures": collector.failures,
+                       "seconds": round(time.perf_counter() - start, 3)}
+        except BaseException as e:
+            summary = {"counts": {}, "failures": [], "crash": f"{type(e).__name__}: {e}"}
+        summary["exit"] = code
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        with open(req["result"], "w") as f:
+            json.dump(summary, f)
+        os._exit(0)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+def main():
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    _preload()
+    sys.path.remove(ROOT)
+    mtimes = _snapshot()
+    out = sys.stdout
+    out.write(json.dumps({"ready": True, "modules": len(sys.modules),
+                          "seconds": round(time.perf_counter() - start, 3)}) + "\n")
+    out.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        stale = _changed(mtimes)
+        if stale:
+            out.write(json.dumps({"stale": stale}) + "\n")
+            out.flush()
+            return
+        out.write(json.dumps({"exit": _run(req)}) + "\n")
+        out.flush()
+
+
+main()
@@ -7,12 +7,20 @@ Features:
 - Context compaction when approaching token limits
 - Max turns enforcement with graceful degradation
 - Per-run stats tracking (turns, tool calls, token estimates)
+- Optional session log (append-only transcript, resumable)
+- Optional tracing (one trace per run; spans per turn, model call and tool)
+- Cooperative cancellation (the transcript is closed so the next request continues)
 """
 
 from __future__ import annotations
 
+import itertools
 import json
-from dataclasses import dataclass, field
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable
 
 from rich.console import Console
 from rich.panel import Panel
@@ -21,10 +29,16 @@ from krim.models.base import Model, ModelResponse, ToolCall
 from krim.tools import get_tool, tool_schemas
 from krim.tools.base import Tool
 from krim.compaction import needs_compaction, compact, estimate_message_tokens
+from krim import cancellation, tracing
+from krim.profiling import span, traced
+from krim.render import create_renderer
 from krim.retry import with_retry
+from krim.session import Session, SessionState
 
 console = Console()
 
+_EXIT_CODE = re.compile(r"\[exit code: (-?\d+)\]")
+
 
 @dataclass
 class RunStats:
@@ -32,6 +46,7 @@ class RunStats:
     turns: int = 0
     tool_calls: int = 0
     compactions: int = 0
+    cancelled: bool = False
     tool_call_names: dict[str, int] = field(default_factory=dict)
 
     def record_tool_call(self, name: str):
@@ -79,6 +94,15 @@ def _build_assistant_msg_openai(response: ModelResponse) -> dict:
     return msg
 
 
+def _has_tool_calls(msg: dict) -> bool:
+    if msg.get("tool_calls"):
+        return True
+    content = msg.get("content")
+    return isinstance(content, list) and any(
+        isinstance(b, dict) and b.get("type") == "tool_use" for b in content
+    )
+
+
 def _build_tool_result_openai(tool_call_id: str, name: str, result: str) -> dict:
     return {
         "role": "tool",
@@ -98,13 +122,19 @@ class Agent:
         mcp_tools: list[Tool] | None = None,
         max_turns: int = 10,
         verbose: bool = False,
+        session: Session | None = None,
+        render: str = "auto",
+        out: Console | None = None,
     ):
         self.model = model
         self.provider = provider
         self.max_turns = max_turns
         self.tools = tools
-        self.mcp_tools = mcp_tools or []
+        self.mcp_tools = mcp_tools if mcp_tools is not None else []  # shared: MCP refreshes update it in place
         self.verbose = verbose
+        self.session = session
+        self.render = render
+        self.console = out or console  # subtasks log to their own file
         self.messages: list[dict] = [{"role": "system", "content": system_prompt}]
 
         # doom loop detection: track recent tool calls
@@ -115,6 +145,45 @@ class Agent:
         self.total_turns: int = 0
         self.total_tool_calls: int = 0
 
+    # -- history --
+
+    def _append(self, message: dict):
+        self.messages.append(message)
+        if self.session:
+            self.session.append(message)
+
+    def add_note(self, text: str):
+        """Tell the model about something that happened outside a run (e.g. /rewind), keeping roles alternating."""
+        self._append({"role": "user", "content": text})
+        self._append({"role": "assistant", "content": "[noted]"})
+
+    def _replace_history(self, messages: list[dict]):
+        self.messages = messages
+        if self.session:
+            self.session.reset(messages)
+
+    def _sync(self):
+        if self.session:
+            with span("session.sync"):
+                self.session.sync()
+
+    def restore(self, state: SessionState):
+        """Load a persisted session on top of the current system prompt."""
+        messages = list(state.messages)
+        # a crash between tool_use and tool_result leaves a dangling call the API rejects
+        while messages and _has_tool_calls(messages[-1]):
+            messages.pop()
+        if len(messages) != len(state.messages):
+            # persist the cut, or the next resume loads the dangling call back mid-history
+            self._replace_history(self.messages[:1] + messages)
+            self._sync()
+        else:
+            self.messages = self.messages[:1] + messages
+        self.total_turns = state.total_turns
+        self.total_tool_calls = state.total_tool_calls
+        if state.last_stats:
+            self.last_stats = RunStats(**state.last_stats)
+
     # -- tool management --
 
     def _all_tool_schemas(self) -> list[dict]:
@@ -125,6 +194,17 @@ class Agent:
 
     def _execute_tool(self, name: str, args: dict) -> str:
         """Execute a tool with error boundary."""
+        with span(f"tool.{name}"), tracing.span(f"tool.{name}", {"krim.tool.name": name}) as ts:
+            result = self._run_tool(name, args)
+            if ts.recording:
+                ts.set("krim.tool.output_chars", len(result))
+                ts.set("krim.tool.error", result.startswith("error:"))
+                exit_code = _EXIT_CODE.search(result[-200:])
+                if exit_code:
+                    ts.set("process.exit.code", int(exit_code.group(1)))
+            return result
+
+    def _run_tool(self, name: str, args: dict) -> str:
         # check mcp tools first
         for mt in self.mcp_tools:
             if mt.name == name:
@@ -141,6 +221,29 @@ class Agent:
         except Exception as e:
             return f"error: tool '{name}' raised: {e}"
 
+    def _start_mcp_run(self, tool_calls: list[ToolCall]) -> dict[str, Future]:
+        """Start the consecutive MCP calls at the head of tool_calls concurrently (they never prompt).
+
+        Only a run of adjacent MCP calls is overlapped: a call after a native tool
+        may depend on it (write foo.py, then lint foo.py). Futures by call id.
+        """
+        mcp_names = {mt.name for mt in self.mcp_tools}
+        calls = list(itertools.takewhile(lambda tc: tc.name in mcp_names, tool_calls))
+        if len(calls) < 2:
+            return {}
+        parent = tracing.current()
+        token = cancellation.current()
+
+        def execute(tc: ToolCall) -> str:
+            with tracing.attach(parent), cancellation.scope(token):
+                return self._execute_tool(tc.name, tc.args)
+
+        pool = ThreadPoolExecutor(max_workers=min(len(calls), 8))
+        try:
+            return {tc.id: pool.submit(execute, tc) for tc in calls}
+        finally:
+            pool.shutdown(wait=False)  # the caller collects results in order
+
     # -- doom loop detection --
 
     def _check_doom_loop(self, tool_calls: list[ToolCall]) -> bool:
@@ -174,98 +277,169 @@ class Agent:
             summary += f"  {path}"
         else:
             summary += f"  {json.dumps(args, ensure_ascii=False)[:80]}"
-        console.print(summary)
+        self.console.print(summary)
 
     def _print_tool_result(self, result: str):
         lines = result.splitlines()
         preview = "\n".join(lines[:20])
         if len(lines) > 20:
             preview += f"\n[dim]... ({len(lines) - 20} more lines)[/]"
-        console.print(Panel(preview, border_style="dim", expand=False, padding=(0, 1)))
+        self.console.print(Panel(preview, border_style="dim", expand=False, padding=(0, 1)))
 
     # -- core loop --
 
-    def run(self, user_input: str) -> RunStats:
-        """Execute a single user request through the agent loop."""
-        self.messages.append({"role": "user", "content": user_input})
+    @traced("agent.run")
+    def run(self, user_input: str, cancel: cancellation.CancelToken | None = None) -> RunStats:
+        """Execute a single user request through the agent loop. cancel.cancel() stops it early."""
+        attrs = {"krim.provider": self.provider, "gen_ai.request.model": getattr(self.model, "model", None)}
+        with cancellation.scope(cancel or cancellation.CancelToken()), tracing.span("agent.run", attrs) as ts:
+            stats = self._run(user_input)
+            ts.set("krim.turns", stats.turns)
+            ts.set("krim.tool_calls", stats.tool_calls)
+            ts.set("krim.compactions", stats.compactions)
+            ts.set("krim.cancelled", stats.cancelled)
+            return stats
+
+    def _traced_chat(self, chat: Callable[..., ModelResponse]) -> Callable[..., ModelResponse]:
+        """Wrap chat in a model.chat span with token and latency attributes."""
+        def call(messages: list[dict], tools: list[dict], stream_callback=None) -> ModelResponse:
+            with tracing.span("model.chat", kind=tracing.KIND_CLIENT) as ts:
+                if not ts.recording:
+                    return chat(messages=messages, tools=tools, stream_callback=stream_callback)
+                ts.set("gen_ai.request.model", getattr(self.model, "model", None))
+                ts.set("krim.messages", len(messages))
+                ts.set("krim.tools", len(tools))
+                start = time.perf_counter()
+                callback = stream_callback
+                if stream_callback:
+                    def callback(text: str):
+                        if "krim.time_to_first_token_ms" not in ts.attrs:
+                            ts.set("krim.time_to_first_token_ms", round((time.perf_counter() - start) * 1000, 1))
+                        stream_callback(text)
+                response = chat(messages=messages, tools=tools, stream_callback=callback)
+                if response.usage:
+                    ts.set("gen_ai.usage.input_tokens", response.usage.get("input_tokens"))
+                    ts.set("gen_ai.usage.output_tokens", response.usage.get("output_tokens"))
+                else:
+                    ts.set("krim.estimated_input_tokens", estimate_message_tokens(messages))
+                ts.set("krim.output_chars", len(response.text or ""))
+                ts.set("krim.tool_call_count", len(response.tool_calls))
+                return response
+        return call
+
+    def _chat_streamed(self, chat: Callable[..., ModelResponse], messages: list[dict],
+                       tools: list[dict]) -> ModelResponse:
+        """One model call with its output streamed through a fresh renderer."""
+        parts: list[str] = []
+        with create_renderer(self.render, self.console) as renderer:
+            def write(text: str):
+                parts.append(text)
+                renderer.write(text)
+            try:
+                return chat(messages=messages, tools=tools, stream_callback=write)
+            except cancellation.Cancelled as e:
+                e.partial = "".join(parts)  # everything shown so far, across retries
+                raise
+
+    def _close_cancelled(self, stats: RunStats, partial: str = ""):
+        """End a cancelled run with an assistant message, so the next request continues cleanly."""
+        stats.cancelled = True
+        note = "[cancelled by user]"
+        self._append({"role": "assistant", "content": f"{partial.rstrip()}\n\n{note}" if partial.strip() else note})
+        self._sync()
+        self.console.print("\n[yellow]cancelled[/]")
+
+    def _run(self, user_input: str) -> RunStats:
+        self._append({"role": "user", "content": user_input})
         self._recent_calls.clear()
         stats = RunStats()
+        token = cancellation.current()
 
         # cache tool schemas (deterministic order for prompt cache)
         cached_schemas = self._all_tool_schemas()
 
         # wrap model.chat with retry
-        chat_with_retry = with_retry(self.model.chat)
+        chat_with_retry = traced("model.chat")(self._traced_chat(with_retry(self.model.chat)))
 
         turn = 0
+        turn_span = None
         while turn < self.max_turns:
             turn += 1
             stats.turns = turn
+            if turn_span:
+                turn_span.end()
+            turn_span = tracing.span("agent.turn", {"krim.turn": turn})
 
             if self.verbose:
                 tokens = estimate_message_tokens(self.messages)
-                console.print(f"\n[dim]--- turn {turn}/{self.max_turns}  ~{tokens:,} tokens ---[/]")
+                self.console.print(f"\n[dim]--- turn {turn}/{self.max_turns}  ~{tokens:,} tokens ---[/]")
             else:
-                console.print(f"\n[dim]--- turn {turn}/{self.max_turns} ---[/]")
+                self.console.print(f"\n[dim]--- turn {turn}/{self.max_turns} ---[/]")
 
             # check for compaction
             if needs_compaction(self.messages):
-                console.print("[dim]compacting conversation...[/]")
-                self.messages = compact(self.messages)
+                self.console.print("[dim]compacting conversation...[/]")
+                with span("compact"):
+                    self._replace_history(compact(self.messages))
                 stats.compactions += 1
 
-            # stream callback
-            def stream_cb(text: str):
-                console.print(text, end="", highlight=False)
-
             # call model with retry
             try:
-                response = chat_with_retry(
-                    messages=self.messages,
-                    tools=cached_schemas,
-                    stream_callback=stream_cb,
-                )
+                response = self._chat_streamed(chat_with_retry, self.messages, cached_schemas)
+            except cancellation.Cancelled as e:
+                self._close_cancelled(stats, e.partial)
+                break
             except Exception as e:
-                console.print(f"\n[red]model error: {e}[/]")
+                self.console.print(f"\n[red]model error: {e}[/]")
                 break
 
             if response.text:
-                console.print()
+                self.console.print()
+
+            # cancelled after the response was complete: keep the text, drop the tool calls
+            if token.cancelled:
+                self._close_cancelled(stats, response.text or "")
+                break
 
             # no tool calls -> model is done
             if not response.tool_calls:
                 if response.text:
-                    self.messages.append({"role": "assistant", "content": response.text})
+                    self._append({"role": "assistant", "content": response.text})
                 break
 
             # doom loop detection
             if self._check_doom_loop(response.tool_calls):
-                console.print("[yellow]doom loop detected, forcing stop[/]")
-                self.messages.append({"role": "user", "content": MAX_STEPS_PROMPT})
+                self.console.print("[yellow]doom loop detected, forcing stop[/]")
+                self._append({"role": "user", "content": MAX_STEPS_PROMPT})
                 try:
-                    final = chat_with_retry(
-                        messages=self.messages,
-                        tools=[],  # no tools, force text response
-                        stream_callback=stream_cb,
-                    )
+                    # no tools, force text response
+                    final = self._chat_streamed(chat_with_retry, self.messages, [])
                     if final.text:
-                        console.print()
-                        self.messages.append({"role": "assistant", "content": final.text})
+                        self.console.print()
+                        self._append({"role": "assistant", "content": final.text})
                 except Exception:
                     pass
                 break
 
             # add assistant message with tool calls
             if self.provider == "claude":
-                self.messages.append(_build_assistant_msg_claude(response))
+                self._append(_build_assistant_msg_claude(response))
             else:
-                self.messages.append(_build_assistant_msg_openai(response))
+                self._append(_build_assistant_msg_openai(response))
 
             # execute each tool call
             tool_results = []
-            for tc in response.tool_calls:
+            pending: dict[str, Future] = {}
+            for i, tc in enumerate(response.tool_calls):
+                if tc.id not in pending and not token.cancelled:
+                    pending.update(self._start_mcp_run(response.tool_calls[i:]))
+                fut = pending.get(tc.id)
+                if token.cancelled and not fut:
+                    # never started, but every tool call needs a result
+                    tool_results.append((tc, cancellation.CANCELLED_RESULT))
+                    continue
                 self._print_tool_call(tc.name, tc.args)
-                result = self._execute_tool(tc.name, tc.args)
+                result = fut.result() if fut else self._execute_tool(tc.name, tc.args)
                 self._print_tool_result(result)
                 tool_results.append((tc, result))
                 stats.record_tool_call(tc.name)
@@ -279,33 +453,40 @@ class Agent:
                         "tool_use_id": tc.id,
                         "content": result,
                     })
-                self.messages.append({"role": "user", "content": content})
+                self._append({"role": "user", "content": content})
             else:
                 for tc, result in tool_results:
-                    self.messages.append(_build_tool_result_openai(tc.id, tc.name, result))
+                    self._append(_build_tool_result_openai(tc.id, tc.name, result))
+            self._sync()
+            if token.cancelled:
+                self._close_cancelled(stats)
+                break
 
         else:
             # while-else: loop condition became false (not break) = all turns used with tool calls still pending
-            console.print(f"\n[yellow]reached max turns ({self.max_turns})[/]")
+            self.console.print(f"\n[yellow]reached max turns ({self.max_turns})[/]")
             # inject max_steps prompt for graceful summary
-            self.messages.append({"role": "user", "content": MAX_STEPS_PROMPT})
+            self._append({"role": "user", "content": MAX_STEPS_PROMPT})
             try:
-                final = chat_with_retry(
-                    messages=self.messages,
-                    tools=[],
-                    stream_callback=lambda t: console.print(t, end="", highlight=False),
-                )
+                final = self._chat_streamed(chat_with_retry, self.messages, [])
                 if final.text:
-                    console.print()
-                    self.messages.append({"role": "assistant", "content": final.text})
+                    self.console.print()
+                    self._append({"role": "assistant", "content": final.text})
             except Exception:
                 pass
+        if turn_span:
+            turn_span.end()
 
         # print run stats
         self._print_stats(stats)
         self.last_stats = stats
         self.total_turns += stats.turns
         self.total_tool_calls += stats.tool_calls
+        if self.session:
+            self.session.record_stats(
+                asdict(stats), self.total_turns, self.total_tool_calls, self.token_count(),
+            )
+            self._sync()
         return stats
 
     def _print_stats(self, stats: RunStats):
@@ -315,9 +496,11 @@ class Agent:
             parts.append(f"tool calls: {stats.tool_calls} ({tools_summary})")
         if stats.compactions:
             parts.append(f"compactions: {stats.compactions}")
+        if stats.cancelled:
+            parts.append("cancelled")
         tokens = estimate_message_tokens(self.messages)
         parts.append(f"~{tokens:,} tokens")
-        console.print(f"\n[dim]{' | '.join(parts)}[/]")
+        self.console.print(f"\n[dim]{' | '.join(parts)}[/]")
 
     def token_count(self) -> int:
         return estimate_message_tokens(self.messages)
@@ -325,6 +508,6 @@ class Agent:
     def force_compact(self):
         """Manually trigger compaction."""
         before = estimate_message_tokens(self.messages)
-        self.messages = compact(self.messages)
+        self._replace_history(compact(self.messages))
         after = estimate_message_tokens(self.messages)
-        console.print(f"[dim]compacted: ~{before:,} → ~{after:,} tokens[/]")
+        self.console.print(f"[dim]compacted: ~{before:,} → ~{after:,} tokens[/]")
@@ -0,0 +1,122 @@
+"""Cooperative cancellation - stop the in-flight model call or tool, keep the session.
+
+Agent.run activates a CancelToken for its thread (scope()); the long-running
+pieces look it up with current() and stop early when it fires:
+- model providers close the HTTP stream and raise Cancelled
+- bash kills the command's process group
+- MCP stops waiting and sends notifications/cancelled to the server
+- retry backoff wakes up instead of sleeping out the delay
+
+The agent then closes the transcript (partial text, error results for the
+tool calls it didn't finish) so the next prompt continues from there. In
+interactive mode the first Ctrl-C cancels the run, the second one quits.
+"""
+
+from __future__ import annotations
+
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+from rich.console import Console
+
+console = Console()
+
+CANCELLED_RESULT = "error: cancelled by user"
+
+
+class Cancelled(Exception):
+    """Raised out of a model call or wait that was cancelled."""
+
+    def __init__(self, partial: str = ""):
+        super().__init__("cancelled by user")
+        self.partial = partial  # text streamed before the cancel
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass  # best effort: the waiter also sees .cancelled
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Sleep up to timeout; True if cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def on_cancel(self, fn: Callable[[], None]):
+        """Run fn (once, on the cancelling thread) if the token fires inside the block."""
+        with self._lock:
+            fire = self._event.is_set()
+            if not fire:
+                self._callbacks.append(fn)
+        if fire:
+            fn()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if fn in self._callbacks:
+                    self._callbacks.remove(fn)
+
+
+_NEVER = CancelToken()  # returned when nothing is active; never cancelled
+_local = threading.local()
+
+
+def current() -> CancelToken:
+    """The token active on this thread (an inert one outside any run)."""
+    return getattr(_local, "token", None) or _NEVER
+
+
+@contextmanager
+def scope(token: CancelToken):
+    """Make token the active one on this thread (also used to carry it into pool threads)."""
+    previous = getattr(_local, "token", None)
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+@contextmanager
+def on_sigint(token: CancelToken):
+    """First Ctrl-C cancels token, a second one raises KeyboardInterrupt. Main thread only."""
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        if token.cancelled:
+            raise KeyboardInterrupt
+        console.print("\n[yellow]cancelling... (ctrl-c again to quit)[/]")
+        # callbacks take locks and write to pipes: not safe to run inside the handler
+        threading.Thread(target=token.cancel, name="krim-cancel", daemon=True).start()
+
+    previous = signal.signal(signal.SIGINT, handler)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
@@ -0,0 +1,182 @@
+"""Checkpoints - per-tool-call file snapshots for /rewind, no git needed.
+
+Before `write` or `edit` touches a file, its current bytes are stored
+content-addressed (sha256, zlib-compressed) under
+<.krim or ~/.krim>/checkpoints/objects/, so a file edited twenty times with
+the same starting content is stored once. One line per tool call goes to
+log.jsonl: id, tool, path, hash before (null if the file didn't exist) and
+hash after.
+
+`/rewind N` restores every file touched by checkpoint N or later to its
+state before the earliest of those calls, and deletes files they created.
+It costs one read+write per file touched, however big the repo. Files
+changed outside krim since their last checkpoint are restored anyway and
+reported. The log keeps the last MAX_CHECKPOINTS entries; objects nothing
+refers to any more are removed when it is pruned.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from krim import cmdcache
+from krim.session import private_dir
+
+MAX_CHECKPOINTS = 1000
+
+
+@dataclass
+class Checkpoint:
+    id: int
+    tool: str
+    path: str
+    before: str | None  # object hash; None = the file did not exist
+    after: str
+    time: float
+
+
+@dataclass
+class Restored:
+    path: str
+    action: str  # restored | deleted
+    changed_since: bool  # modified outside krim after its last checkpoint
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+
+
+class CheckpointStore:
+    def __init__(self, directory: Path, max_checkpoints: int = MAX_CHECKPOINTS):
+        self.directory = private_dir(directory)
+        self.objects = self.directory / "objects"
+        self.log_path = self.directory / "log.jsonl"
+        self.max_checkpoints = max_checkpoints
+        self._lock = threading.Lock()
+        self.entries = self._load()
+        if len(self.entries) > max_checkpoints:
+            self._prune()
+
+    def _load(self) -> list[Checkpoint]:
+        entries = []
+        try:
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        entries.append(Checkpoint(**json.loads(line)))
+                    except (ValueError, TypeError):
+                        continue  # a torn last line from a crash
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _put(self, data: bytes) -> str:
+        digest = _hash(data)
+        path = self.objects / digest[:2] / digest[2:]
+        if not path.exists():  # dedupe
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            tmp.write_bytes(zlib.compress(data))
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return zlib.decompress((self.objects / digest[:2] / digest[2:]).read_bytes())
+
+    def record(self, path: str, tool: str, after: bytes) -> Checkpoint:
+        """Snapshot path as it is now, before `tool` replaces it with `after`. Call before writing."""
+        path = os.path.abspath(path)
+        before = _read(path)
+        with self._lock:
+            cp = Checkpoint(
+                id=(self.entries[-1].id + 1) if self.entries else 1,
+                tool=tool,
+                path=path,
+                before=self._put(before) if before is not None else None,
+                after=_hash(after),
+                time=time.time(),
+            )
+            self.entries.append(cp)
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(asdict(cp)) + "\n")
+            if len(self.entries) > self.max_checkpoints * 1.1:
+                self._prune()
+        return cp
+
+    def rewind(self, checkpoint_id: int) -> list[Restored]:
+        """Put every file touched by checkpoint_id and later back to how it was before; drop those checkpoints."""
+        with self._lock:
+            undone = [cp for cp in self.entries if cp.id >= checkpoint_id]
+            if not undone:
+                return []
+            first: dict[str, Checkpoint] = {}
+            last: dict[str, Checkpoint] = {}
+            for cp in undone:
+                first.setdefault(cp.path, cp)
+                last[cp.path] = cp
+            restored = []
+            for path, cp in first.items():
+                current = _read(path)
+                changed = (_hash(current) if current is not None else None) != last[path].after
+                if cp.before is None:
+                    if current is not None:
+                        os.remove(path)
+                    restored.append(Restored(path, "deleted", changed))
+                else:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(self.get(cp.before))
+                    restored.append(Restored(path, "restored", changed))
+            self.entries = [cp for cp in self.entries if cp.id < checkpoint_id]
+            self._rewrite()
+        cmdcache.invalidate()
+        return restored
+
+    def _rewrite(self):
+        tmp = self.log_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            for cp in self.entries:
+                f.write(json.dumps(asdict(cp)) + "\n")
+        os.replace(tmp, self.log_path)
+
+    def _prune(self):
+        """Keep the newest max_checkpoints entries; delete objects no entry refers to."""
+        self.entries = self.entries[-self.max_checkpoints:]
+        self._rewrite()
+        live = {cp.before for cp in self.entries if cp.before}
+        if not self.objects.is_dir():
+            return
+        for sub in self.objects.iterdir():
+            for obj in sub.iterdir():
+                if sub.name + obj.name not in live:
+                    obj.unlink(missing_ok=True)
+
+
+def format_checkpoints(entries: list[Checkpoint], limit: int = 15) -> str:
+    if not entries:
+        return "no checkpoints"
+    now = time.time()
+    lines = []
+    for cp in entries[-limit:]:
+        age = now - cp.time
+        when = f"{age:.0f}s" if age < 60 else f"{age / 60:.0f}m" if age < 3600 else f"{age / 3600:.1f}h"
+        what = "created" if cp.before is None else cp.tool
+        lines.append(f"#{cp.id:<5} {what:<8} {cp.path}  ({when} ago)")
+    if len(entries) > limit:
+        lines.insert(0, f"... {len(entries) - limit} older")
+    return "\n".join(lines)
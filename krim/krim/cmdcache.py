@@ -0,0 +1,212 @@
+"""Result cache for read-only bash commands (opt-in: "command_cache": true).
+
+Agents re-run `git diff`, `git log` and `grep -rn` a lot, and in a session
+the answer is usually the same. A command is cached only if it is on the
+allow list AND every pipeline stage starts with a READ_ONLY prefix, with no
+redirection, substitution or command chaining.
+
+Entries are keyed by (command, cwd) and stamped with a fingerprint: the
+cache generation plus the mtime/size of the repo's .git/index and HEAD. The
+generation is bumped by every write/edit and every bash command that isn't
+cacheable, so anything krim itself changes invalidates everything. Edits
+made outside krim that git's index doesn't see are bounded by TTL, or, with
+a watcher running (watch.py), dropped as soon as its events arrive.
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from krim.safety import Action, check_command
+
+READ_ONLY = [
+    "ls", "cat", "head", "tail", "wc", "grep", "rg", "find", "tree", "stat", "file", "du",
+    "git status", "git diff", "git log", "git show", "git branch", "git blame", "git ls-files", "git grep",
+]
+TTL = 60.0  # seconds; catches changes made behind krim's back
+WATCHED_TTL = 600.0  # the watcher reports those changes itself
+MAX_ENTRIES = 256
+_SUBSTITUTION = ("`", "$(", "<(", ">(", "\n")
+# flags that make an otherwise read-only command write something, matched as prefixes
+# (-fprint covers -fprint0/-fprintf, -ok covers -okdir, --output covers --output=FILE)
+_WRITES = {
+    "find": ("-exec", "-ok", "-delete", "-fprint", "-fls"),
+    "tree": ("-o",),
+    "git diff": ("--output",),
+    "git log": ("--output",),
+    "git show": ("--output",),
+}
+# `git branch` writes unless it only lists: any branch name outside --list mode creates one
+_BRANCH_WRITES = ("--delete", "--move", "--copy", "--set-upstream-to", "--unset-upstream", "--edit-description",
+                  "--track", "--no-track", "--force", "--create-reflog", "--recurse-submodules")
+_BRANCH_SHORT_WRITES = set("dDmMcCutf")
+_BRANCH_VALUE_OPTS = {"--contains", "--no-contains", "--merged", "--no-merged", "--points-at", "--sort", "--format"}
+
+
+def _git_branch_lists(args: list[str]) -> bool:
+    listing = names = False
+    skip = False
+    for w in args:
+        if skip:
+            skip = False
+        elif w in ("-l", "--list"):
+            listing = True
+        elif w in _BRANCH_VALUE_OPTS:
+            skip = True  # its value (a commit, key or format) is not a branch name
+        elif w.startswith("--"):
+            if w.split("=", 1)[0] in _BRANCH_WRITES:
+                return False
+        elif w.startswith("-") and len(w) > 1:
+            if _BRANCH_SHORT_WRITES & set(w[1:]):
+                return False
+            listing = listing or "l" in w[1:]
+        else:
+            names = True
+    return listing or not names
+
+
+_generation = 0
+_gen_lock = threading.Lock()
+
+
+def invalidate():
+    """Something may have changed the tree: every cached result is stale."""
+    global _generation
+    with _gen_lock:
+        _generation += 1
+
+
+def generation() -> int:
+    return _generation
+
+
+def _stat_key(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+@dataclass
+class _Entry:
+    output: str
+    fingerprint: tuple
+    created: float
+
+
+class CommandCache:
+    def __init__(self, allow_commands: list[str], read_only: list[str] | None = None,
+                 ttl: float = TTL, max_entries: int = MAX_ENTRIES):
+        self.allow_commands = allow_commands
+        self.read_only = read_only or READ_ONLY
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._git_dirs: dict[str, str | None] = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def watch(self, watcher):
+        """Invalidate on the watcher's change events (and trust entries longer)."""
+        self._watcher = watcher
+        self.ttl = max(self.ttl, WATCHED_TTL)
+        watcher.subscribe(lambda changed: invalidate())
+
+    def cacheable(self, command: str) -> bool:
+        command = command.strip()
+        if not command or any(s in command for s in _SUBSTITUTION):
+            return False
+        if check_command(command, [], self.allow_commands, ask_by_default=True) != Action.ALLOW:
+            return False
+        # quoted text is fine ("def foo(" is a search term); bare operators other than | are not
+        try:
+            lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+            lexer.whitespace_split = True
+            tokens = list(lexer)
+        except ValueError:
+            return False
+        stages: list[list[str]] = [[]]
+        for tok in tokens:
+            if tok == "|":
+                stages.append([])
+            elif tok and all(c in "();<>|&" for c in tok):
+                return False
+            else:
+                stages[-1].append(tok)
+        for words in stages:
+            stage = " ".join(words).lower()
+            if not any(stage == p or stage.startswith(p + " ") for p in self.read_only):
+                return False
+            for prefix, flags in _WRITES.items():
+                if stage.startswith(prefix + " ") and any(w.startswith(f) for w in words for f in flags):
+                    return False
+            if (stage == "git branch" or stage.startswith("git branch ")) and not _git_branch_lists(words[2:]):
+                return False
+        return True
+
+    def _git_dir(self, cwd: str) -> str | None:
+        if cwd not in self._git_dirs:
+            d = cwd
+            while True:
+                candidate = os.path.join(d, ".git")
+                if os.path.isdir(candidate):
+                    break
+                if os.path.isfile(candidate):  # worktree: "gitdir: <path>"
+                    try:
+                        with open(candidate) as f:
+                            line = f.read().strip()
+                        candidate = os.path.join(d, line.split(":", 1)[1].strip()) if line.startswith("gitdir:") else None
+                    except OSError:
+                        candidate = None
+                    break
+                parent = os.path.dirname(d)
+                if parent == d:
+                    candidate = None
+                    break
+                d = parent
+            self._git_dirs[cwd] = candidate
+        return self._git_dirs[cwd]
+
+    def fingerprint(self, cwd: str) -> tuple:
+        git_dir = self._git_dir(cwd)
+        if not git_dir:
+            return (_generation,)
+        return (_generation, _stat_key(os.path.join(git_dir, "index")), _stat_key(os.path.join(git_dir, "HEAD")))
+
+    def get(self, command: str, cwd: str) -> tuple[str, float] | None:
+        """(output, age in seconds) if a fresh entry exists."""
+        key = (command.strip(), cwd)
+        if self._watcher:
+            self._watcher.sync()  # deliver changes that already happened before deciding
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry.created
+            if age > self.ttl or entry.fingerprint != self.fingerprint(cwd):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.output, age
+
+    def put(self, command: str, cwd: str, output: str, since: int):
+        """Store output of a run that started at generation `since` (dropped if anything changed meanwhile).
+
+        The git part of the fingerprint is taken after the run: `git status` may refresh the index itself.
+        """
+        fingerprint = self.fingerprint(cwd)
+        if fingerprint[0] != since:
+            return
+        with self._lock:
+            self._entries[(command.strip(), cwd)] = _Entry(output, fingerprint, time.monotonic())
+            self._entries.move_to_end((command.strip(), cwd))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -93,11 +93,18 @@ def compact(messages: list[dict], max_tokens: int = 120_000) -> list[dict]:
     # We must keep tool_call assistant msgs paired with their tool_result msgs
     # to avoid orphaned references that cause API errors.
     result = ([system] if system else []) + compacted
-    while len(result) > 4 and estimate_message_tokens(result) > max_tokens * 0.6:
+    # per-message sizes, kept in step with result, so each drop costs O(group) not O(history)
+    sizes = [estimate_message_tokens([m]) for m in result]
+    total = sum(sizes)
+    while len(result) > 4 and total > max_tokens * 0.6:
         # find the oldest droppable group (starting after system msg)
+        before = len(result)
         dropped = _drop_oldest_group(result, start=1)
         if not dropped:
             break  # nothing left to drop
+        gone = before - len(result)
+        total -= sum(sizes[1:1 + gone])
+        del sizes[1:1 + gone]
 
     return result
 
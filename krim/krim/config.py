@@ -16,6 +16,7 @@ Directory convention:
     ├── config.json
     ├── KRIM.md
     ├── mcp.json
+    ├── sessions/             # transcripts (written by krim, git-ignored)
     ├── skills/
     │   └── <name>/SKILL.md
     └── rules/
@@ -34,9 +35,21 @@ from pathlib import Path
 class KrimConfig:
     provider: str = "claude"
     model: str | None = None
+    fast_model: str | None = None   # enables routing: easy turns go here
+    routing: dict = field(default_factory=dict)   # RoutingRules overrides
     max_turns: int = 10
     max_output_chars: int = 30_000
+    bash_limits: dict = field(default_factory=dict)   # per-command rlimits: memory_mb, cpu_seconds, open_files, processes
+    command_cache: bool = False   # reuse results of read-only allow-listed commands while the tree is unchanged
+    checkpoints: bool = True   # snapshot files before write/edit, for /rewind
+    watch: str = "off"   # working-tree watcher for cache invalidation: off | auto | inotify | poll
     auto_commit: bool = False
+    save_sessions: bool = True
+    mcp_daemon: bool = False   # share MCP server processes across krim processes
+    tracing: dict = field(default_factory=dict)   # {"export", "sample", "service_name"}
+    render: str = "auto"   # streamed output: auto | plain | markdown | off
+    max_parallel: int = 4   # concurrent subtasks; 0 disables the parallel tool
+    test_worker: dict = field(default_factory=dict)   # warm pytest worker: {"enabled", "python", "preload"}
 
     # safety
     allow_commands: list[str] = field(default_factory=lambda: [
@@ -136,12 +149,36 @@ def load_config() -> KrimConfig:
         cfg.provider = merged["provider"]
     if "model" in merged:
         cfg.model = merged["model"]
+    if "fast_model" in merged:
+        cfg.fast_model = merged["fast_model"]
+    if "routing" in merged:
+        cfg.routing = merged["routing"]
     if "max_turns" in merged:
         cfg.max_turns = merged["max_turns"]
     if "max_output_chars" in merged:
         cfg.max_output_chars = merged["max_output_chars"]
+    if "bash_limits" in merged:
+        cfg.bash_limits = merged["bash_limits"]
+    if "command_cache" in merged:
+        cfg.command_cache = merged["command_cache"]
+    if "watch" in merged:
+        cfg.watch = merged["watch"]
+    if "checkpoints" in merged:
+        cfg.checkpoints = merged["checkpoints"]
     if "auto_commit" in merged:
         cfg.auto_commit = merged["auto_commit"]
+    if "save_sessions" in merged:
+        cfg.save_sessions = merged["save_sessions"]
+    if "mcp_daemon" in merged:
+        cfg.mcp_daemon = merged["mcp_daemon"]
+    if "tracing" in merged:
+        cfg.tracing = merged["tracing"]
+    if "render" in merged:
+        cfg.render = merged["render"]
+    if "max_parallel" in merged:
+        cfg.max_parallel = merged["max_parallel"]
+    if "test_worker" in merged:
+        cfg.test_worker = merged["test_worker"]
     if "allow_commands" in merged:
         cfg.allow_commands = merged["allow_commands"]
     if "deny_patterns" in merged:
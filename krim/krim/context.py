@@ -8,13 +8,15 @@ from __future__ import annotations
 
 import os
 import subprocess
-from pathlib import Path
+from krim.profiling import traced
+from krim.walk import walk
 
 
 def get_cwd() -> str:
     return os.getcwd()
 
 
+@traced("context.git")
 def get_git_info() -> str | None:
     """Get compact git context: branch, status summary, recent commits."""
     try:
@@ -54,47 +56,21 @@ def get_git_info() -> str | None:
         return None
 
 
+@traced("context.tree")
 def get_project_tree(max_files: int = 50, max_depth: int = 3) -> str:
-    """Get a compact project file tree. Respects .gitignore via git ls-files."""
+    """Get a compact project file tree. Respects .gitignore (see walk.py)."""
     try:
-        # try git ls-files first (respects .gitignore)
-        result = subprocess.run(
-            ["git", "ls-files"],
-            capture_output=True, text=True, timeout=5,
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            files = result.stdout.strip().splitlines()
-            # filter by depth
-            filtered = [f for f in files if f.count("/") < max_depth]
-            if len(filtered) > max_files:
-                return "\n".join(filtered[:max_files]) + f"\n... ({len(filtered) - max_files} more files)"
-            return "\n".join(filtered)
+        files = sorted(e.path for e in walk(os.getcwd(), max_depth=max_depth - 1))
     except Exception:
-        pass
-
-    # fallback: basic os.walk
-    cwd = Path.cwd()
-    files = []
-    skip = {".git", "node_modules", "__pycache__", ".venv", "venv", ".tox", "dist", "build"}
-    for root, dirs, filenames in os.walk(cwd):
-        dirs[:] = [d for d in dirs if d not in skip]
-        depth = Path(root).relative_to(cwd).parts
-        if len(depth) >= max_depth:
-            dirs.clear()
-            continue
-        for f in filenames:
-            rel = os.path.relpath(os.path.join(root, f), cwd)
-            files.append(rel)
-            if len(files) >= max_files:
-                break
-        if len(files) >= max_files:
-            break
-
+        files = []
     if not files:
         return "(empty directory)"
+    if len(files) > max_files:
+        return "\n".join(files[:max_files]) + f"\n... ({len(files) - max_files} more files)"
     return "\n".join(files)
 
 
+@traced("context.build")
 def build_context() -> str:
     """Build the full context string for prompt injection."""
     parts = [f"cwd: {get_cwd()}"]
@@ -1,4 +1,4 @@
-"""Git integration - auto-commit and undo.
+"""Git integration - auto-commit, undo, and worktrees for parallel subtasks.
 
 Philosophy: every AI edit gets its own commit, so the user can always `git reset HEAD^` to undo.
 Dirty files are committed separately first to keep human and AI changes distinct.
@@ -9,15 +9,18 @@ from __future__ import annotations
 import subprocess
 from rich.console import Console
 
+from krim.profiling import span
+
 console = Console()
 
 
-def _run_git(*args: str, check: bool = False) -> subprocess.CompletedProcess:
-    return subprocess.run(
-        ["git", *args],
-        capture_output=True, text=True, timeout=10,
-        check=check,
-    )
+def _run_git(*args: str, check: bool = False, cwd: str | None = None) -> subprocess.CompletedProcess:
+    with span(f"git.{args[0]}"):
+        return subprocess.run(
+            ["git", *args],
+            capture_output=True, text=True, timeout=10,
+            check=check, cwd=cwd,
+        )
 
 
 def is_git_repo() -> bool:
@@ -25,13 +28,13 @@ def is_git_repo() -> bool:
     return result.returncode == 0
 
 
-def has_uncommitted_changes() -> bool:
-    result = _run_git("status", "--porcelain")
+def has_uncommitted_changes(cwd: str | None = None) -> bool:
+    result = _run_git("status", "--porcelain", cwd=cwd)
     return bool(result.stdout.strip())
 
 
-def get_dirty_files() -> list[str]:
-    result = _run_git("status", "--porcelain")
+def get_dirty_files(cwd: str | None = None) -> list[str]:
+    result = _run_git("status", "--porcelain", cwd=cwd)
     files = []
     for line in result.stdout.strip().splitlines():
         if line.strip():
@@ -40,19 +43,19 @@ def get_dirty_files() -> list[str]:
     return files
 
 
-def _stage_tracked_changes():
+def _stage_tracked_changes(cwd: str | None = None):
     """Stage only tracked file changes + new files, skipping common sensitive patterns."""
     # stage modified/deleted tracked files
-    _run_git("add", "-u")
+    _run_git("add", "-u", cwd=cwd)
     # stage new files but exclude sensitive patterns
-    dirty = get_dirty_files()
+    dirty = get_dirty_files(cwd)
     skip = {".env", ".env.local", ".env.production", "credentials.json", "secrets.json",
             ".DS_Store", "node_modules", "__pycache__"}
     for f in dirty:
         basename = f.rsplit("/", 1)[-1] if "/" in f else f
         if basename in skip or f.startswith(".env"):
             continue
-        _run_git("add", "--", f)
+        _run_git("add", "--", f, cwd=cwd)
 
 
 def commit_dirty(message: str = "krim: save uncommitted changes before agent edits") -> bool:
@@ -100,3 +103,48 @@ def undo() -> bool:
 
     console.print(f"[red]git reset failed: {result.stderr}[/]")
     return False
+
+
+# -- worktrees (parallel subtasks) --
+
+def repo_root() -> str | None:
+    result = _run_git("rev-parse", "--show-toplevel")
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def add_worktree(path: str, branch: str) -> bool:
+    """Check out a new branch from HEAD into its own working tree."""
+    result = _run_git("worktree", "add", "-b", branch, path, "HEAD")
+    if result.returncode != 0:
+        console.print(f"[red]git worktree add failed: {result.stderr.strip()}[/]")
+    return result.returncode == 0
+
+
+def remove_worktree(path: str):
+    _run_git("worktree", "remove", "--force", path)
+
+
+def commit_worktree(path: str, message: str) -> list[str]:
+    """Commit everything the agent changed in a worktree. Returns the files committed."""
+    if not has_uncommitted_changes(path):
+        return []
+    _stage_tracked_changes(path)
+    result = _run_git("commit", "-m", message, cwd=path)
+    if result.returncode != 0:
+        return []
+    files = _run_git("diff-tree", "--no-commit-id", "--name-only", "-r", "HEAD", cwd=path)
+    return files.stdout.split()
+
+
+def merge_branch(branch: str, message: str) -> list[str]:
+    """Merge a branch into HEAD. On conflict, abort and return the conflicting files."""
+    result = _run_git("merge", "--no-ff", "--no-edit", "-m", message, branch)
+    if result.returncode == 0:
+        return []
+    conflicts = _run_git("diff", "--name-only", "--diff-filter=U").stdout.split()
+    _run_git("merge", "--abort")
+    return conflicts or ["(merge failed: " + (result.stderr.strip() or result.stdout.strip()) + ")"]
+
+
+def delete_branch(branch: str):
+    _run_git("branch", "-D", branch)
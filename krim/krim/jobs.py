@@ -0,0 +1,166 @@
+"""Background jobs - long bash commands that run while the agent keeps working.
+
+`bash` with background=true starts the command detached and returns a job
+id at once; the `job` tool polls new output, waits (with a timeout) or kills.
+Jobs get the same process handling as foreground commands (own session,
+rlimits, whole-group kill). stdout and stderr are merged into a ring buffer
+of the last RING_BYTES bytes; a poll returns what arrived since the previous
+one and notes anything that was overwritten before it was read.
+
+Jobs live as long as krim: whatever is still running at exit is killed.
+While any job runs the tree may change under krim, so the command cache
+stays out of the way; a job's exit invalidates it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+
+from krim import cancellation, cmdcache, process
+
+RING_BYTES = 1024 * 1024
+MAX_JOBS = 8  # running at once, per bash tool
+
+_running = 0  # across every JobManager (sub-agents have their own)
+_running_lock = threading.Lock()
+
+
+def any_running() -> bool:
+    return _running > 0
+
+
+class RingBuffer:
+    """Keeps the last `size` bytes; positions are absolute, so readers can tell what they missed."""
+
+    def __init__(self, size: int = RING_BYTES):
+        self.size = size
+        self._buf = bytearray()
+        self._start = 0  # absolute position of _buf[0]
+        self._lock = threading.Lock()
+
+    @property
+    def end(self) -> int:
+        return self._start + len(self._buf)
+
+    def write(self, data: bytes):
+        with self._lock:
+            self._buf += data
+            over = len(self._buf) - self.size
+            if over > 0:
+                del self._buf[:over]
+                self._start += over
+
+    def read_from(self, pos: int) -> tuple[bytes, int, int]:
+        """(data since pos, bytes lost before it, new position)."""
+        with self._lock:
+            lost = max(0, self._start - pos)
+            begin = max(pos, self._start) - self._start
+            return bytes(self._buf[begin:]), lost, self.end
+
+
+@dataclass
+class Job:
+    id: str
+    command: str
+    proc: subprocess.Popen
+    started: float = field(default_factory=time.monotonic)
+    output: RingBuffer = field(default_factory=RingBuffer)
+    done: threading.Event = field(default_factory=threading.Event)
+    usage: process.Usage | None = None
+    ended: float | None = None
+    killed: bool = False
+    _read_pos: int = 0
+
+    @property
+    def running(self) -> bool:
+        return not self.done.is_set()
+
+    def status(self) -> str:
+        elapsed = (self.ended or time.monotonic()) - self.started
+        if self.running:
+            return f"running ({elapsed:.0f}s)"
+        state = "killed" if self.killed else f"exited {self.proc.returncode}"
+        line = f"{state} after {elapsed:.1f}s"
+        if self.usage:
+            line += f", cpu: {self.usage.cpu_seconds:.1f}s, peak rss: {self.usage.peak_rss_mb:.0f} MB"
+        return line
+
+    def new_output(self) -> str:
+        data, lost, self._read_pos = self.output.read_from(self._read_pos)
+        text = data.decode("utf-8", errors="replace")
+        if lost:
+            text = f"[... {lost} bytes dropped ...]\n" + text
+        return text
+
+
+def _track(delta: int):
+    global _running
+    with _running_lock:
+        _running += delta
+
+
+class JobManager:
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def start(self, command: str, cwd: str, limits: list[tuple[int, int, int]] | None = None) -> Job:
+        with self._lock:
+            running = sum(1 for j in self.jobs.values() if j.running)
+            if running >= MAX_JOBS:
+                raise RuntimeError(f"{running} jobs already running (max {MAX_JOBS}); wait for or kill one first")
+            self._next += 1
+            job_id = f"j{self._next}"
+            if not self._registered:
+                atexit.register(self.kill_all)
+                self._registered = True
+        proc = process.spawn(command, cwd, limits, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        job = Job(id=job_id, command=command, proc=proc)
+        _track(+1)
+        self.jobs[job_id] = job
+        threading.Thread(target=self._pump, args=(job,), name=f"krim-job-{job_id}", daemon=True).start()
+        return job
+
+    def _pump(self, job: Job):
+        fd = job.proc.stdout.fileno()
+        try:
+            for chunk in iter(lambda: os.read(fd, 65536), b""):
+                job.output.write(chunk)
+        except OSError:
+            pass
+        finally:
+            job.proc.stdout.close()
+        job.usage = process.reap(job.proc)
+        job.ended = time.monotonic()
+        _track(-1)
+        cmdcache.invalidate()  # whatever it changed, cached reads from before are stale
+        job.done.set()
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def wait(self, job: Job, timeout: float) -> bool:
+        """Wait for job to finish; False on timeout or cancel."""
+        token = cancellation.current()
+        deadline = time.monotonic() + timeout
+        while not job.done.wait(min(0.1, max(0.0, deadline - time.monotonic()))):
+            if token.cancelled or time.monotonic() >= deadline:
+                return False
+        return True
+
+    def kill(self, job: Job):
+        if job.running:
+            job.killed = True
+            process.kill_group(job.proc)
+            job.done.wait(5)
+
+    def kill_all(self):
+        for job in list(self.jobs.values()):
+            self.kill(job)
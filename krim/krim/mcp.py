@@ -1,25 +1,43 @@
 """MCP (Model Context Protocol) client support.
 
-Connects to external MCP servers via stdio with proper Content-Length framing.
+Connects to external MCP servers via stdio. Reads Content-Length framed and
+newline-delimited JSON-RPC; writes whichever the server config asks for.
 Config lives in ~/.krim/mcp.json or .krim/mcp.json
+
+Servers start concurrently. Tool schemas are cached in ~/.krim/mcp-cache.json
+(keyed by command + env): a cached server boots in the background while the
+agent starts with the cached tools, and the cache is refreshed if it changed.
+
+Lazy servers ("lazy": true) with a cache entry aren't spawned until the first
+call, and any server with "idleTimeout" is stopped when idle and respawned on
+the next call.
 """
 
 from __future__ import annotations
 
 import json
+import hashlib
 import os
 import select
 import subprocess
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import nullcontext
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable
 
 from rich.console import Console
 
-from krim import __version__
+from krim import __version__, cancellation, tracing
+from krim.profiling import span
+from krim.spill import ResultStore
 from krim.tools.base import Tool
 from krim.truncate import truncate
 
 MCP_READ_TIMEOUT = 60  # seconds
+MCP_LAZY_IDLE_TIMEOUT = 300  # seconds; default idle shutdown for lazy servers
 
 console = Console()
 
@@ -29,6 +47,101 @@ class McpServerConfig:
     name: str
     command: list[str]
     env: dict[str, str] | None = None
+    framing: str = "content-length"     # what we send: "content-length" or "ndjson" (we read both)
+    lazy: bool = False                  # spawn on first call (needs cached schemas)
+    idle_timeout: float | None = None   # stop after this many idle seconds, respawn on demand
+
+
+class FrameReader:
+    """Reads JSON-RPC messages from a raw pipe fd into a single buffer.
+
+    Accepts Content-Length framing and newline-delimited JSON, since servers
+    use both. Reads go straight to the fd (no Python-level buffering), so
+    select() only waits when the buffer holds no complete message, and a
+    burst of several messages costs one read. Bodies are decoded straight
+    from a memoryview of the buffer without an intermediate bytes copy.
+    """
+
+    CHUNK = 64 * 1024
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        os.set_blocking(fd, False)
+        self._buf = bytearray()
+        self._pos = 0     # start of unconsumed data
+        self._want = 0    # bytes still missing from a partially received body
+
+    def read_message(self, timeout: float | None = None) -> dict:
+        """Next message. Raises TimeoutError, or ConnectionError on EOF/bad framing."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            msg = self._parse()
+            if msg is not None:
+                return msg
+            self._fill(deadline)
+
+    def _fill(self, deadline: float | None):
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        ready, _, _ = select.select([self.fd], [], [], remaining)
+        if not ready:
+            raise TimeoutError(f"MCP server did not respond within {remaining:.0f}s")
+        try:
+            chunk = os.read(self.fd, max(self.CHUNK, self._want))
+        except BlockingIOError:
+            return
+        if not chunk:
+            raise ConnectionError("MCP server closed connection")
+        # drop consumed bytes once they dominate, instead of on every message
+        if self._pos and self._pos * 2 >= len(self._buf):
+            del self._buf[:self._pos]
+            self._pos = 0
+        self._buf += chunk
+
+    def _parse(self) -> dict | None:
+        buf = self._buf
+        pos = self._pos
+        while pos < len(buf) and buf[pos] in b" \t\r\n":
+            pos += 1
+        self._pos = pos
+        if pos == len(buf):
+            buf.clear()
+            self._pos = 0
+            return None
+
+        if buf[pos] in b"{[":
+            # newline-delimited JSON
+            end = buf.find(b"\n", pos)
+            if end == -1:
+                return None
+            msg = self._decode(pos, end)
+            self._pos = end + 1
+            return msg
+
+        # Content-Length framing: headers end at the first blank line
+        ends = [(i, n) for i, n in ((buf.find(b"\r\n\r\n", pos), 4), (buf.find(b"\n\n", pos), 2)) if i != -1]
+        if not ends:
+            return None
+        hdr_end, sep = min(ends)
+        length = None
+        for line in bytes(buf[pos:hdr_end]).split(b"\n"):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value.strip())
+        if not length:
+            raise ConnectionError("MCP server sent no Content-Length")
+        body = hdr_end + sep
+        missing = body + length - len(buf)
+        if missing > 0:
+            self._want = missing
+            return None
+        self._want = 0
+        msg = self._decode(body, body + length)
+        self._pos = body + length
+        return msg
+
+    def _decode(self, start: int, end: int) -> dict:
+        with memoryview(self._buf) as mv:
+            return json.loads(str(mv[start:end], "utf-8", "replace"))
 
 
 class McpTool(Tool):
@@ -57,31 +170,95 @@ class McpTool(Tool):
         return self._server.call_tool(self.name, kwargs)
 
 
+def tools_from_specs(specs: list[dict], server) -> list[McpTool]:
+    """Build McpTools from tools/list entries. server is anything with call_tool()."""
+    tools = []
+    for t in specs:
+        schema = t.get("inputSchema", {})
+        props = schema.get("properties", {})
+        required = schema.get("required", [])
+        # store full schema info so McpTool.schema() works correctly
+        tool = McpTool(
+            name=t["name"],
+            description=t.get("description", ""),
+            parameters=props,
+            server=server,
+        )
+        tool._required = required
+        tools.append(tool)
+    return tools
+
+
 class McpServer:
-    """Manages a single MCP server process via stdio with Content-Length framing."""
+    """Manages a single MCP server process via stdio.
 
-    def __init__(self, config: McpServerConfig):
+    A background reader thread owns stdout: responses are matched to pending
+    requests by JSON-RPC id, so many calls can be in flight at once.
+    Notifications go to handlers registered with on_notification().
+    """
+
+    def __init__(self, config: McpServerConfig, results: ResultStore | None = None):
         self.config = config
+        self.results = results
         self.process: subprocess.Popen | None = None
         self._request_id = 0
         self.tools: list[McpTool] = []
+        self._write_lock = threading.Lock()
+        self._pending: dict[int, Future] = {}
+        self._handlers: dict[str, Callable[[dict], None]] = {
+            "notifications/progress": self._on_progress,
+            "notifications/tools/list_changed": self._on_tools_changed,
+        }
+        self._reader: threading.Thread | None = None
+        self._closed = False
+        self._ready = threading.Event()
+        self._start_error: Exception | None = None
+        self.tool_specs: list[dict] = []   # raw tools/list entries, for the cache
+        self._tool_listeners: list[Callable[[], None]] = []
+        self.server_version: str | None = None
+
+        # on-demand lifecycle (lazy spawn / idle shutdown)
+        self.idle_timeout = config.idle_timeout
+        if self.idle_timeout is None and config.lazy:
+            self.idle_timeout = MCP_LAZY_IDLE_TIMEOUT
+        self._lifecycle_lock = threading.Lock()
+        self._busy = 0
+        self._idle_timer: threading.Timer | None = None
 
     def start(self):
         env = os.environ.copy()
         if self.config.env:
             env.update(self.config.env)
 
-        self.process = subprocess.Popen(
-            self.config.command,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=env,
-        )
-        self._initialize()
-        self._discover_tools()
+        self._ready.clear()
+        self._start_error = None
+        try:
+            with span("mcp.spawn"):
+                self.process = subprocess.Popen(
+                    self.config.command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    env=env,
+                )
+            self._closed = False
+            self._reader = threading.Thread(
+                target=self._read_loop, args=(FrameReader(self.process.stdout.fileno()),),
+                name=f"mcp-{self.config.name}", daemon=True,
+            )
+            self._reader.start()
+            self._initialize()
+            self._discover_tools()
+        except Exception as e:
+            self._start_error = e
+            raise
+        finally:
+            self._ready.set()
 
     def stop(self):
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
         if self.process:
             try:
                 self.process.terminate()
@@ -89,58 +266,177 @@ class McpServer:
             except Exception:
                 self.process.kill()
             self.process = None
+        if self._reader:
+            self._reader.join(timeout=1)
+        self._fail_pending(ConnectionError("MCP server stopped"))
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None and not self._closed
+
+    def _acquire(self) -> str | None:
+        """Mark a call in flight, (re)spawning an on-demand server first. Error string on failure."""
+        with self._lifecycle_lock:
+            if (self.config.lazy or self.idle_timeout) and not self.running:
+                if self.process:
+                    self.stop()
+                try:
+                    self.start()
+                except Exception as e:
+                    self.stop()
+                    return f"error: MCP server {self.config.name} failed to start: {e}"
+                console.print(f"[dim]mcp: {self.config.name} started on demand[/]")
+            self._busy += 1
+        return None
+
+    def _release(self):
+        with self._lifecycle_lock:
+            self._busy -= 1
+            self._touch()
+
+    def _touch(self):
+        """Re-arm the idle timer."""
+        if not self.idle_timeout:
+            return
+        if self._idle_timer:
+            self._idle_timer.cancel()
+        self._idle_timer = threading.Timer(self.idle_timeout, self._idle_stop)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _idle_stop(self):
+        with self._lifecycle_lock:
+            if self._busy or not self.running:
+                return
+            self._idle_timer = None
+            self.stop()
+        console.print(f"[dim]mcp: {self.config.name} idle, stopped[/]")
+
+    def on_notification(self, method: str, handler: Callable[[dict], None]):
+        """Register a handler for a server notification (called on the reader thread)."""
+        self._handlers[method] = handler
 
     def _send_raw(self, data: bytes):
-        """Send a message with Content-Length header framing."""
-        header = f"Content-Length: {len(data)}\r\n\r\n".encode()
-        self.process.stdin.write(header + data)
-        self.process.stdin.flush()
-
-    def _recv_raw(self, timeout: float = MCP_READ_TIMEOUT) -> bytes:
-        """Read a Content-Length framed message with timeout."""
-        # wait for data with timeout
-        fd = self.process.stdout.fileno()
-        ready, _, _ = select.select([fd], [], [], timeout)
-        if not ready:
-            raise TimeoutError(f"MCP server did not respond within {timeout}s")
+        """Send one message, framed the way the server expects."""
+        if self.config.framing == "ndjson":
+            frame = data + b"\n"
+        else:
+            frame = f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+        with self._write_lock:
+            self.process.stdin.write(frame)
+            self.process.stdin.flush()
+
+    def _read_loop(self, reader: FrameReader):
+        """Demultiplex everything the server sends until it goes away."""
+        err: Exception = ConnectionError("MCP server closed connection")
+        try:
+            while True:
+                self._dispatch(reader.read_message())
+        except ConnectionError as e:
+            err = e
+        except Exception as e:
+            err = ConnectionError(f"MCP reader failed: {e}")
+        if self._reader is threading.current_thread():  # not superseded by a respawn
+            self._fail_pending(err)
+
+    def _fail_pending(self, err: Exception):
+        """Fail anything still waiting, so callers don't sit out the full timeout."""
+        with self._write_lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(err)
+
+    def _dispatch(self, msg: dict):
+        method = msg.get("method")
+        if method is None:
+            fut = self._pending.pop(msg.get("id"), None)
+            if fut and not fut.done():
+                fut.set_result(msg)
+            return
+        if "id" in msg:
+            # server -> client request: answer ping, refuse the rest
+            reply: dict = {"jsonrpc": "2.0", "id": msg["id"]}
+            if method == "ping":
+                reply["result"] = {}
+            else:
+                reply["error"] = {"code": -32601, "message": f"method not supported: {method}"}
+            self._send_raw(json.dumps(reply).encode("utf-8"))
+            return
+        handler = self._handlers.get(method)
+        if handler:
+            try:
+                handler(msg.get("params") or {})
+            except Exception as e:
+                console.print(f"[yellow]mcp: {self.config.name}: {method} handler failed: {e}[/]")
 
-        # read headers
-        content_length = 0
-        while True:
-            line = self.process.stdout.readline()
-            if not line:
+    def _request(self, method: str, params: dict | None = None, progress: bool = False) -> tuple[int, Future]:
+        """Send a request without waiting. The future resolves to the raw response."""
+        fut: Future = Future()
+        with self._write_lock:
+            if self._closed:
                 raise ConnectionError("MCP server closed connection")
-            line_str = line.decode("utf-8", errors="replace").strip()
-            if not line_str:
-                break  # empty line = end of headers
-            if line_str.lower().startswith("content-length:"):
-                content_length = int(line_str.split(":", 1)[1].strip())
-
-        if content_length == 0:
-            raise ConnectionError("MCP server sent no Content-Length")
-
-        data = self.process.stdout.read(content_length)
-        return data
-
-    def _send(self, method: str, params: dict | None = None) -> dict:
-        self._request_id += 1
+            self._request_id += 1
+            req_id = self._request_id
+            self._pending[req_id] = fut
         msg = {
             "jsonrpc": "2.0",
-            "id": self._request_id,
+            "id": req_id,
             "method": method,
         }
         if params is not None:
+            if progress:
+                params = {**params, "_meta": {"progressToken": req_id}}
             msg["params"] = params
+        try:
+            self._send_raw(json.dumps(msg).encode("utf-8"))
+        except Exception:
+            self._pending.pop(req_id, None)
+            raise
+        return req_id, fut
+
+    def _send(self, method: str, params: dict | None = None, timeout: float = MCP_READ_TIMEOUT,
+              progress: bool = False, cancellable: bool = False) -> dict:
+        attrs = {"rpc.system": "jsonrpc", "rpc.method": method, "mcp.server": self.config.name}
+        with span(f"mcp.{method}"), tracing.span(f"mcp.{method}", attrs, tracing.KIND_CLIENT):
+            req_id, fut = self._request(method, params, progress)
+            guard = (cancellation.current().on_cancel(lambda: self._cancel_request(req_id, fut))
+                     if cancellable else nullcontext())
+            with guard:
+                try:
+                    return fut.result(timeout=timeout)
+                except FutureTimeout:
+                    self._pending.pop(req_id, None)
+                    raise TimeoutError(f"MCP server did not respond within {timeout}s") from None
+
+    def _cancel_request(self, req_id: int, fut: Future):
+        """Stop waiting on a request and tell the server to drop it."""
+        if self._pending.pop(req_id, None) is None or fut.done():
+            return
+        fut.set_exception(cancellation.Cancelled())
+        notify = {
+            "jsonrpc": "2.0",
+            "method": "notifications/cancelled",
+            "params": {"requestId": req_id, "reason": "cancelled by user"},
+        }
+        try:
+            self._send_raw(json.dumps(notify).encode("utf-8"))
+        except Exception:
+            pass  # server already gone
 
-        self._send_raw(json.dumps(msg).encode("utf-8"))
+    # -- notifications --
 
-        # read responses, skipping notifications (no "id" field)
-        while True:
-            raw = self._recv_raw()
-            resp = json.loads(raw)
-            if "id" in resp:
-                return resp
-            # else it's a notification, skip it
+    def _on_progress(self, params: dict):
+        progress = params.get("progress")
+        total = params.get("total")
+        msg = params.get("message", "")
+        pct = f"{progress}/{total}" if total else f"{progress}"
+        console.print(f"[dim]mcp: {self.config.name} progress {pct} {msg}[/]")
+
+    def _on_tools_changed(self, params: dict):
+        # can't wait for a response on the reader thread - refresh from another one
+        threading.Thread(target=self._discover_tools, daemon=True).start()
 
     def _initialize(self):
         resp = self._send("initialize", {
@@ -154,31 +450,44 @@ class McpServer:
             "method": "notifications/initialized",
         }
         self._send_raw(json.dumps(notify).encode("utf-8"))
+        info = resp.get("result", {}).get("serverInfo", {})
+        self.server_version = info.get("version")
         return resp
 
     def _discover_tools(self):
         resp = self._send("tools/list")
         if "result" not in resp:
             return
-        for t in resp["result"].get("tools", []):
-            schema = t.get("inputSchema", {})
-            props = schema.get("properties", {})
-            required = schema.get("required", [])
-            # store full schema info so McpTool.schema() works correctly
-            tool = McpTool(
-                name=t["name"],
-                description=t.get("description", ""),
-                parameters=props,
-                server=self,
-            )
-            tool._required = required
-            self.tools.append(tool)
+        self.tool_specs = resp["result"].get("tools", [])
+        self.tools = self.tools_from_specs(self.tool_specs)
+        for fn in self._tool_listeners:
+            fn()
+
+    def on_tools_changed(self, fn: Callable[[], None]):
+        """Call fn after self.tools is replaced (a tools/list_changed refresh, or boot after cached tools)."""
+        self._tool_listeners.append(fn)
+
+    def tools_from_specs(self, specs: list[dict]) -> list[McpTool]:
+        """Build McpTools from tools/list entries (live or cached)."""
+        return tools_from_specs(specs, self)
 
     def call_tool(self, name: str, args: dict) -> str:
+        # tools may be advertised from the cache while the server is still booting
+        if not (self.config.lazy or self.idle_timeout) and not self._ready.wait(MCP_READ_TIMEOUT):
+            return f"error: MCP server {self.config.name} is still starting"
+        err = self._acquire()
+        if err:
+            return err
         try:
-            resp = self._send("tools/call", {"name": name, "arguments": args})
+            if self._start_error:
+                return f"error: MCP server {self.config.name} failed to start: {self._start_error}"
+            resp = self._send("tools/call", {"name": name, "arguments": args}, progress=True, cancellable=True)
+        except cancellation.Cancelled:
+            return cancellation.CANCELLED_RESULT
         except Exception as e:
             return f"error: MCP call failed: {e}"
+        finally:
+            self._release()
 
         if "error" in resp:
             err = resp["error"]
@@ -194,6 +503,8 @@ class McpServer:
             else:
                 parts.append(json.dumps(c))
         out = "\n".join(parts) or "(no output)"
+        if self.results:
+            return self.results.limit(out, 30_000)
         return truncate(out, 30_000)
 
 
@@ -218,6 +529,9 @@ def load_mcp_config(global_dir: Path | None = None, project_dir: Path | None = N
                         name=name,
                         command=cfg["command"],
                         env=cfg.get("env"),
+                        framing=cfg.get("framing", "content-length"),
+                        lazy=cfg.get("lazy", False),
+                        idle_timeout=cfg.get("idleTimeout"),
                     ))
             except Exception as e:
                 console.print(f"[yellow]mcp: failed to load {path}: {e}[/]")
@@ -225,17 +539,119 @@ def load_mcp_config(global_dir: Path | None = None, project_dir: Path | None = N
     return configs
 
 
-def start_mcp_servers(configs: list[McpServerConfig]) -> tuple[list[McpTool], list[McpServer]]:
-    """Start all MCP servers and collect their tools. Returns (tools, servers) for cleanup."""
-    all_tools = []
-    servers = []
-    for cfg in configs:
+class ToolCache:
+    """Tool schemas per server, keyed by a hash of command + env (env may hold secrets)."""
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: dict = {}
+        if path and path.is_file():
+            try:
+                self._data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                self._data = {}
+
+    @staticmethod
+    def key(cfg: McpServerConfig) -> str:
+        raw = json.dumps([cfg.command, cfg.env or {}], sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    def get(self, cfg: McpServerConfig) -> list[dict] | None:
+        entry = self._data.get(self.key(cfg))
+        return entry["tools"] if entry else None
+
+    def update(self, cfg: McpServerConfig, server: McpServer):
+        """Store what the server reported; write the file only if something changed."""
+        entry = {"name": cfg.name, "version": server.server_version, "tools": server.tool_specs}
+        with self._lock:
+            if self._data.get(self.key(cfg)) == entry:
+                return
+            self._data[self.key(cfg)] = entry
+            if not self.path:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(self._data, indent=1))
+                os.replace(tmp, self.path)
+            except OSError as e:
+                console.print(f"[yellow]mcp: could not write tool cache: {e}[/]")
+
+
+def start_mcp_servers(
+    configs: list[McpServerConfig],
+    cache_path: Path | None = None,
+    daemon_socket: Path | None = None,
+    results: ResultStore | None = None,
+) -> tuple[list[McpTool], list[McpServer]]:
+    """Start all MCP servers concurrently and collect their tools. Returns (tools, servers) for cleanup.
+
+    Servers with cached schemas don't block: their cached tools are returned
+    right away and the server keeps booting in the background. Lazy servers
+    with cached schemas aren't spawned at all until their first call.
+    With daemon_socket, the shared daemon (krim.mcpd) owns the processes instead.
+    With results, large outputs are spilled there instead of truncated.
+    """
+    if daemon_socket:
+        from krim.mcpd import start_remote_servers
+        try:
+            return start_remote_servers(configs, daemon_socket, results)
+        except OSError as e:
+            console.print(f"[yellow]mcp: daemon unavailable ({e}), starting servers locally[/]")
+
+    cache = ToolCache(cache_path)
+    servers = [McpServer(cfg, results) for cfg in configs]
+    cached = {id(s): cache.get(s.config) for s in servers}
+
+    def boot(server: McpServer):
         try:
-            server = McpServer(cfg)
-            server.start()
-            servers.append(server)
-            all_tools.extend(server.tools)
-            console.print(f"[dim]mcp: {cfg.name} started ({len(server.tools)} tools)[/]")
+            with server._lifecycle_lock:  # on-demand calls wait for the boot to finish
+                server.start()
+                server._touch()  # idle servers shut down even if never called
         except Exception as e:
-            console.print(f"[yellow]mcp: failed to start {cfg.name}: {e}[/]")
-    return all_tools, servers
+            console.print(f"[yellow]mcp: failed to start {server.config.name}: {e}[/]")
+            return
+        cache.update(server.config, server)
+        if cached[id(server)] is None:
+            console.print(f"[dim]mcp: {server.config.name} started ({len(server.tools)} tools)[/]")
+
+    threads = []
+    for server in servers:
+        specs = cached[id(server)]
+        if specs is not None:
+            # before the boot starts: once it runs, the live tools/list must win
+            server.tools = server.tools_from_specs(specs)
+        if server.config.lazy and specs is not None:
+            threads.append((server, None))
+            continue
+        t = threading.Thread(target=boot, args=(server,), name=f"mcp-start-{server.config.name}", daemon=True)
+        t.start()
+        threads.append((server, t))
+
+    all_tools = []
+    live = []
+    for server, t in threads:
+        specs = cached[id(server)]
+        if specs is not None:
+            state = "lazy" if t is None else "starting"
+            console.print(f"[dim]mcp: {server.config.name} {state} ({len(specs)} cached tools)[/]")
+        else:
+            t.join()
+            if server._start_error or not server.process:
+                server.stop()
+                continue
+        live.append(server)
+        all_tools.extend(server.tools)
+
+    # the agent holds all_tools itself: keep it current when a server's list changes
+    lock = threading.Lock()
+
+    def rebuild():
+        with lock:
+            all_tools[:] = [t for s in live for t in s.tools]
+
+    for server in live:
+        server.on_tools_changed(rebuild)
+    rebuild()  # a boot may have replaced cached tools before the listener was in place
+    return all_tools, live
@@ -0,0 +1,328 @@
+"""Shared MCP daemon - one pool of MCP server processes for many krim processes.
+
+krim clients connect over a Unix socket (~/.krim/mcpd.sock) and speak
+newline-delimited JSON:
+  {"id": 1, "op": "tools", "server": {<McpServerConfig>}}             -> {"id": 1, "tools": [...]}
+  {"id": 2, "op": "call", "server": {...}, "tool": "x", "args": {...}} -> {"id": 2, "result": "..."}
+Failures come back as {"id": n, "error": "..."}.
+
+Servers are pooled by command + env (ToolCache.key), so 20 agents share one
+process per server. Requests are answered on their own threads, so one slow
+call doesn't hold up the others.
+
+Run with `python -m krim.mcpd`. krim starts it on demand when "mcp_daemon" is set;
+it exits after DAEMON_IDLE_EXIT seconds without clients.
+
+A client can make the daemon spawn any command, so only the daemon's own
+user may connect: the socket is created 0600 and, where the platform
+reports it (SO_PEERCRED), each connection's uid is checked too.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import asdict
+from pathlib import Path
+
+from rich.console import Console
+
+from krim.mcp import MCP_READ_TIMEOUT, McpServer, McpServerConfig, McpTool, ToolCache, tools_from_specs
+from krim.spill import ResultStore
+from krim.truncate import truncate
+
+DAEMON_IDLE_EXIT = 600  # seconds without clients before the daemon exits
+DAEMON_CONNECT_TIMEOUT = 5  # seconds to wait for an autostarted daemon
+
+console = Console()
+
+
+# -- daemon --
+
+class _Passthrough:
+    """Result sink that keeps output whole (the client decides what the model sees)."""
+
+    def limit(self, text: str, max_chars: int) -> str:
+        return text
+
+
+class McpDaemon:
+    def __init__(self, socket_path: Path, idle_exit: float = DAEMON_IDLE_EXIT):
+        self.socket_path = socket_path
+        self.idle_exit = idle_exit
+        self._servers: dict[str, McpServer] = {}
+        self._lock = threading.Lock()
+        self._clients = 0
+        self._last_seen = time.monotonic()
+
+    def _server(self, spec: dict) -> McpServer:
+        """Pooled server for a config, started if it needs to be."""
+        cfg = McpServerConfig(**spec)
+        key = ToolCache.key(cfg)
+        with self._lock:
+            server = self._servers.get(key)
+            if server is None:
+                # no truncation in the pool: each client spills/truncates for itself
+                server = self._servers[key] = McpServer(cfg, results=_Passthrough())
+        on_demand = cfg.lazy or server.idle_timeout
+        with server._lifecycle_lock:
+            # on-demand servers respawn inside call_tool; others restart here if they died
+            if not server.running and (not server.tool_specs or not on_demand):
+                try:
+                    server.start()
+                except Exception:
+                    server.stop()
+                    raise
+                server._touch()
+                console.print(f"[dim]mcpd: {cfg.name} started ({len(server.tools)} tools)[/]")
+        return server
+
+    def _respond(self, req: dict, conn: socket.socket, wlock: threading.Lock):
+        reply: dict = {"id": req.get("id")}
+        try:
+            server = self._server(req["server"])
+            if req["op"] == "tools":
+                reply["tools"] = server.tool_specs
+            elif req["op"] == "call":
+                reply["result"] = server.call_tool(req["tool"], req.get("args") or {})
+            else:
+                reply["error"] = f"unknown op: {req['op']}"
+        except Exception as e:
+            reply["error"] = str(e)
+        data = (json.dumps(reply) + "\n").encode("utf-8")
+        with wlock:
+            try:
+                conn.sendall(data)
+            except OSError:
+                pass  # client went away
+
+    def _handle(self, conn: socket.socket):
+        wlock = threading.Lock()
+        with self._lock:
+            self._clients += 1
+        try:
+            with conn, conn.makefile("rb") as rfile:
+                for line in rfile:
+                    try:
+                        req = json.loads(line)
+                    except ValueError:
+                        continue
+                    threading.Thread(target=self._respond, args=(req, conn, wlock), daemon=True).start()
+        finally:
+            with self._lock:
+                self._clients -= 1
+                self._last_seen = time.monotonic()
+
+    def serve(self):
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # one daemon per socket: a second one started in a race just exits
+        lock = open(self.socket_path.with_suffix(".lock"), "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return
+        if self.socket_path.exists():
+            self.socket_path.unlink()  # stale socket from a dead daemon
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)  # no window where the socket exists with looser permissions
+        try:
+            sock.bind(str(self.socket_path))
+        finally:
+            os.umask(umask)
+        os.chmod(self.socket_path, 0o600)
+        sock.listen()
+        sock.settimeout(1.0)
+        console.print(f"[dim]mcpd: listening on {self.socket_path}[/]")
+        try:
+            while True:
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    with self._lock:
+                        idle = self._clients == 0 and time.monotonic() - self._last_seen > self.idle_exit
+                    if idle:
+                        break
+                    continue
+                if not _same_user(conn):
+                    conn.close()
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            sock.close()
+            self.socket_path.unlink(missing_ok=True)
+            for server in self._servers.values():
+                server.stop()
+            lock.close()
+
+
+def _same_user(conn: socket.socket) -> bool:
+    """Is the peer running as our uid? True where the platform can't tell (the 0600 socket still applies)."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _pid, uid, _gid = struct.unpack("3i", creds)
+    return uid == os.getuid()
+
+
+# -- client --
+
+class DaemonClient:
+    """One connection to the daemon, shared by all of this process's remote servers."""
+
+    def __init__(self, socket_path: Path):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(str(socket_path))
+        self._wlock = threading.Lock()
+        self._pending: dict[int, Future] = {}
+        self._next_id = 0
+        self._closed = False
+        threading.Thread(target=self._read_loop, name="mcpd-client", daemon=True).start()
+
+    def _read_loop(self):
+        try:
+            with self._sock.makefile("rb") as rfile:
+                for line in rfile:
+                    msg = json.loads(line)
+                    fut = self._pending.pop(msg.get("id"), None)
+                    if fut and not fut.done():
+                        fut.set_result(msg)
+        except (OSError, ValueError):
+            pass
+        with self._wlock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("MCP daemon closed connection"))
+
+    def request(self, payload: dict, timeout: float = MCP_READ_TIMEOUT + 5) -> dict:
+        fut: Future = Future()
+        with self._wlock:
+            if self._closed:
+                raise ConnectionError("MCP daemon closed connection")
+            self._next_id += 1
+            req_id = self._next_id
+            self._pending[req_id] = fut
+            self._sock.sendall((json.dumps({**payload, "id": req_id}) + "\n").encode("utf-8"))
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            self._pending.pop(req_id, None)
+            raise TimeoutError(f"MCP daemon did not respond within {timeout}s") from None
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+class RemoteMcpServer:
+    """Stands in for McpServer when the daemon owns the process."""
+
+    def __init__(self, config: McpServerConfig, client: DaemonClient, results: ResultStore | None = None):
+        self.config = config
+        self._client = client
+        self.results = results
+        self.tools: list[McpTool] = []
+
+    def discover(self):
+        resp = self._client.request({"op": "tools", "server": asdict(self.config)})
+        if "error" in resp:
+            raise RuntimeError(resp["error"])
+        self.tools = tools_from_specs(resp["tools"], self)
+
+    def call_tool(self, name: str, args: dict) -> str:
+        try:
+            resp = self._client.request({"op": "call", "server": asdict(self.config), "tool": name, "args": args})
+        except Exception as e:
+            return f"error: MCP call failed: {e}"
+        if "error" in resp:
+            return f"error: {resp['error']}"
+        if self.results:
+            return self.results.limit(resp["result"], 30_000)
+        return truncate(resp["result"], 30_000)
+
+    def stop(self):
+        self._client.close()
+
+
+def connect(socket_path: Path, autostart: bool = True) -> DaemonClient:
+    """Connect to the daemon, starting one in the background if nobody is listening."""
+    try:
+        return DaemonClient(socket_path)
+    except OSError:
+        if not autostart:
+            raise
+    subprocess.Popen(
+        [sys.executable, "-m", "krim.mcpd", "--socket", str(socket_path)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,  # outlives this krim process
+    )
+    deadline = time.monotonic() + DAEMON_CONNECT_TIMEOUT
+    while True:
+        try:
+            return DaemonClient(socket_path)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def start_remote_servers(
+    configs: list[McpServerConfig],
+    socket_path: Path,
+    results: ResultStore | None = None,
+) -> tuple[list[McpTool], list[RemoteMcpServer]]:
+    """Like start_mcp_servers, but the daemon owns the processes."""
+    client = connect(socket_path)
+    servers = [RemoteMcpServer(cfg, client, results) for cfg in configs]
+    errors: dict[str, Exception] = {}
+
+    def discover(server: RemoteMcpServer):
+        try:
+            server.discover()
+        except Exception as e:
+            errors[server.config.name] = e
+
+    threads = [threading.Thread(target=discover, args=(s,), daemon=True) for s in servers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    all_tools = []
+    live = []
+    for server in servers:
+        if server.config.name in errors:
+            console.print(f"[yellow]mcp: failed to start {server.config.name}: {errors[server.config.name]}[/]")
+            continue
+        console.print(f"[dim]mcp: {server.config.name} via daemon ({len(server.tools)} tools)[/]")
+        live.append(server)
+        all_tools.extend(server.tools)
+    return all_tools, live
+
+
+def main():
+    p = argparse.ArgumentParser(prog="krim.mcpd", description="Shared MCP server pool for krim.")
+    p.add_argument("--socket", default=str(Path.home() / ".krim" / "mcpd.sock"))
+    p.add_argument("--idle-exit", type=float, default=DAEMON_IDLE_EXIT,
+                   help="exit after this many seconds without clients")
+    args = p.parse_args()
+    McpDaemon(Path(os.path.expanduser(args.socket)), idle_exit=args.idle_exit).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,43 @@ from __future__ import annotations
 from krim.models.base import Model
 from krim.models.claude import ClaudeModel
 from krim.models.openai import OpenAIModel
+from krim.models.replay import RecordingModel, ReplayModel
+from krim.models.router import RouterModel, RoutingRules
 
 DEFAULT_MODELS = {
     "claude": "claude-sonnet-4-5-20250929",
     "openai": "gpt-4o",
 }
 
+FAST_MODELS = {
+    "claude": "claude-haiku-4-5-20251001",
+    "openai": "gpt-4o-mini",
+}
 
-def create_model(provider: str, model: str | None = None) -> Model:
-    model_name = model or DEFAULT_MODELS.get(provider, "gpt-4o")
+
+def _create_single(provider: str, model_name: str) -> Model:
     if provider == "claude":
         return ClaudeModel(model_name)
     elif provider == "openai":
         return OpenAIModel(model_name)
+    elif provider == "replay":
+        return ReplayModel(model_name)  # model name is the fixture path
     else:
         raise ValueError(f"unknown provider: {provider}")
+
+
+def create_model(
+    provider: str,
+    model: str | None = None,
+    fast_model: str | None = None,
+    routing: dict | None = None,
+) -> Model:
+    """Build the model for a run. With fast_model set, wrap both tiers in a RouterModel."""
+    if provider == "replay" and not model:
+        raise ValueError("replay provider needs a fixture: --model PATH")
+    model_name = model or DEFAULT_MODELS.get(provider, "gpt-4o")
+    strong = _create_single(provider, model_name)
+    if provider == "replay" or not fast_model or fast_model == model_name:
+        return strong
+    fast = _create_single(provider, fast_model)
+    return RouterModel(strong, fast, RoutingRules(**(routing or {})))
@@ -19,6 +19,7 @@ class ModelResponse:
     text: str | None
     tool_calls: list[ToolCall]
     stop: bool  # model wants to stop (no more tool calls, final answer)
+    usage: dict | None = None  # {"input_tokens", "output_tokens"} when the API reports it
 
 
 class Model(ABC):
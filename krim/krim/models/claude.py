@@ -4,11 +4,29 @@ from __future__ import annotations
 
 import json
 import os
+from dataclasses import dataclass, field
 from typing import Callable
 
 from anthropic import Anthropic
 
+from krim import cancellation
 from krim.models.base import Model, ModelResponse, ToolCall
+from krim.retry import is_retriable
+
+
+@dataclass
+class _Checkpoint:
+    """Content received before a stream broke, so the retry can pick up from there."""
+    key: tuple
+    text: str = ""
+    tool_calls: list[ToolCall] = field(default_factory=list)
+
+
+def _usage(message) -> dict | None:
+    usage = getattr(message, "usage", None)
+    if usage is None:
+        return None
+    return {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
 
 
 class ClaudeModel(Model):
@@ -16,6 +34,7 @@ class ClaudeModel(Model):
         self.model = model
         self.max_tokens = max_tokens
         self.client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+        self._checkpoint: _Checkpoint | None = None
 
     def chat(
         self,
@@ -42,48 +61,89 @@ class ClaudeModel(Model):
             kwargs["tools"] = tools
 
         if stream_callback:
-            return self._stream(kwargs, stream_callback)
+            # with_retry calls us again with the same list; that's how we recognise a resume
+            return self._stream(kwargs, stream_callback, key=(id(messages), len(messages)))
         else:
             resp = self.client.messages.create(**kwargs)
             return self._parse(resp)
 
-    def _stream(self, kwargs: dict, callback: Callable[[str], None]) -> ModelResponse:
+    def _stream(self, kwargs: dict, callback: Callable[[str], None], key: tuple = ()) -> ModelResponse:
+        """Stream a response, resuming from the checkpoint a dropped stream left behind.
+
+        Completed tool_use blocks are returned as-is (the agent runs them, the
+        model re-issues anything it didn't finish). Partial text is sent back
+        as an assistant prefill so only the remainder is generated and printed.
+        """
+        cp = self._checkpoint if self._checkpoint and self._checkpoint.key == key else None
+        self._checkpoint = None
+        if cp and cp.tool_calls:
+            return ModelResponse(text=cp.text or None, tool_calls=cp.tool_calls, stop=False)
+
         text_parts: list[str] = []
         tool_calls: list[ToolCall] = []
-        current_tool: dict | None = None
 
-        with self.client.messages.stream(**kwargs) as stream:
-            for event in stream:
-                if event.type == "content_block_start":
-                    if hasattr(event.content_block, "type"):
-                        if event.content_block.type == "tool_use":
-                            current_tool = {
-                                "id": event.content_block.id,
-                                "name": event.content_block.name,
-                                "input_json": "",
-                            }
-                elif event.type == "content_block_delta":
-                    if event.delta.type == "text_delta":
-                        callback(event.delta.text)
-                        text_parts.append(event.delta.text)
-                    elif event.delta.type == "input_json_delta":
-                        if current_tool:
-                            current_tool["input_json"] += event.delta.partial_json
-                elif event.type == "content_block_stop":
-                    if current_tool:
-                        args = json.loads(current_tool["input_json"]) if current_tool["input_json"] else {}
-                        tool_calls.append(ToolCall(
-                            id=current_tool["id"],
-                            name=current_tool["name"],
-                            args=args,
-                        ))
-                        current_tool = None
+        # API rejects a prefill that ends in whitespace
+        prefill = cp.text.rstrip() if cp else ""
+        if prefill:
+            text_parts.append(prefill)
+            kwargs = {**kwargs, "messages": kwargs["messages"] + [{"role": "assistant", "content": prefill}]}
 
-            final = stream.get_final_message()
+        try:
+            final = self._consume(kwargs, callback, text_parts, tool_calls)
+        except Exception as e:
+            if is_retriable(e) and (text_parts or tool_calls):
+                self._checkpoint = _Checkpoint(key=key, text="".join(text_parts), tool_calls=tool_calls)
+            raise
 
         text = "".join(text_parts) or None
         stop = final.stop_reason == "end_turn"
-        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop)
+        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop, usage=_usage(final))
+
+    def _consume(self, kwargs: dict, callback: Callable[[str], None],
+                 text_parts: list[str], tool_calls: list[ToolCall]):
+        """Drain one stream into text_parts/tool_calls, so progress survives an exception."""
+        token = cancellation.current()
+
+        # cancelling closes the connection, which also unblocks a stalled read
+        with self.client.messages.stream(**kwargs) as stream, token.on_cancel(stream.close):
+            try:
+                return self._drain(stream, token, callback, text_parts, tool_calls)
+            except Exception:
+                if token.cancelled:
+                    raise cancellation.Cancelled() from None
+                raise
+
+    def _drain(self, stream, token: cancellation.CancelToken, callback: Callable[[str], None],
+               text_parts: list[str], tool_calls: list[ToolCall]):
+        current_tool: dict | None = None
+        for event in stream:
+            token.check()
+            if event.type == "content_block_start":
+                if hasattr(event.content_block, "type"):
+                    if event.content_block.type == "tool_use":
+                        current_tool = {
+                            "id": event.content_block.id,
+                            "name": event.content_block.name,
+                            "input_json": "",
+                        }
+            elif event.type == "content_block_delta":
+                if event.delta.type == "text_delta":
+                    callback(event.delta.text)
+                    text_parts.append(event.delta.text)
+                elif event.delta.type == "input_json_delta":
+                    if current_tool:
+                        current_tool["input_json"] += event.delta.partial_json
+            elif event.type == "content_block_stop":
+                if current_tool:
+                    args = json.loads(current_tool["input_json"]) if current_tool["input_json"] else {}
+                    tool_calls.append(ToolCall(
+                        id=current_tool["id"],
+                        name=current_tool["name"],
+                        args=args,
+                    ))
+                    current_tool = None
+
+        return stream.get_final_message()
 
     def _parse(self, resp) -> ModelResponse:
         text_parts: list[str] = []
@@ -99,4 +159,4 @@ class ClaudeModel(Model):
                 ))
         text = "\n".join(text_parts) or None
         stop = resp.stop_reason == "end_turn"
-        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop)
+        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop, usage=_usage(resp))
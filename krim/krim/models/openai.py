@@ -8,9 +8,17 @@ from typing import Callable
 
 from openai import OpenAI
 
+from krim import cancellation
 from krim.models.base import Model, ModelResponse, ToolCall
 
 
+def _usage(resp) -> dict | None:
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return None
+    return {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens}
+
+
 class OpenAIModel(Model):
     def __init__(self, model: str = "gpt-4o", max_tokens: int = 16_384):
         self.model = model
@@ -55,10 +63,39 @@ class OpenAIModel(Model):
 
     def _stream(self, kwargs: dict, callback: Callable[[str], None]) -> ModelResponse:
         kwargs["stream"] = True
+        kwargs["stream_options"] = {"include_usage": True}  # else streamed chunks never carry usage
         text_parts: list[str] = []
         tool_calls_map: dict[int, dict] = {}
+        token = cancellation.current()
+
+        stream = self.client.chat.completions.create(**kwargs)
+        # cancelling closes the connection, which also unblocks a stalled read
+        with token.on_cancel(stream.close):
+            try:
+                usage = self._drain(stream, token, callback, text_parts, tool_calls_map)
+            except Exception:
+                if token.cancelled:
+                    raise cancellation.Cancelled() from None
+                raise
+
+        tool_calls: list[ToolCall] = []
+        for idx in sorted(tool_calls_map):
+            tc = tool_calls_map[idx]
+            args = json.loads(tc["args"]) if tc["args"] else {}
+            tool_calls.append(ToolCall(id=tc["id"], name=tc["name"], args=args))
 
-        for chunk in self.client.chat.completions.create(**kwargs):
+        text = "".join(text_parts) or None
+        stop = len(tool_calls) == 0
+        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop, usage=usage)
+
+    def _drain(self, stream, token: cancellation.CancelToken, callback: Callable[[str], None],
+               text_parts: list[str], tool_calls_map: dict[int, dict]) -> dict | None:
+        usage = None
+        for chunk in stream:
+            token.check()
+            # the last chunk (empty choices) carries usage, per stream_options include_usage
+            if getattr(chunk, "usage", None):
+                usage = _usage(chunk)
             delta = chunk.choices[0].delta if chunk.choices else None
             if not delta:
                 continue
@@ -78,16 +115,7 @@ class OpenAIModel(Model):
                         tool_calls_map[idx]["name"] = tc.function.name
                     if tc.function and tc.function.arguments:
                         tool_calls_map[idx]["args"] += tc.function.arguments
-
-        tool_calls: list[ToolCall] = []
-        for idx in sorted(tool_calls_map):
-            tc = tool_calls_map[idx]
-            args = json.loads(tc["args"]) if tc["args"] else {}
-            tool_calls.append(ToolCall(id=tc["id"], name=tc["name"], args=args))
-
-        text = "".join(text_parts) or None
-        stop = len(tool_calls) == 0
-        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop)
+        return usage
 
     def _parse(self, resp) -> ModelResponse:
         msg = resp.choices[0].message
@@ -102,4 +130,4 @@ class OpenAIModel(Model):
                     args=args,
                 ))
         stop = resp.choices[0].finish_reason == "stop"
-        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop)
+        return ModelResponse(text=text, tool_calls=tool_calls, stop=stop, usage=_usage(resp))
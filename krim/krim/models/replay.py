@@ -0,0 +1,140 @@
+"""Replay provider - play recorded model responses back without a network.
+
+Fixture format: JSONL, one record per line (same shape as session logs):
+  {"t": "meta", "delay": 0.01, "latency": 0.2}          # optional defaults
+  {"t": "response", "chunks": ["Hel", "lo"], "tool_calls": [{"id", "name", "args"}],
+   "stop": true, "latency": 0.41, "delay": 0.012}
+
+Responses are returned in order, one per chat() call; the messages sent in
+are ignored. Streaming calls get each chunk after `latency` (time to first
+token) and `delay` between chunks. Record a real run with `--record PATH`,
+replay it with `--provider replay --model PATH`.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from krim import cancellation
+from krim.models.base import Model, ModelResponse, ToolCall
+
+
+class ReplayModel(Model):
+    def __init__(self, path: str | Path, delay: float | None = None, latency: float | None = None):
+        """delay/latency override the fixture's timings (0 = as fast as possible)."""
+        self.path = Path(path)
+        self.delay = delay
+        self.latency = latency
+        self._defaults: dict = {}
+        self._records: list[dict] = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get("t") == "meta":
+                    self._defaults = rec
+                elif rec.get("t") == "response":
+                    self._records.append(rec)
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def _timing(self, rec: dict, key: str) -> float:
+        override = getattr(self, key)
+        if override is not None:
+            return override
+        return rec.get(key, self._defaults.get(key, 0.0))
+
+    def chat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        stream_callback: Callable[[str], None] | None = None,
+    ) -> ModelResponse:
+        with self._lock:
+            if self._next >= len(self._records):
+                raise RuntimeError(f"replay: {self.path} has no more responses ({len(self._records)} played)")
+            rec = self._records[self._next]
+            self._next += 1
+
+        chunks = rec.get("chunks") or []
+        if stream_callback:
+            token = cancellation.current()
+            latency = self._timing(rec, "latency")
+            delay = self._timing(rec, "delay")
+            if latency and token.wait(latency):
+                raise cancellation.Cancelled()
+            for i, chunk in enumerate(chunks):
+                if i and delay and token.wait(delay):
+                    raise cancellation.Cancelled()
+                stream_callback(chunk)
+
+        text = "".join(chunks)
+        tool_calls = [ToolCall(id=tc["id"], name=tc["name"], args=tc.get("args") or {})
+                      for tc in rec.get("tool_calls") or []]
+        return ModelResponse(
+            text=text or None,
+            tool_calls=tool_calls,
+            stop=rec.get("stop", not tool_calls),
+            usage=rec.get("usage"),
+        )
+
+
+class RecordingModel(Model):
+    """Wraps a real model and appends each response to a replay fixture."""
+
+    def __init__(self, inner: Model, path: str | Path):
+        self.inner = inner
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._f = open(self.path, "w", encoding="utf-8")
+
+    def _write(self, record: dict):
+        with self._lock:
+            self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._f.flush()
+
+    def chat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        stream_callback: Callable[[str], None] | None = None,
+    ) -> ModelResponse:
+        chunks: list[str] = []
+        stamps: list[float] = []
+        callback = None
+        if stream_callback:
+            def callback(chunk: str):
+                stamps.append(time.perf_counter())
+                chunks.append(chunk)
+                stream_callback(chunk)
+
+        start = time.perf_counter()
+        response = self.inner.chat(messages, tools, callback)
+
+        # a resumed stream or non-streaming call only has the final text
+        if "".join(chunks) != (response.text or ""):
+            chunks = [response.text] if response.text else []
+            stamps = []
+        record: dict = {
+            "t": "response",
+            "chunks": chunks,
+            "tool_calls": [{"id": tc.id, "name": tc.name, "args": tc.args} for tc in response.tool_calls],
+            "stop": response.stop,
+            "latency": round((stamps[0] if stamps else time.perf_counter()) - start, 4),
+        }
+        if len(stamps) > 1:
+            record["delay"] = round((stamps[-1] - stamps[0]) / (len(stamps) - 1), 4)
+        if response.usage:
+            record["usage"] = response.usage
+        self._write(record)
+        return response
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
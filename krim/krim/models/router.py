@@ -0,0 +1,102 @@
+"""Model routing - send easy turns to a fast model, hard ones to the strong one.
+
+Both tiers share a provider (message formats are provider-specific).
+
+Strong tier:
+- first turn of a request (the model is planning)
+- the last tool call failed (error:, exit code != 0)
+- the conversation is large (cheap models lose track of long context)
+Fast tier:
+- tool-less calls (forced summaries after max turns / doom loop)
+- short tool follow-ups once the run is under way
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+
+from krim.compaction import estimate_message_tokens
+from krim.models.base import Model, ModelResponse
+
+
+@dataclass
+class RoutingRules:
+    strong_turns: int = 1                # first N turns of a request always go strong
+    follow_up_max_chars: int = 4_000     # tool results larger than this go strong
+    large_context_tokens: int = 60_000   # conversations larger than this go strong
+    summaries_fast: bool = True          # tool-less calls (final summaries) go fast
+
+
+def _tail_tool_results(messages: list[dict]) -> list[str] | None:
+    """Tool result texts from the trailing message(s), or None if the last turn wasn't tools."""
+    if not messages:
+        return None
+    last = messages[-1]
+    if last.get("role") == "tool":  # openai: one message per result
+        results = []
+        for m in reversed(messages):
+            if m.get("role") != "tool":
+                break
+            results.append(str(m.get("content", "")))
+        return results
+    content = last.get("content")
+    if last.get("role") == "user" and isinstance(content, list):
+        results = [
+            str(b.get("content", "")) for b in content
+            if isinstance(b, dict) and b.get("type") == "tool_result"
+        ]
+        return results or None
+    return None
+
+
+def _turns_since_user(messages: list[dict]) -> int:
+    """Assistant turns since the last plain-text user message."""
+    turns = 0
+    for m in reversed(messages):
+        if m.get("role") == "assistant":
+            turns += 1
+        elif m.get("role") == "user" and isinstance(m.get("content"), str):
+            break
+    return turns
+
+
+def _is_error(result: str) -> bool:
+    return result.startswith("error:") or "[exit code:" in result[-200:]
+
+
+class RouterModel(Model):
+    def __init__(self, strong: Model, fast: Model, rules: RoutingRules | None = None):
+        self.strong = strong
+        self.fast = fast
+        self.rules = rules or RoutingRules()
+        self.counts = {"strong": 0, "fast": 0}
+
+    def route(self, messages: list[dict], tools: list[dict]) -> str:
+        """Pick a tier: 'strong' or 'fast'."""
+        r = self.rules
+        if not tools:
+            return "fast" if r.summaries_fast else "strong"
+        if _turns_since_user(messages) < r.strong_turns:
+            return "strong"
+        results = _tail_tool_results(messages)
+        if results is None:
+            return "strong"
+        if any(_is_error(res) for res in results):
+            return "strong"
+        if sum(len(res) for res in results) > r.follow_up_max_chars:
+            return "strong"
+        if estimate_message_tokens(messages) > r.large_context_tokens:
+            return "strong"
+        return "fast"
+
+    def chat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        stream_callback: Callable[[str], None] | None = None,
+    ) -> ModelResponse:
+        tier = self.route(messages, tools)
+        self.counts[tier] += 1
+        model = self.strong if tier == "strong" else self.fast
+        return model.chat(messages, tools, stream_callback)
@@ -0,0 +1,169 @@
+"""Child processes for bash - own session, rlimits, whole-tree kill, resource usage.
+
+Each command is the leader of a new session, so it has a process group of
+its own. Ctrl-C goes to krim, not to the command, and a timeout or cancel
+kills the whole group (background children included), not just the shell.
+
+Optional per-command rlimits are applied in the child before exec:
+  "bash_limits": {"memory_mb": 4096, "cpu_seconds": 600, "open_files": 1024, "processes": 512}
+memory_mb caps address space; processes is RLIMIT_NPROC, which counts all of
+the user's processes, not just this command's.
+
+The shell is reaped with wait4, which reports peak RSS and CPU time for the
+shell and every child it waited for.
+"""
+
+from __future__ import annotations
+
+import os
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import IO, Any
+
+from krim import cancellation
+
+# config key -> (resource, unit multiplier)
+LIMITS = {
+    "memory_mb": (resource.RLIMIT_AS, 1024 * 1024),
+    "cpu_seconds": (resource.RLIMIT_CPU, 1),
+    "open_files": (resource.RLIMIT_NOFILE, 1),
+    "processes": (resource.RLIMIT_NPROC, 1),
+}
+
+
+@dataclass
+class Usage:
+    cpu_seconds: float
+    peak_rss_mb: float
+
+
+@dataclass
+class Completed:
+    returncode: int
+    stdout: str
+    stderr: str
+    usage: Usage | None = None
+    timed_out: bool = False
+    cancelled: bool = False
+
+
+def rlimits(limits: dict | None) -> list[tuple[int, int, int]]:
+    """Validate a bash_limits dict into (resource, soft, hard) triples, clamped to the current hard limits."""
+    pairs = []
+    for key, value in (limits or {}).items():
+        if key not in LIMITS:
+            raise ValueError(f"unknown bash limit '{key}' (expected one of: {', '.join(LIMITS)})")
+        if value is None:
+            continue
+        res, unit = LIMITS[key]
+        soft = int(value * unit)
+        # cpu: SIGXCPU at the soft limit, SIGKILL a second later (equal limits go straight to SIGKILL)
+        hard = soft + 1 if res == resource.RLIMIT_CPU else soft
+        _, current = resource.getrlimit(res)
+        if current != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current), min(hard, current)
+        pairs.append((res, soft, hard))
+    return pairs
+
+
+def spawn(command: str, cwd: str, limits: list[tuple[int, int, int]] | None = None,
+          stdout=subprocess.PIPE, stderr=subprocess.PIPE) -> subprocess.Popen:
+    preexec = None
+    if limits:
+        def preexec():
+            for res, soft, hard in limits:
+                resource.setrlimit(res, (soft, hard))
+    return subprocess.Popen(
+        command,
+        shell=True,
+        stdout=stdout,
+        stderr=stderr,
+        cwd=cwd,
+        start_new_session=True,
+        preexec_fn=preexec,
+    )
+
+
+def kill_group(proc: subprocess.Popen):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _usage(ru) -> Usage:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = ru.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else ru.ru_maxrss / 1024
+    return Usage(cpu_seconds=round(ru.ru_utime + ru.ru_stime, 3), peak_rss_mb=round(rss, 1))
+
+
+def reap(proc: subprocess.Popen) -> Usage | None:
+    """Wait for proc with wait4 (blocking) and record its exit code. Returns its usage."""
+    try:
+        _, status, ru = os.wait4(proc.pid, 0)
+    except ChildProcessError:  # already reaped elsewhere
+        proc.wait()
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return _usage(ru)
+
+
+def _drain(stream: IO[Any], into: list[bytes]):
+    # raw reads: whatever has arrived is kept even if the pipe never reaches EOF
+    fd = stream.fileno()
+    try:
+        for chunk in iter(lambda: os.read(fd, 65536), b""):
+            into.append(chunk)
+    except OSError:
+        pass
+    finally:
+        stream.close()
+
+
+def decode(chunks: list[bytes]) -> str:
+    return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+def run(command: str, cwd: str, timeout: float, limits: list[tuple[int, int, int]] | None = None) -> Completed:
+    """Run a shell command to completion, timeout or cancel (the active token)."""
+    token = cancellation.current()
+    proc = spawn(command, cwd, limits)
+    out: list[bytes] = []
+    err: list[bytes] = []
+    readers = [
+        threading.Thread(target=_drain, args=(proc.stdout, out), daemon=True),
+        threading.Thread(target=_drain, args=(proc.stderr, err), daemon=True),
+    ]
+    result: dict = {}
+    reaper = threading.Thread(target=lambda: result.update(usage=reap(proc)), daemon=True)
+    for t in (*readers, reaper):
+        t.start()
+
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    with token.on_cancel(lambda: kill_group(proc)):
+        # done = the shell exited and nothing it started still holds the output pipes
+        for t in (reaper, *readers):
+            t.join(max(0.0, deadline - time.monotonic()))
+            if t.is_alive():
+                timed_out = True
+                break
+    if timed_out:
+        kill_group(proc)
+        reaper.join()
+        for t in readers:
+            t.join(1)  # a process that left the group may still hold a pipe
+
+    return Completed(
+        returncode=proc.returncode if proc.returncode is not None else -signal.SIGKILL,
+        stdout=decode(out),
+        stderr=decode(err),
+        usage=result.get("usage"),
+        timed_out=timed_out and not token.cancelled,
+        cancelled=token.cancelled,
+    )
@@ -0,0 +1,175 @@
+"""Span profiling - where did a run's time go?
+
+Off by default: span() hands back one shared no-op context manager, so
+instrumented code pays a global lookup and a None check.
+
+--profile                flame-style tree on exit
+--profile-out trace.json also write Chrome trace events (chrome://tracing, Perfetto)
+--profile-out run.prof   also write cProfile stats (python -m pstats, snakeviz)
+
+Span names are dotted by area: agent.run, model.chat, render, tool.<name>,
+mcp.<method>, git.<subcommand>, context.*, prompt.build, compact.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable, TypeVar
+
+from rich.console import Console
+
+console = Console()
+
+F = TypeVar("F", bound=Callable)
+
+_NOOP = contextlib.nullcontext()
+_profiler: Profiler | None = None
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start", "path")
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        stack.append(self.name)
+        self.path = tuple(stack)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler._stack().pop()
+        self.profiler.events.append((self.path, self.start, end - self.start, threading.get_ident()))
+        return False
+
+
+class Profiler:
+    def __init__(self, output: str | None = None):
+        self.output = output
+        self.events: list[tuple[tuple[str, ...], int, int, int]] = []  # path, start ns, duration ns, thread
+        self._local = threading.local()
+        self._start = time.perf_counter_ns()
+        self._cprofile: cProfile.Profile | None = None
+        if output and output.endswith((".prof", ".pstats")):
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def _stack(self) -> list[str]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def tree(self) -> dict[tuple[str, ...], list[int]]:
+        """Total ns and count per span path, in first-seen order."""
+        totals: dict[tuple[str, ...], list[int]] = {}
+        for path, start, dur, _ in sorted(self.events, key=lambda e: e[1]):
+            entry = totals.setdefault(path, [0, 0])
+            entry[0] += dur
+            entry[1] += 1
+        return totals
+
+    def report(self) -> str:
+        wall = time.perf_counter_ns() - self._start
+        totals = self.tree()
+        # children under their parents, siblings by time spent
+        def children(parent: tuple[str, ...]) -> list[tuple[str, ...]]:
+            kids = [p for p in totals if p[:-1] == parent]
+            return sorted(kids, key=lambda p: -totals[p][0])
+
+        name_width = max((2 * (len(p) - 1) + len(p[-1]) for p in totals), default=0)
+        lines = [f"profile: {wall / 1e9:.2f}s wall"]
+
+        def walk(path: tuple[str, ...]):
+            ns, count = totals[path]
+            share = ns / wall if wall else 0
+            bar = "█" * round(share * 20)
+            label = "  " * (len(path) - 1) + path[-1]
+            lines.append(f"  {label:<{name_width}}  {ns / 1e9:>8.3f}s {share:>4.0%}  x{count:<5} {bar}")
+            for kid in children(path):
+                walk(kid)
+
+        for root in children(()):
+            walk(root)
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": path[-1], "cat": path[-1].split(".")[0], "ph": "X",
+                    "ts": (start - self._start) / 1e3, "dur": dur / 1e3,
+                    "pid": pid, "tid": tid,
+                }
+                for path, start, dur, tid in self.events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def finish(self):
+        if self._cprofile:
+            self._cprofile.disable()
+        console.print(f"\n[dim]{self.report()}[/]", highlight=False)
+        if not self.output:
+            return
+        try:
+            if self._cprofile:
+                self._cprofile.dump_stats(self.output)
+            else:
+                with open(self.output, "w") as f:
+                    json.dump(self.chrome_trace(), f)
+            console.print(f"[dim]profile written to {self.output}[/]")
+        except OSError as e:
+            console.print(f"[yellow]profile: could not write {self.output}: {e}[/]")
+
+
+def start(output: str | None = None) -> Profiler:
+    global _profiler
+    _profiler = Profiler(output)
+    return _profiler
+
+
+def stop() -> Profiler | None:
+    """Stop collecting and return the profiler (report with .finish())."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def enabled() -> bool:
+    return _profiler is not None
+
+
+def span(name: str):
+    profiler = _profiler
+    if profiler is None:
+        return _NOOP
+    return profiler.span(name)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator form of span() for whole functions."""
+    def wrap(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return fn(*args, **kwargs)
+            with profiler.span(name):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return wrap
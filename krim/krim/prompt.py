@@ -14,13 +14,15 @@ from __future__ import annotations
 
 from krim.config import KrimConfig
 from krim.context import build_context
+from krim.profiling import traced
 
 CORE = """You are krim, a coding agent running in the user's terminal.
-You have tools: read, write, edit, bash.
+You have tools: read, read_many, write, edit, glob, bash, job.
 Be direct. Fix root causes, not symptoms. After editing code, verify your changes with bash (run tests, lint, compile). When done, say so.
-Tool notes: bash working directory persists across calls (cd works). edit uses fuzzy matching if exact match fails."""
+Tool notes: bash working directory persists across calls (cd works). Use glob (not find/ls) to locate files and read_many to read several at once. edit uses fuzzy matching if exact match fails. edit and write return a diff and any syntax error (Python, JSON, TOML, YAML), so no need to re-read or py_compile. Run long builds/tests with bash background=true and keep working; check them with job."""
 
 
+@traced("prompt.build")
 def build_system_prompt(config: KrimConfig, extra_tools: list[str] | None = None) -> str:
     """Build the complete system prompt."""
     parts = [CORE]
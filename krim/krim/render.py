@@ -0,0 +1,164 @@
+"""Streaming render - how model output reaches the terminal.
+
+Printing every delta through rich costs markup parsing, width math and a
+flush per token. Renderers coalesce deltas instead:
+
+- plain:    buffer, write raw text every FLUSH_INTERVAL or FLUSH_CHARS, one flush each
+- markdown: rich Live view, re-rendered as markdown a few times a second
+- off:      no incremental output; the full text is written once at the end (headless)
+
+"auto" picks plain on a terminal and off otherwise.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from rich.console import Console
+from rich.live import Live
+from rich.markdown import Markdown
+
+from krim.profiling import span
+
+console = Console()
+
+FLUSH_INTERVAL = 0.016  # seconds
+FLUSH_CHARS = 256
+MARKDOWN_FPS = 8
+
+RENDER_MODES = ("auto", "plain", "markdown", "off")
+
+
+class PlainRenderer:
+    """Coalesces deltas and writes them straight to the terminal, bypassing markup."""
+
+    def __init__(self, out: Console | None = None, interval: float = FLUSH_INTERVAL, max_chars: int = FLUSH_CHARS):
+        self.console = out or console
+        self.interval = interval
+        self.max_chars = max_chars
+        self._buf: list[str] = []
+        self._size = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher: threading.Thread | None = None
+
+    def write(self, text: str):
+        with self._lock:
+            self._buf.append(text)
+            self._size += len(text)
+            due = self._size >= self.max_chars or time.monotonic() - self._last >= self.interval
+            if due:
+                self._flush_locked()
+        # a stalled stream (tool input, slow model) still shows its tail promptly
+        if self._flusher is None and not due:
+            self._flusher = threading.Thread(target=self._flush_loop, name="krim-render", daemon=True)
+            self._flusher.start()
+
+    def _flush_locked(self):
+        if self._buf:
+            with span("render"):
+                out = self.console.file
+                out.write("".join(self._buf))
+                out.flush()
+            self._buf.clear()
+            self._size = 0
+        self._last = time.monotonic()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.interval):
+            with self._lock:
+                if self._buf and time.monotonic() - self._last >= self.interval:
+                    self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class _Text:
+    """Live renderable that parses markdown only when Live refreshes, not per delta."""
+
+    def __init__(self):
+        self.parts: list[str] = []
+
+    def __rich__(self):
+        return Markdown("".join(self.parts))
+
+
+class MarkdownRenderer:
+    def __init__(self, out: Console | None = None, fps: int = MARKDOWN_FPS):
+        self._text = _Text()
+        self._live = Live(
+            self._text, console=out or console, refresh_per_second=fps,
+            vertical_overflow="visible", transient=False,
+        )
+        self._started = False
+
+    def write(self, text: str):
+        if not self._started:
+            self._live.start()
+            self._started = True
+        self._text.parts.append(text)
+
+    def close(self):
+        if self._started:
+            with span("render"):
+                self._live.stop()  # final refresh with the complete text
+            self._started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class FinalRenderer:
+    """Headless: collect everything, write it once."""
+
+    def __init__(self, out: Console | None = None):
+        self.console = out or console
+        self._parts: list[str] = []
+
+    def write(self, text: str):
+        self._parts.append(text)
+
+    def close(self):
+        if self._parts:
+            with span("render"):
+                self.console.file.write("".join(self._parts))
+                self.console.file.flush()
+            self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def create_renderer(mode: str = "auto", out: Console | None = None):
+    """A fresh renderer for one model response."""
+    out = out or console
+    if mode == "auto":
+        mode = "plain" if out.is_terminal else "off"
+    if mode == "markdown":
+        return MarkdownRenderer(out)
+    if mode == "off":
+        return FinalRenderer(out)
+    return PlainRenderer(out)
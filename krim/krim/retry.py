@@ -2,12 +2,13 @@
 
 from __future__ import annotations
 
-import time
 import functools
 from typing import TypeVar, Callable
 
 from rich.console import Console
 
+from krim import cancellation, tracing
+
 console = Console()
 
 T = TypeVar("T")
@@ -53,8 +54,10 @@ def with_retry(
                 if not is_retriable(e) or attempt == max_retries:
                     raise
                 delay = base_delay * (2 ** attempt)
+                tracing.event("retry", attempt=attempt + 1, delay=delay, error=f"{type(e).__name__}: {e}")
                 console.print(f"[yellow]retry {attempt + 1}/{max_retries} in {delay:.0f}s: {e}[/]")
-                time.sleep(delay)
+                if cancellation.current().wait(delay):
+                    raise cancellation.Cancelled() from e
         raise last_exc  # unreachable but satisfies type checker
 
     return wrapper
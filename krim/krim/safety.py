@@ -5,11 +5,14 @@ Rules evaluated in order: deny > allow > ask (default).
 
 from __future__ import annotations
 
+import threading
 from enum import Enum
 from rich.console import Console
 
 console = Console()
 
+_prompt_lock = threading.Lock()
+
 
 class Action(Enum):
     ALLOW = "allow"
@@ -53,10 +56,11 @@ def prompt_user(command: str) -> bool:
     if not sys.stdin.isatty():
         console.print(f"[yellow]bash: auto-denied (non-interactive):[/] {command}")
         return False
-    console.print(f"\n[yellow]bash:[/] [bold]{command}[/]")
-    try:
-        answer = console.input("[yellow]allow? [y/N] [/]").strip().lower()
-        return answer in ("y", "yes")
-    except (EOFError, KeyboardInterrupt):
-        console.print()
-        return False
+    with _prompt_lock:  # parallel subtasks ask one at a time
+        console.print(f"\n[yellow]bash:[/] [bold]{command}[/]")
+        try:
+            answer = console.input("[yellow]allow? [y/N] [/]").strip().lower()
+            return answer in ("y", "yes")
+        except (EOFError, KeyboardInterrupt):
+            console.print()
+            return False
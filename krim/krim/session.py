@@ -0,0 +1,151 @@
+"""Session persistence - append-only JSONL transcript per session.
+
+Layout: <.krim or ~/.krim>/sessions/<id>.jsonl, one record per line:
+  {"t": "meta", "provider": ..., "model": ..., "created": ...}
+  {"t": "msg", "m": {...}}             # one per appended message
+  {"t": "reset", "messages": [...]}    # full history after compaction
+  {"t": "stats", ...}                  # RunStats + totals at end of each run
+
+Messages are written as they are appended and fsynced at turn boundaries.
+Resume streams the file once; a torn last line (crash mid-write) is skipped,
+and cut off when the file is reopened so new records start on a fresh line.
+The system prompt is never stored - it's rebuilt fresh on resume.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass
+class SessionState:
+    """Everything needed to put an Agent back where it was."""
+    id: str
+    provider: str | None = None
+    model: str | None = None
+    messages: list[dict] = field(default_factory=list)
+    total_turns: int = 0
+    total_tool_calls: int = 0
+    last_stats: dict | None = None
+    tokens: int = 0
+
+
+def private_dir(path: Path) -> Path:
+    """Create a krim-owned directory that git (and auto_commit) will ignore."""
+    path.mkdir(parents=True, exist_ok=True)
+    ignore = path / ".gitignore"
+    if not ignore.exists():
+        ignore.write_text("*\n")
+    return path
+
+
+def sessions_dir(project_dir: Path | None, global_dir: Path) -> Path:
+    return (project_dir or global_dir) / "sessions"
+
+
+def _truncate_torn_tail(path: Path, chunk: int = 65536):
+    """Drop a partial last line, so the next record isn't glued onto it (and lost with it)."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - chunk)
+            f.seek(start)
+            data = f.read(pos - start)
+            if pos == end and data.endswith(b"\n"):
+                return
+            nl = data.rfind(b"\n")
+            if nl >= 0:
+                f.truncate(start + nl + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+class Session:
+    def __init__(self, path: Path):
+        self.path = path
+        self.id = path.stem
+        if path.exists():
+            _truncate_torn_tail(path)
+        self._f = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def create(cls, directory: Path, provider: str, model: str) -> Session:
+        private_dir(directory)
+        sid = time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(2)
+        session = cls(directory / f"{sid}.jsonl")
+        session._write({"t": "meta", "provider": provider, "model": model, "created": time.time()})
+        session.sync()
+        return session
+
+    @classmethod
+    def open(cls, directory: Path, session_id: str | None = None) -> Session:
+        """Open an existing session for appending. None = most recent."""
+        if session_id:
+            path = directory / f"{session_id}.jsonl"
+            if not path.is_file():
+                raise FileNotFoundError(f"no session '{session_id}' in {directory}")
+            return cls(path)
+        candidates = sorted(directory.glob("*.jsonl"), key=lambda p: p.stat().st_mtime) if directory.is_dir() else []
+        if not candidates:
+            raise FileNotFoundError(f"no sessions in {directory}")
+        return cls(candidates[-1])
+
+    # -- writing --
+
+    def _write(self, record: dict):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def append(self, message: dict):
+        self._write({"t": "msg", "m": message})
+
+    def reset(self, messages: list[dict]):
+        """Record a rewritten history (compaction) without non-system messages."""
+        self._write({"t": "reset", "messages": [m for m in messages if m.get("role") != "system"]})
+
+    def record_stats(self, stats: dict, total_turns: int, total_tool_calls: int, tokens: int):
+        self._write({
+            "t": "stats", "stats": stats,
+            "total_turns": total_turns, "total_tool_calls": total_tool_calls, "tokens": tokens,
+        })
+
+    def sync(self):
+        """Flush and fsync. Called at turn boundaries, not per message."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+    # -- reading --
+
+    def load(self) -> SessionState:
+        state = SessionState(id=self.id)
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                t = rec.get("t")
+                if t == "msg":
+                    state.messages.append(rec["m"])
+                elif t == "reset":
+                    state.messages = rec["messages"]
+                elif t == "stats":
+                    state.last_stats = rec["stats"]
+                    state.total_turns = rec["total_turns"]
+                    state.total_tool_calls = rec["total_tool_calls"]
+                    state.tokens = rec["tokens"]
+                elif t == "meta":
+                    state.provider = rec.get("provider")
+                    state.model = rec.get("model")
+        return state
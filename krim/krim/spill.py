@@ -0,0 +1,104 @@
+"""Large tool output spill - keep the full text on disk, give the model a preview.
+
+Outputs over the limit are written to <.krim or ~/.krim>/results/<session>/rN.txt.
+The context gets a head/tail preview plus the id; the `result` tool pages or
+greps the saved file without re-running the command.
+"""
+
+from __future__ import annotations
+
+import itertools
+import re
+import shutil
+import threading
+from pathlib import Path
+
+from krim.session import private_dir
+from krim.truncate import truncate
+
+PREVIEW_CHARS = 10_000
+MAX_LINE_CHARS = 2_000  # a single-line JSON dump shouldn't blow up a page
+
+
+def _numbered(i: int, line: str) -> str:
+    line = line.rstrip()
+    if len(line) > MAX_LINE_CHARS:
+        line = line[:MAX_LINE_CHARS] + f" ...[+{len(line) - MAX_LINE_CHARS:,} chars]"
+    return f"{i:>6}\t{line}"
+
+
+class ResultStore:
+    def __init__(self, directory: Path, preview_chars: int = PREVIEW_CHARS):
+        self.directory = directory
+        self.preview_chars = preview_chars
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def _path(self, result_id: str) -> Path | None:
+        if not re.fullmatch(r"r\d+", result_id):
+            return None
+        return self.directory / f"{result_id}.txt"
+
+    def put(self, text: str) -> str:
+        with self._lock:
+            if self._count == 0:
+                private_dir(self.directory.parent)
+                self.directory.mkdir(exist_ok=True)
+            self._count += 1
+            result_id = f"r{self._count}"
+        self._path(result_id).write_text(text, encoding="utf-8")
+        return result_id
+
+    def limit(self, text: str, max_chars: int) -> str:
+        """Return text as-is if it fits, else spill it and return a preview + handle."""
+        if len(text) <= max_chars:
+            return text
+        try:
+            result_id = self.put(text)
+        except OSError:
+            return truncate(text, max_chars)
+        lines = text.count("\n") + 1
+        return (
+            truncate(text, min(self.preview_chars, max_chars))
+            + f"\n\n[full output: {len(text):,} chars, {lines:,} lines, saved as {result_id}."
+            + f" use the result tool with id={result_id} to page or grep it]"
+        )
+
+    def read(self, result_id: str, offset: int = 1, limit: int = 200, grep: str | None = None) -> str:
+        path = self._path(result_id)
+        if not path or not path.is_file():
+            return f"error: no saved result '{result_id}'"
+        with open(path, encoding="utf-8") as f:
+            if grep:
+                try:
+                    pattern = re.compile(grep)
+                except re.error as e:
+                    return f"error: bad pattern: {e}"
+                matches = (
+                    _numbered(i, line)
+                    for i, line in enumerate(f, start=1)
+                    if i >= offset and pattern.search(line)
+                )
+                out = list(itertools.islice(matches, limit + 1))
+                more = len(out) > limit
+                out = out[:limit]
+                if not out:
+                    return "(no matches)"
+                result = "\n".join(out)
+                if more:
+                    result += f"\n... (more matches; continue with offset={int(out[-1].split()[0]) + 1})"
+                return result
+
+            start = max(1, offset)
+            selected = itertools.islice(f, start - 1, start - 1 + limit + 1)
+            out = [_numbered(i, line) for i, line in enumerate(selected, start=start)]
+            if not out:
+                return f"(no lines at offset {offset})"
+            more = len(out) > limit
+            result = "\n".join(out[:limit])
+            if more:
+                result += f"\n... (more lines; continue with offset={start + limit})"
+            return result
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
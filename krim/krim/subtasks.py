@@ -0,0 +1,169 @@
+"""Parallel subtasks - fan independent work out to agents in separate git worktrees.
+
+Each subtask gets its own branch (krim/sub-<run>-<n>) checked out into a
+worktree under a temp dir, and its own Agent, model and tools rooted there.
+Subtasks run concurrently (up to max_parallel). When all are done, each
+one's changes are committed on its branch and merged into HEAD in task
+order. A merge that conflicts is aborted and its branch kept for the user.
+If the run is cancelled, partial work is committed to the branches but not merged.
+
+Worktrees branch from HEAD, so uncommitted work in the checkout would be
+invisible to them and could conflict with the merge. With auto_commit it is
+committed first, as before any agent edit; without it the run refuses to start.
+
+Transcripts go to <.krim or ~/.krim>/subtasks/<run>-<n>.log.
+"""
+
+from __future__ import annotations
+
+import os
+import secrets
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+from rich.console import Console
+
+from krim import cancellation, tracing
+from krim.git import (
+    add_worktree, commit_dirty, commit_worktree, delete_branch, has_uncommitted_changes, merge_branch,
+    remove_worktree, repo_root,
+)
+from krim.session import private_dir
+
+if TYPE_CHECKING:
+    from krim.agent import Agent
+
+console = Console()
+
+SUBTASK_PROMPT = """You are one of several subtasks running in parallel, each in its own git worktree.
+Your worktree is {root} and it is your working directory: use relative paths.
+Do only the task you are given; other subtasks handle the rest.
+Don't commit - your changes are committed and merged back when you finish."""
+
+# (worktree root, original repo root, log console) -> Agent
+AgentFactory = Callable[[str, str, Console], "Agent"]
+
+
+@dataclass
+class SubtaskResult:
+    name: str
+    task: str
+    branch: str
+    status: str = "pending"   # merged | conflict | no changes | failed | cancelled
+    summary: str = ""
+    files: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+    error: str | None = None
+
+
+def _last_reply(agent: Agent) -> str:
+    for m in reversed(agent.messages):
+        if m.get("role") == "assistant" and isinstance(m.get("content"), str):
+            return m["content"]
+    return ""
+
+
+def run_subtasks(
+    tasks: list[str],
+    make_agent: AgentFactory,
+    log_dir: Path,
+    max_parallel: int = 4,
+    auto_commit: bool = False,
+) -> list[SubtaskResult]:
+    origin = repo_root()
+    if origin is None:
+        raise RuntimeError("parallel subtasks need a git repository")
+    # worktrees branch from HEAD, so the user's uncommitted work has to be in it - but only they may commit it
+    if has_uncommitted_changes():
+        if not auto_commit:
+            raise RuntimeError("the working tree has uncommitted changes and auto_commit is off; "
+                               "subtasks branch from HEAD, so commit or stash them first")
+        commit_dirty("krim: save uncommitted changes before subtasks")
+
+    run_id = time.strftime("%H%M%S") + secrets.token_hex(2)
+    base = tempfile.mkdtemp(prefix="krim-worktrees-")
+    private_dir(log_dir)
+    results = [
+        SubtaskResult(name=f"{run_id}-{i}", task=task, branch=f"krim/sub-{run_id}-{i}")
+        for i, task in enumerate(tasks, start=1)
+    ]
+    paths = {r.name: os.path.join(base, r.name) for r in results}
+
+    # worktree add/remove touch shared .git state: do them serially, run agents in parallel
+    ready = []
+    for res in results:
+        if add_worktree(paths[res.name], res.branch):
+            ready.append(res)
+        else:
+            res.status, res.error = "failed", "could not create worktree"
+
+    parent = tracing.current()
+    token = cancellation.current()  # cancelling the caller cancels every subtask
+
+    def work(res: SubtaskResult):
+        path = paths[res.name]
+        with open(log_dir / f"{res.name}.log", "w", encoding="utf-8") as log, tracing.attach(parent), \
+                tracing.span("subtask", {"krim.subtask": res.name}):
+            try:
+                agent = make_agent(path, origin, Console(file=log, width=120))
+                agent.run(res.task, cancel=token)
+                res.summary = _last_reply(agent)
+                res.files = commit_worktree(path, f"krim: subtask: {res.task[:60]}")
+            except Exception as e:
+                res.status, res.error = "failed", str(e)
+
+    console.print(f"[dim]subtasks: running {len(ready)} in parallel (logs: {log_dir})[/]")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(ready) or 1))) as pool:
+            futures = {pool.submit(work, res): res for res in ready}
+            for fut in as_completed(futures):
+                res = futures[fut]
+                state = "failed" if res.status == "failed" else f"{len(res.files)} file(s) changed"
+                console.print(f"[dim]subtask {res.name} done: {state}[/]")
+    finally:
+        for res in ready:
+            remove_worktree(paths[res.name])
+        shutil.rmtree(base, ignore_errors=True)
+
+    # merge back in task order, so the result doesn't depend on who finished first
+    for res in results:
+        if token.cancelled and res.files:
+            res.status = "cancelled"  # partial work stays on the branch
+            continue
+        if res.status == "failed" or not res.files:
+            if res.status != "failed":
+                res.status = "no changes"
+            if res in ready:
+                delete_branch(res.branch)
+            continue
+        res.conflicts = merge_branch(res.branch, f"krim: merge subtask {res.name}: {res.task[:50]}")
+        if res.conflicts:
+            res.status = "conflict"  # branch kept so the user can merge it by hand
+        else:
+            res.status = "merged"
+            delete_branch(res.branch)
+    return results
+
+
+def format_results(results: list[SubtaskResult]) -> str:
+    lines = []
+    for res in results:
+        line = f"[{res.status}] {res.name}: {res.task[:80]}"
+        if res.files:
+            line += f"\n  files: {', '.join(res.files[:20])}"
+        if res.conflicts:
+            line += f"\n  conflicts: {', '.join(res.conflicts)} (branch {res.branch} kept, merge it manually)"
+        elif res.status == "cancelled":
+            line += f"\n  partial work kept on branch {res.branch}"
+        if res.error:
+            line += f"\n  error: {res.error}"
+        if res.summary:
+            summary = res.summary.strip().replace("\n", " ")
+            line += f"\n  summary: {summary[:300]}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,125 @@
+"""Post-write feedback for edit/write: a syntax check and a compact diff.
+
+The point is to save the turn the model would otherwise spend on
+`python -m py_compile` or re-reading the file. Checks run in-process and
+only for formats the stdlib (or an installed PyYAML) can parse; anything
+else is skipped. An error is reported with a few numbered lines of context
+and a caret, and flagged if the file was already broken before the change.
+"""
+
+from __future__ import annotations
+
+import ast
+import difflib
+import json
+import os
+import re
+
+try:
+    import tomllib  # 3.11+
+except ImportError:
+    tomllib = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+DIFF_CONTEXT = 2
+MAX_DIFF_LINES = 40
+ERROR_CONTEXT = 2  # lines either side of a syntax error
+
+
+def _python(text: str) -> tuple[str, int, int] | None:
+    try:
+        ast.parse(text)
+    except SyntaxError as e:
+        return e.msg, e.lineno or 1, e.offset or 0
+    except ValueError as e:  # null bytes
+        return str(e), 1, 0
+    return None
+
+
+def _json(text: str) -> tuple[str, int, int] | None:
+    try:
+        json.loads(text)
+    except json.JSONDecodeError as e:
+        return e.msg, e.lineno, e.colno
+    return None
+
+
+def _toml(text: str) -> tuple[str, int, int] | None:
+    try:
+        tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        msg = str(e)
+        m = re.search(r"\(at line (\d+), column (\d+)\)", msg)
+        if m:
+            return msg[:m.start()].strip(), int(m.group(1)), int(m.group(2))
+        return msg, getattr(e, "lineno", 1), getattr(e, "colno", 0)
+    return None
+
+
+def _yaml(text: str) -> tuple[str, int, int] | None:
+    try:
+        for _ in yaml.safe_load_all(text):
+            pass
+    except yaml.MarkedYAMLError as e:
+        mark = e.problem_mark or e.context_mark
+        msg = " ".join(p for p in (e.context, e.problem) if p) or "invalid yaml"
+        return msg, (mark.line + 1) if mark else 1, (mark.column + 1) if mark else 0
+    except yaml.YAMLError as e:
+        return str(e), 1, 0
+    return None
+
+
+CHECKERS = {".py": _python, ".pyi": _python, ".json": _json}
+if tomllib:
+    CHECKERS[".toml"] = _toml
+if yaml:
+    CHECKERS[".yaml"] = CHECKERS[".yml"] = _yaml
+
+
+def check(path: str, text: str, before: str | None = None) -> str:
+    """Syntax error report for `text` (empty if fine or not a checked format)."""
+    checker = CHECKERS.get(os.path.splitext(path)[1].lower())
+    if not checker:
+        return ""
+    error = checker(text)
+    if not error:
+        return ""
+    msg, line, col = error
+    lines = text.splitlines()
+    line = max(1, min(line, len(lines) or 1))
+    start, end = max(1, line - ERROR_CONTEXT), min(len(lines), line + ERROR_CONTEXT)
+    width = len(str(end))
+    context = []
+    for n in range(start, end + 1):
+        context.append(f"{n:>{width}} | {lines[n - 1]}".rstrip())
+        if n == line and col > 0:
+            context.append(" " * width + " | " + " " * (col - 1) + "^")
+    note = " (already present before this change)" if before is not None and checker(before) else ""
+    return f"syntax error: {msg} at line {line}{note}\n" + "\n".join(context)
+
+
+def diff(path: str, before: str, after: str) -> str:
+    """Unified diff of the change, capped at MAX_DIFF_LINES."""
+    lines = list(difflib.unified_diff(
+        before.splitlines(), after.splitlines(),
+        fromfile=path, tofile=path, n=DIFF_CONTEXT, lineterm="",
+    ))[2:]  # the ---/+++ header just repeats the path
+    if len(lines) > MAX_DIFF_LINES:
+        more = len(lines) - MAX_DIFF_LINES
+        lines = lines[:MAX_DIFF_LINES] + [f"... ({more} more diff lines)"]
+    return "\n".join(lines)
+
+
+def feedback(path: str, before: str | None, after: str) -> str:
+    """What to append to an edit/write result: the diff (if replacing) and any syntax error."""
+    parts = []
+    if before is not None and before != after:
+        parts.append(diff(path, before, after))
+    error = check(path, after, before)
+    if error:
+        parts.append(error)
+    return "\n".join(p for p in parts if p)
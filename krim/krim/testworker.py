@@ -0,0 +1,171 @@
+"""Warm test worker - pytest runs without paying for imports every time.
+
+A long-lived process in the project's Python (_testserver.py) imports pytest
+and the suite's third-party dependencies once, then forks a fresh child per
+run: the child already has numpy/django/... in memory but imports the
+project's own modules from disk, so edits are always picked up. Results come
+back structured (counts, failing node ids, trimmed reports) instead of as
+terminal output to re-parse.
+
+The worker restarts itself when a preloaded module changes on disk (e.g. a
+pip install), and is killed and restarted cold after a timeout or cancel.
+Opt in with:
+  "test_worker": {"enabled": true, "python": ".venv/bin/python", "preload": ["numpy"]}
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from krim import cancellation, process
+
+SERVER = Path(__file__).parent / "_testserver.py"
+START_TIMEOUT = 120  # preloading a large suite's dependencies can take a while
+
+
+class WorkerError(Exception):
+    pass
+
+
+@dataclass
+class Failure:
+    nodeid: str
+    when: str  # collect | setup | call | teardown
+    message: str
+
+
+@dataclass
+class TestRun:
+    exit_code: int
+    counts: dict[str, int] = field(default_factory=dict)
+    failures: list[Failure] = field(default_factory=list)
+    seconds: float = 0.0
+    output: str = ""  # pytest's own terminal output
+    crash: str = ""
+    warm: bool = True  # False when this call had to (re)start the worker
+
+
+class TestWorker:
+    def __init__(self, root: str, python: str | None = None, preload: list[str] | None = None):
+        self.root = root
+        self.python = python or sys.executable
+        self.preload = list(preload or [])
+        self.proc: subprocess.Popen | None = None
+        self.ready: dict = {}
+        self.restarts = 0
+        self._buf = b""
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        """Start the worker and wait until it has preloaded."""
+        with self._lock:
+            if not self.alive:
+                self._start()
+
+    def _start(self):
+        self.proc = subprocess.Popen(
+            [self.python, "-c", SERVER.read_text(), self.root, json.dumps(self.preload)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.root,
+            start_new_session=True,  # the worker and its forks die together
+        )
+        self._buf = b""
+        try:
+            self.ready = self._read(time.monotonic() + START_TIMEOUT)
+        except WorkerError:
+            self.stop()
+            raise
+
+    def stop(self):
+        if self.proc is not None:
+            process.kill_group(self.proc)
+            try:
+                self.proc.wait(5)
+            except subprocess.TimeoutExpired:
+                pass
+            for stream in (self.proc.stdin, self.proc.stdout):
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+        self.proc = None
+
+    def _read(self, deadline: float) -> dict:
+        """Next JSON line from the worker; WorkerError on exit, timeout or cancel."""
+        token = cancellation.current()
+        fd = self.proc.stdout.fileno()
+        while b"\n" not in self._buf:
+            if token.cancelled:
+                raise WorkerError("cancelled")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WorkerError("timeout")
+            ready, _, _ = select.select([fd], [], [], min(0.1, remaining))
+            if ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise WorkerError(f"worker exited (code {self.proc.wait()}); is pytest installed for {self.python}?")
+                self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+    def run(self, args: list[str], cwd: str | None = None, timeout: float = 300) -> TestRun:
+        """One pytest run in a fresh fork. Raises WorkerError on timeout/cancel (the worker is killed)."""
+        with self._lock:
+            warm = self.alive
+            if not warm:
+                self._start()
+            result = self._request(args, cwd or self.root, timeout)
+            if result is None:  # stale: a preloaded module changed on disk
+                self.stop()
+                self.restarts += 1
+                self._start()
+                warm = False
+                result = self._request(args, cwd or self.root, timeout)
+                if result is None:
+                    raise WorkerError("worker keeps reporting stale modules")
+            result.warm = warm
+            return result
+
+    def _request(self, args: list[str], cwd: str, timeout: float) -> TestRun | None:
+        with tempfile.TemporaryDirectory(prefix="krim-test-") as td:
+            paths = {"result": os.path.join(td, "result.json"), "log": os.path.join(td, "output.log")}
+            try:
+                self.proc.stdin.write((json.dumps({"args": args, "cwd": cwd, **paths}) + "\n").encode())
+                self.proc.stdin.flush()
+                reply = self._read(time.monotonic() + timeout)
+            except (WorkerError, OSError) as e:
+                self.stop()  # a half-finished fork is not worth keeping
+                raise WorkerError(str(e)) from e
+            if "stale" in reply:
+                return None
+            output = Path(paths["log"]).read_text(errors="replace") if os.path.exists(paths["log"]) else ""
+            try:
+                summary = json.loads(Path(paths["result"]).read_text())
+            except (OSError, ValueError):
+                # the child died before writing its summary (segfault, os._exit in a test, ...)
+                return TestRun(exit_code=reply.get("exit", -1), output=output,
+                               crash=f"test process died (exit {reply.get('exit')})")
+        return TestRun(
+            exit_code=summary.get("exit", reply.get("exit", -1)),
+            counts={k: v for k, v in summary.get("counts", {}).items() if v},
+            failures=[Failure(**f) for f in summary.get("failures", [])],
+            seconds=summary.get("seconds", 0.0),
+            output=output,
+            crash=summary.get("crash", ""),
+        )
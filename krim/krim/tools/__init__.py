@@ -3,15 +3,19 @@
 from __future__ import annotations
 
 from krim.tools.read import ReadTool
+from krim.tools.read_many import ReadManyTool
 from krim.tools.write import WriteTool
 from krim.tools.edit import EditTool
 from krim.tools.bash import BashTool
+from krim.tools.glob import GlobTool
+from krim.tools.job import JobTool
 from krim.tools.base import Tool
 
 
 def create_tools() -> list[Tool]:
     """Create fresh tool instances."""
-    return [ReadTool(), WriteTool(), EditTool(), BashTool()]
+    bash = BashTool()
+    return [ReadTool(), ReadManyTool(), WriteTool(), EditTool(), GlobTool(), bash, JobTool(bash)]
 
 
 def get_tool(tools: list[Tool], name: str) -> Tool | None:
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import os
 from abc import ABC, abstractmethod
 
 
@@ -10,6 +11,21 @@ class Tool(ABC):
     description: str
     parameters: dict
 
+    # set for agents working in a git worktree: relative paths resolve under root,
+    # absolute paths into the original checkout (origin) are redirected to root
+    root: str | None = None
+    origin: str | None = None
+
+    def resolve(self, path: str) -> str:
+        path = os.path.expanduser(path)
+        if not self.root:
+            return path
+        if not os.path.isabs(path):
+            return os.path.join(self.root, path)
+        if self.origin and (path == self.origin or path.startswith(self.origin + os.sep)):
+            return self.root + path[len(self.origin):]
+        return path
+
     @abstractmethod
     def run(self, **kwargs) -> str:
         ...
@@ -1,23 +1,34 @@
-"""Bash execution tool with safety checks, persistent cwd, and output truncation."""
+"""Bash execution tool with safety checks, persistent cwd, resource limits, result cache, and output truncation."""
 
 from __future__ import annotations
 
 import os
-import subprocess
+import signal
 
+from krim import cancellation, cmdcache, jobs, process, tracing
+from krim.jobs import JobManager
 from krim.tools.base import Tool
+from krim.profiling import span
 from krim.safety import Action, check_command, prompt_user
+from krim.spill import ResultStore
 from krim.truncate import truncate
 
 _CWD_MARKER = "__KRIM_CWD__"
+USAGE_NOTE_CPU = 1.0        # seconds; cheaper commands get no usage line
+USAGE_NOTE_RSS_MB = 500
 
 
 class BashTool(Tool):
     name = "bash"
-    description = "Run a shell command. Returns stdout and stderr. Working directory persists between calls."
+    description = (
+        "Run a shell command. Returns stdout and stderr. Working directory persists between calls. "
+        "For long builds/test suites set background=true: it returns a job id at once; check it with the job tool."
+    )
     parameters = {
         "command": {"type": "string", "description": "Shell command to execute"},
         "timeout": {"type": "integer", "description": "Timeout in seconds (default 120)", "optional": True},
+        "background": {"type": "boolean", "description": "Start as a background job and return immediately",
+                       "optional": True},
     }
 
     def __init__(self):
@@ -26,6 +37,10 @@ class BashTool(Tool):
         self._ask_by_default: bool = True
         self._max_output_chars: int = 30_000
         self._cwd: str = os.getcwd()
+        self._results: ResultStore | None = None
+        self._limits: list[tuple[int, int, int]] = []
+        self._cache: cmdcache.CommandCache | None = None
+        self.jobs = JobManager()
 
     def configure(
         self,
@@ -34,6 +49,9 @@ class BashTool(Tool):
         ask_by_default: bool = True,
         max_output_chars: int = 30_000,
         cwd: str | None = None,
+        results: ResultStore | None = None,
+        limits: dict | None = None,
+        cache: cmdcache.CommandCache | None = None,
     ):
         self._deny_patterns = deny_patterns
         self._allow_commands = allow_commands
@@ -41,13 +59,19 @@ class BashTool(Tool):
         self._max_output_chars = max_output_chars
         if cwd:
             self._cwd = cwd
+        if results:
+            self._results = results
+        if limits is not None:
+            self._limits = process.rlimits(limits)
+        if cache:
+            self._cache = cache
 
     @property
     def cwd(self) -> str:
         return self._cwd
 
-    def run(self, command: str, timeout: int = 120) -> str:
-        # safety check
+    def approve(self, command: str) -> str | None:
+        """Apply the safety rules (prompting if needed). Returns an error string, or None if allowed."""
         action = check_command(
             command, self._deny_patterns, self._allow_commands, self._ask_by_default,
         )
@@ -56,21 +80,60 @@ class BashTool(Tool):
             return f"error: command denied by safety rules: {command}"
 
         if action == Action.ASK:
-            if not prompt_user(command):
+            with span("bash.ask"):  # waiting on the user, not the shell
+                approved = prompt_user(command)
+            if not approved:
                 return "error: command rejected by user"
-
+        return None
+
+    def run(self, command: str, timeout: int = 120, background: bool = False) -> str:
+        denied = self.approve(command)
+        if denied:
+            return denied
+
+        # a running job may be changing the tree: neither trust nor store results until it exits
+        cacheable = (not background and self._cache is not None and not jobs.any_running()
+                     and self._cache.cacheable(command))
+        if not cacheable:
+            try:
+                return self._start_job(command) if background else self._exec(command, timeout)
+            finally:
+                cmdcache.invalidate()  # it may have changed anything
+
+        hit = self._cache.get(command, self._cwd)
+        if hit:
+            output, age = hit
+            return f"{output}\n[cached result from {age:.0f}s ago; nothing has changed since]"
+        since = cmdcache.generation()
+        output = self._exec(command, timeout)
+        if not output.startswith("error: "):
+            self._cache.put(command, self._cwd, output, since)
+        return output
+
+    def _exec(self, command: str, timeout: int) -> str:
         # wrap command to: 1) capture its exit code, 2) track cwd changes, 3) exit with original code
         wrapped = f'{command}\n__krim_ec=$?\necho "{_CWD_MARKER}"\npwd\nexit $__krim_ec'
 
+        token = cancellation.current()
+        if token.cancelled:
+            return cancellation.CANCELLED_RESULT
+
         try:
-            result = subprocess.run(
-                wrapped,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=self._cwd,
-            )
+            with span("bash.exec"), tracing.span("bash.exec", {"process.command_line": command[:200]}) as ts:
+                result = process.run(wrapped, self._cwd, timeout, self._limits)
+                ts.set("process.exit.code", result.returncode)
+                if result.usage:
+                    ts.set("process.cpu.time", result.usage.cpu_seconds)
+                    ts.set("process.memory.peak_mb", result.usage.peak_rss_mb)
+                if result.cancelled or result.timed_out:
+                    ts.set("krim.killed", "cancelled" if result.cancelled else "timeout")
+
+            if result.cancelled or result.timed_out:
+                partial = result.stdout.split(_CWD_MARKER, 1)[0].strip()
+                tail = truncate(partial, 2_000) if partial else ""
+                head = cancellation.CANCELLED_RESULT if result.cancelled else \
+                    f"error: command timed out after {timeout}s (process group killed)"
+                return head + (f"\npartial output:\n{tail}" if tail else "")
 
             stdout = result.stdout or ""
 
@@ -91,11 +154,37 @@ class BashTool(Tool):
                 out += result.stderr.strip()
             if result.returncode != 0:
                 out += f"\n[exit code: {result.returncode}]"
+            note = self._usage_note(result)
+            if note:
+                out += f"\n{note}"
 
-            out = out.strip() or "(no output)"
-            return truncate(out, self._max_output_chars)
+            return self.limit_output(out.strip() or "(no output)")
 
-        except subprocess.TimeoutExpired:
-            return f"error: command timed out after {timeout}s"
         except Exception as e:
             return f"error: {e}"
+
+    def limit_output(self, out: str) -> str:
+        if self._results:
+            return self._results.limit(out, self._max_output_chars)
+        return truncate(out, self._max_output_chars)
+
+    def _start_job(self, command: str) -> str:
+        try:
+            with tracing.span("bash.job", {"process.command_line": command[:200]}):
+                job = self.jobs.start(command, self._cwd, self._limits)
+        except Exception as e:
+            return f"error: {e}"
+        return f"started job {job.id} (pid {job.proc.pid}) in {self._cwd}\ncheck it with the job tool: poll, wait or kill"
+
+    def _usage_note(self, result: process.Completed) -> str:
+        """Resource usage line, only for commands that did real work or hit a limit."""
+        usage = result.usage
+        if not usage:
+            return ""
+        cpu_limit = next((soft for res, soft, _ in self._limits if res == process.LIMITS["cpu_seconds"][0]), None)
+        killed = {128 + signal.SIGXCPU, 128 + signal.SIGKILL, -signal.SIGXCPU, -signal.SIGKILL}
+        if cpu_limit and result.returncode in killed and usage.cpu_seconds >= cpu_limit - 0.1:
+            return f"[cpu limit of {cpu_limit}s reached; cpu: {usage.cpu_seconds:.1f}s, peak rss: {usage.peak_rss_mb:.0f} MB]"
+        if usage.cpu_seconds >= USAGE_NOTE_CPU or usage.peak_rss_mb >= USAGE_NOTE_RSS_MB:
+            return f"[cpu: {usage.cpu_seconds:.1f}s, peak rss: {usage.peak_rss_mb:.0f} MB]"
+        return ""
@@ -4,6 +4,9 @@ Match strategy (in order):
 1. Exact match
 2. Whitespace-normalized match
 3. Fuzzy match (difflib, threshold 0.8)
+
+The result includes a short diff of the change and, for known formats,
+any syntax error it introduced (see syntax.py).
 """
 
 from __future__ import annotations
@@ -12,6 +15,8 @@ import difflib
 import os
 import re
 
+from krim import cmdcache, syntax
+from krim.checkpoints import CheckpointStore
 from krim.tools.base import Tool
 
 
@@ -64,21 +69,21 @@ class EditTool(Tool):
         "new": {"type": "string", "description": "Replacement string"},
     }
 
+    checkpoints: CheckpointStore | None = None  # snapshot before each edit, for /rewind
+
     def run(self, path: str, old: str, new: str) -> str:
-        path = os.path.expanduser(path)
+        path = self.resolve(path)
         if not os.path.isfile(path):
             return f"error: {path} not found"
         try:
             with open(path, "r") as f:
-                content = f.read()
+                content = before = f.read()
 
             # strategy 1: exact match
             count = content.count(old)
             if count == 1:
                 content = content.replace(old, new, 1)
-                with open(path, "w") as f:
-                    f.write(content)
-                return f"edited {path} (exact match)"
+                return self._save(path, before, content, "exact match")
 
             if count > 1:
                 return f"error: old string found {count} times, must be unique. provide more context."
@@ -91,9 +96,7 @@ class EditTool(Tool):
                     chunk = "".join(lines[i : i + length])
                     if _normalize_whitespace(chunk) == norm_old:
                         content = content.replace(chunk, new, 1)
-                        with open(path, "w") as f:
-                            f.write(content)
-                        return f"edited {path} (whitespace-normalized match)"
+                        return self._save(path, before, content, "whitespace-normalized match")
 
             # strategy 3: fuzzy match
             match = _fuzzy_find(content, old)
@@ -102,10 +105,18 @@ class EditTool(Tool):
                 matched_text = content[start:end]
                 ratio = difflib.SequenceMatcher(None, old, matched_text).ratio()
                 content = content[:start] + new + content[end:]
-                with open(path, "w") as f:
-                    f.write(content)
-                return f"edited {path} (fuzzy match, {ratio:.0%} similar)"
+                return self._save(path, before, content, f"fuzzy match, {ratio:.0%} similar")
 
             return "error: old string not found in file (exact, whitespace, and fuzzy match all failed)"
         except Exception as e:
             return f"error: {e}"
+
+    def _save(self, path: str, before: str, content: str, how: str) -> str:
+        if self.checkpoints:
+            self.checkpoints.record(path, self.name, content.encode())
+        with open(path, "w") as f:
+            f.write(content)
+        cmdcache.invalidate()
+        result = f"edited {path} ({how})"
+        feedback = syntax.feedback(path, before, content)
+        return f"{result}\n{feedback}" if feedback else result
@@ -0,0 +1,78 @@
+"""Glob tool - find files by pattern without shelling out to find/ls.
+
+Uses the shared walker (walk.py), so .gitignore'd files and directories
+like node_modules never reach the context. The literal leading part of the
+pattern picks where the walk starts, and patterns without ** don't descend
+further than they can match. With a watcher running (watch.py), the file
+list comes from its FileIndex instead of a fresh walk.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+
+from krim import walk
+from krim.tools.base import Tool
+from krim.watch import FileIndex
+
+DEFAULT_LIMIT = 200
+
+
+class GlobTool(Tool):
+    name = "glob"
+    description = (
+        "Find files by glob pattern, e.g. '**/*.py' or 'src/**/test_*.ts' (* stays within one directory, "
+        "** crosses directories). Skips .gitignore'd files. Newest first by default."
+    )
+    parameters = {
+        "pattern": {"type": "string", "description": "Glob pattern, relative to path"},
+        "path": {"type": "string", "description": "Directory to search (default: working directory)",
+                 "optional": True},
+        "sort": {"type": "string", "enum": ["mtime", "path"], "description": "mtime (newest first, default) or path",
+                 "optional": True},
+        "limit": {"type": "integer", "description": f"Max results (default {DEFAULT_LIMIT})", "optional": True},
+        "include_ignored": {"type": "boolean", "description": "Also list gitignored files and node_modules etc.",
+                            "optional": True},
+    }
+
+    def __init__(self, index: FileIndex | None = None):
+        self.index = index
+
+    def run(self, pattern: str, path: str = ".", sort: str = "mtime", limit: int = DEFAULT_LIMIT,
+            include_ignored: bool = False) -> str:
+        if sort not in ("mtime", "path"):
+            return f"error: unknown sort '{sort}' (mtime, path)"
+        # the literal head of the pattern is just a longer base directory
+        head, rest = walk.split_glob(pattern)
+        if not rest:
+            return "error: empty pattern"
+        base = os.path.join(self.resolve(path or "."), head) if head else self.resolve(path or ".")
+        if not os.path.isdir(base):
+            return f"error: {base} is not a directory"
+
+        regex = re.compile("^" + walk.translate(rest) + "$")
+        entries = self.index.entries(base) if self.index and not include_ignored else None
+        if entries is None:
+            entries = walk.walk(
+                base,
+                max_depth=None if "**" in rest else rest.count("/"),
+                gitignore=not include_ignored,
+                skip_noise=not include_ignored,
+                want_mtime=sort == "mtime",
+            )
+        matches = [e for e in entries if regex.match(e.path)]
+        if not matches:
+            return f"no files matching '{pattern}' in {base}"
+        if sort == "mtime":
+            matches.sort(key=lambda e: (-e.mtime, e.path))
+        else:
+            matches.sort(key=lambda e: e.path)
+
+        shown = matches[:max(1, limit)]
+        order = "newest first" if sort == "mtime" else "by path"
+        lines = [f"{len(matches)} file(s) matching '{pattern}' in {base} ({order})"]
+        lines += [e.path for e in shown]
+        if len(matches) > len(shown):
+            lines.append(f"... ({len(matches) - len(shown)} more; narrow the pattern or raise limit)")
+        return "\n".join(lines)
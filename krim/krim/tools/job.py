@@ -0,0 +1,44 @@
+"""Background job tool - poll, wait for, kill or list jobs started with bash background=true."""
+
+from __future__ import annotations
+
+from krim import cancellation
+from krim.tools.base import Tool
+from krim.tools.bash import BashTool
+
+
+class JobTool(Tool):
+    name = "job"
+    description = (
+        "Manage background jobs started with bash background=true. "
+        "poll: status + output since the last check. wait: block until the job ends or timeout, then poll. "
+        "kill: stop the job and everything it started. list: all jobs."
+    )
+    parameters = {
+        "action": {"type": "string", "enum": ["poll", "wait", "kill", "list"], "description": "What to do"},
+        "id": {"type": "string", "description": "Job id, e.g. j1 (not needed for list)", "optional": True},
+        "timeout": {"type": "integer", "description": "Seconds to wait (wait only, default 60)", "optional": True},
+    }
+
+    def __init__(self, bash: BashTool):
+        self._bash = bash
+
+    def run(self, action: str, id: str | None = None, timeout: int = 60) -> str:
+        jobs = self._bash.jobs
+        if action == "list":
+            if not jobs.jobs:
+                return "no jobs"
+            return "\n".join(f"{j.id}  {j.status()}  {j.command[:100]}" for j in jobs.jobs.values())
+        if action not in ("poll", "wait", "kill"):
+            return f"error: unknown action '{action}' (poll, wait, kill, list)"
+        job = jobs.get(id or "")
+        if job is None:
+            return f"error: no job '{id}'" + (f" (jobs: {', '.join(jobs.jobs)})" if jobs.jobs else "")
+
+        note = ""
+        if action == "wait" and not jobs.wait(job, timeout):
+            note = "\n[wait cancelled]" if cancellation.current().cancelled else f"\n[still running after {timeout}s wait]"
+        elif action == "kill":
+            jobs.kill(job)
+        output = job.new_output().strip() or "(no new output)"
+        return self._bash.limit_output(f"job {job.id}: {job.status()}\n{output}{note}")
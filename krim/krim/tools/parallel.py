@@ -0,0 +1,32 @@
+"""Parallel subtasks tool - let the model fan independent work out to sub-agents."""
+
+from __future__ import annotations
+
+from typing import Callable
+
+from krim.tools.base import Tool
+
+
+class ParallelTool(Tool):
+    name = "parallel"
+    description = (
+        "Run independent subtasks at the same time, each by its own agent in an isolated git worktree. "
+        "Their changes are merged back when all finish; conflicting merges are reported, not applied. "
+        "Use only for work that splits cleanly (e.g. separate files or packages). Each task must be self-contained."
+    )
+    parameters = {
+        "tasks": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "One complete task description per subtask",
+        },
+    }
+
+    def __init__(self, runner: Callable[[list[str]], str]):
+        self._runner = runner
+
+    def run(self, tasks: list[str]) -> str:
+        tasks = [t for t in tasks if isinstance(t, str) and t.strip()]
+        if not tasks:
+            return "error: no tasks given"
+        return self._runner(tasks)
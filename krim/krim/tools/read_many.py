@@ -0,0 +1,137 @@
+"""Batch read tool - many files (or globs, or ranges) in one call.
+
+Files are read concurrently and returned in request order under
+`==> path <==` headers. The total is held to a character budget shared
+fairly: small files are shown whole and what they leave is split evenly
+among the larger ones, which are cut at a line boundary with a note saying
+where to continue with `read`. Globs go through the shared walker
+(walk.py), so gitignored files are not read.
+"""
+
+from __future__ import annotations
+
+import glob
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from krim import walk
+from krim.tools.base import Tool
+from krim.tools.read import ReadTool, read_numbered
+
+MAX_FILES = 50
+MAX_WORKERS = 8
+DEFAULT_BUDGET = 60_000  # chars across all files
+_LINE_NO = re.compile(r"^\s*(\d+)\t")
+
+
+def fair_shares(sizes: list[int], budget: int) -> list[int]:
+    """Split budget so no item gets more than it needs and the rest share evenly."""
+    shares = [0] * len(sizes)
+    remaining = max(0, budget)
+    order = sorted(range(len(sizes)), key=sizes.__getitem__)
+    for k, i in enumerate(order):
+        shares[i] = min(sizes[i], remaining // (len(sizes) - k))
+        remaining -= shares[i]
+    return shares
+
+
+def _cut(text: str, share: int, path: str) -> str:
+    """Cut numbered text to share chars at a line boundary, noting where to resume."""
+    kept = text[:share]
+    if "\n" in kept:
+        kept = kept[:kept.rindex("\n")]
+    else:
+        kept = ""
+    last = None
+    for line in reversed(kept.splitlines()):
+        m = _LINE_NO.match(line)
+        if m:
+            last = int(m.group(1))
+            break
+    resume = (last or 0) + 1
+    note = f"... [cut to fit the batch budget; continue with read path={path} offset={resume}]"
+    return f"{kept}\n{note}" if kept else note
+
+
+class ReadManyTool(Tool):
+    name = "read_many"
+    description = (
+        "Read several files in one call, e.g. while exploring. Each entry is a path or glob "
+        "(** allowed) with optional offset/limit. Output is shared fairly under one size budget; "
+        "cut files say where to continue with read."
+    )
+    parameters = {
+        "files": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "File path or glob"},
+                    "offset": {"type": "integer", "description": "Start from this line (1-indexed)"},
+                    "limit": {"type": "integer", "description": "Max lines to return"},
+                },
+                "required": ["path"],
+            },
+            "description": "Files to read, in order",
+        },
+        "max_chars": {"type": "integer", "description": f"Total output budget (default {DEFAULT_BUDGET})",
+                      "optional": True},
+    }
+
+    def run(self, files: list[dict], max_chars: int = DEFAULT_BUDGET) -> str:
+        requests, notes = self._expand(files)
+        if not requests:
+            return "error: no files matched" + (f" ({'; '.join(notes)})" if notes else "")
+
+        def read(req):
+            path, offset, limit = req
+            return read_numbered(path, offset, limit, ReadTool.MAX_FILE_SIZE)
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(requests))) as pool:
+            texts = list(pool.map(read, requests))
+
+        headers = [f"==> {path} <==" for path, _, _ in requests]
+        overhead = sum(len(h) + 2 for h in headers)
+        shares = fair_shares([len(t) for t in texts], max_chars - overhead)
+        parts, cut = [], 0
+        for header, text, share, (path, _, _) in zip(headers, texts, shares, requests):
+            if len(text) > share:
+                text = _cut(text, share, path)
+                cut += 1
+            parts.append(f"{header}\n{text}")
+
+        errors = sum(1 for t in texts if t.startswith("error: "))
+        summary = f"read {len(requests) - errors} file(s)"
+        if errors:
+            summary += f", {errors} error(s)"
+        if cut:
+            summary += f", {cut} cut to fit {max_chars:,} chars"
+        return "\n\n".join([summary + "".join(f"\n{n}" for n in notes)] + parts)
+
+    def _expand(self, files: list[dict]) -> tuple[list[tuple[str, int, int]], list[str]]:
+        """(path, offset, limit) per file, globs expanded and duplicates dropped, capped at MAX_FILES."""
+        out: list[tuple[str, int, int]] = []
+        seen: set[str] = set()
+        notes: list[str] = []
+        for entry in files:
+            if isinstance(entry, str):
+                entry = {"path": entry}
+            if not isinstance(entry, dict) or not entry.get("path"):
+                continue
+            path = self.resolve(entry["path"])
+            offset, limit = int(entry.get("offset") or 1), int(entry.get("limit") or 2000)
+            if glob.has_magic(path):
+                matches = walk.glob_files(path)  # gitignore-aware: no .venv or node_modules eating the budget
+                if not matches:
+                    notes.append(f"no match: {entry['path']}")
+            else:
+                matches = [path]
+            for p in matches:
+                if p in seen:
+                    continue
+                if len(out) >= MAX_FILES:
+                    notes.append(f"stopped at {MAX_FILES} files; narrow the globs")
+                    return out, notes
+                seen.add(p)
+                out.append((p, offset, limit))
+        return out, notes
@@ -0,0 +1,26 @@
+"""Saved result tool - page or grep a large output spilled to disk."""
+
+from __future__ import annotations
+
+from krim.spill import ResultStore
+from krim.tools.base import Tool
+
+
+class ResultTool(Tool):
+    name = "result"
+    description = (
+        "Read a large tool output that was saved instead of shown in full. "
+        "Pass the id from the 'saved as rN' note. Page with offset/limit, or filter lines with grep (regex)."
+    )
+    parameters = {
+        "id": {"type": "string", "description": "Saved result id, e.g. r1"},
+        "offset": {"type": "integer", "description": "Start from this line (1-indexed)", "optional": True},
+        "limit": {"type": "integer", "description": "Max lines to return (default 200)", "optional": True},
+        "grep": {"type": "string", "description": "Only return lines matching this regex", "optional": True},
+    }
+
+    def __init__(self, store: ResultStore):
+        self._store = store
+
+    def run(self, id: str, offset: int = 1, limit: int = 200, grep: str | None = None) -> str:
+        return self._store.read(id, offset=offset, limit=limit, grep=grep)
@@ -0,0 +1,77 @@
+"""Test tool - pytest through the warm worker, results as counts + failures."""
+
+from __future__ import annotations
+
+import shlex
+
+from krim import cancellation
+from krim.testworker import TestRun, TestWorker, WorkerError
+from krim.tools.base import Tool
+from krim.tools.bash import BashTool
+from krim.truncate import truncate
+
+MAX_FAILURES = 10  # shown in full; the rest are listed by node id
+FAILURE_CHARS = 1_500
+# pytest exit codes: 0 ok, 1 failures, 2 interrupted, 3 internal error, 4 usage error, 5 nothing collected
+_EXIT_NOTES = {2: "interrupted", 3: "internal error", 4: "usage error", 5: "no tests collected"}
+
+
+class TestTool(Tool):
+    name = "test"
+    description = (
+        "Run pytest in a warm worker (dependencies already imported, so reruns are fast). "
+        "Returns pass/fail counts and the failing tests' reports. "
+        "args are normal pytest arguments, e.g. 'tests/test_api.py -k login -x'."
+    )
+    parameters = {
+        "args": {"type": "string", "description": "pytest arguments (default: whole suite)", "optional": True},
+        "timeout": {"type": "integer", "description": "Timeout in seconds (default 300)", "optional": True},
+    }
+
+    def __init__(self, worker: TestWorker, bash: BashTool):
+        self._worker = worker
+        self._bash = bash  # safety rules and cwd
+
+    def run(self, args: str = "", timeout: int = 300) -> str:
+        try:
+            argv = shlex.split(args)
+        except ValueError as e:
+            return f"error: bad args: {e}"
+        denied = self._bash.approve(f"pytest {args}".strip())
+        if denied:
+            return denied
+        try:
+            result = self._worker.run(argv, cwd=self._bash.cwd, timeout=timeout)
+        except WorkerError as e:
+            if cancellation.current().cancelled:
+                return cancellation.CANCELLED_RESULT
+            if str(e) == "timeout":
+                return f"error: tests timed out after {timeout}s (worker killed; the next run starts cold)"
+            return f"error: test worker: {e}"
+        return self._bash.limit_output(format_run(result))
+
+
+def format_run(result: TestRun) -> str:
+    counts = ", ".join(f"{n} {k}" for k, n in result.counts.items()) or "no tests ran"
+    head = f"{counts} in {result.seconds:.2f}s"
+    if not result.warm:
+        head += " (worker restarted)"
+    note = _EXIT_NOTES.get(result.exit_code)
+    if note:
+        head += f" [{note}]"
+    lines = [head]
+
+    for f in result.failures[:MAX_FAILURES]:
+        label = "FAILED" if f.when == "call" else f"ERROR ({f.when})"
+        lines += ["", f"{label} {f.nodeid}", truncate(f.message.strip(), FAILURE_CHARS)]
+    rest = result.failures[MAX_FAILURES:]
+    if rest:
+        lines += ["", f"... {len(rest)} more: " + ", ".join(f.nodeid for f in rest)]
+
+    # no structured failure to show for crashes and usage errors - pytest's own output says why
+    if result.crash or (result.exit_code not in (0, 1, 5) and not result.failures):
+        if result.crash:
+            lines += ["", f"crash: {result.crash}"]
+        if result.output.strip():
+            lines += ["", "pytest output:", truncate(result.output.strip(), 3_000)]
+    return "\n".join(lines)
@@ -1,9 +1,11 @@
-"""Write file tool."""
+"""Write file tool. Reports a diff when replacing a file, and syntax errors (see syntax.py)."""
 
 from __future__ import annotations
 
 import os
 
+from krim import cmdcache, syntax
+from krim.checkpoints import CheckpointStore
 from krim.tools.base import Tool
 
 
@@ -15,15 +17,31 @@ class WriteTool(Tool):
         "content": {"type": "string", "description": "Content to write"},
     }
 
+    checkpoints: CheckpointStore | None = None  # snapshot before each write, for /rewind
+
     def run(self, path: str, content: str) -> str:
-        path = os.path.expanduser(path)
+        path = self.resolve(path)
         try:
             parent = os.path.dirname(path)
             if parent:
                 os.makedirs(parent, exist_ok=True)
+            before = None
+            if os.path.isfile(path):
+                try:
+                    with open(path, "r") as f:
+                        before = f.read()
+                except (OSError, UnicodeDecodeError):
+                    pass  # binary or unreadable: no diff
+            if self.checkpoints:
+                self.checkpoints.record(path, self.name, content.encode())
             with open(path, "w") as f:
                 f.write(content)
+            cmdcache.invalidate()
             lines = content.count("\n") + (1 if content and not content.endswith("\n") else 0)
-            return f"wrote {path} ({lines} lines)"
+            result = f"wrote {path} ({lines} lines)"
+            if before == content:
+                result += " (unchanged)"
+            feedback = syntax.feedback(path, before, content)
+            return f"{result}\n{feedback}" if feedback else result
         except Exception as e:
             return f"error: {e}"
@@ -0,0 +1,358 @@
+"""Distributed tracing - OTLP-JSON spans for agent runs.
+
+Trace shape:
+  agent.run                  one trace per request
+    agent.turn               one per loop iteration
+      model.chat             tokens, latency, time to first token, retries (events)
+      tool.<name>            output size, error, exit code
+        bash.exec / mcp.<method>
+
+Off unless "tracing" is configured (or --trace is given):
+  "tracing": {"export": "traces.jsonl" | "http://localhost:4318/v1/traces",
+              "sample": 0.1, "service_name": "krim"}
+
+Sampling is decided once per trace, at its root span. Finished spans go on a
+bounded queue; a daemon thread batches them and writes one OTLP
+ExportTraceServiceRequest per batch (a JSON line in a file, or a POST to a
+collector). The agent loop never waits on export, and spans are dropped if
+the queue is full.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import queue
+import random
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+from rich.console import Console
+
+from krim import __version__
+
+console = Console()
+
+F = TypeVar("F", bound=Callable)
+
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+
+BATCH_SIZE = 256
+BATCH_INTERVAL = 2.0  # seconds between flushes when the batch isn't full
+QUEUE_SIZE = 4096
+
+_tracer: Tracer | None = None
+
+
+class _NoopSpan:
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key: str, value):
+        pass
+
+    def event(self, name: str, **attrs):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    recording = True
+
+    def __init__(self, tracer: Tracer, name: str, trace_id: str, parent_id: str | None,
+                 kind: int, attrs: dict | None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attrs: dict = dict(attrs) if attrs else {}
+        self.events: list[tuple[int, str, dict]] = []
+        self.error: str | None = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.end()
+        return False
+
+    def set(self, key: str, value):
+        self.attrs[key] = value
+
+    def event(self, name: str, **attrs):
+        self.events.append((time.time_ns(), name, attrs))
+
+    def end(self):
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        self.tracer._pop(self)
+        self.tracer._submit(self)
+
+    def otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _attributes(self.attrs),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = [
+                {"timeUnixNano": str(t), "name": name, "attributes": _attributes(attrs)}
+                for t, name, attrs in self.events
+            ]
+        if self.error:
+            span["status"] = {"code": 2, "message": self.error}
+        return span
+
+
+class _Unsampled:
+    """Marks a trace that lost the sampling roll, so its children are skipped too."""
+    recording = False
+
+
+_UNSAMPLED = _Unsampled()
+
+
+def _value(v) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}  # OTLP-JSON encodes int64 as a string
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _attributes(attrs: dict) -> list[dict]:
+    return [{"key": k, "value": _value(v)} for k, v in attrs.items() if v is not None]
+
+
+class Tracer:
+    def __init__(self, export: str, sample: float = 1.0, service_name: str = "krim"):
+        self.export = export
+        self.sample = sample
+        self.service_name = service_name
+        self.dropped = 0
+        self._local = threading.local()
+        self._queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._warned = False
+        self._thread = threading.Thread(target=self._export_loop, name="krim-trace-export", daemon=True)
+        self._thread.start()
+
+    # -- context --
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _pop(self, span: Span):
+        stack = self._stack()
+        # children left open by an exception are unwound with their parent
+        if span in stack:
+            del stack[stack.index(span):]
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def start_span(self, name: str, attrs: dict | None = None, kind: int = KIND_INTERNAL):
+        parent = self.current()
+        if parent is _UNSAMPLED:
+            return _NOOP
+        if parent is None:
+            if random.random() >= self.sample:
+                return _UnsampledRoot(self)
+            span = Span(self, name, secrets.token_hex(16), None, kind, attrs)
+        else:
+            span = Span(self, name, parent.trace_id, parent.span_id, kind, attrs)
+        self._stack().append(span)
+        return span
+
+    # -- export --
+
+    def _submit(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _payload(self, spans: list[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": self.service_name})},
+            "scopeSpans": [{
+                "scope": {"name": "krim", "version": __version__},
+                "spans": [s.otlp() for s in spans],
+            }],
+        }]}
+
+    def _write(self, spans: list[Span]):
+        data = json.dumps(self._payload(spans))
+        try:
+            if self.export.startswith(("http://", "https://")):
+                req = urllib.request.Request(
+                    self.export, data=data.encode("utf-8"),
+                    headers={"Content-Type": "application/json"}, method="POST",
+                )
+                urllib.request.urlopen(req, timeout=5).close()
+            else:
+                with open(self.export, "a", encoding="utf-8") as f:
+                    f.write(data + "\n")
+        except Exception as e:
+            self.dropped += len(spans)
+            if not self._warned:
+                self._warned = True
+                console.print(f"[yellow]tracing: export to {self.export} failed: {e}[/]")
+
+    def _export_loop(self):
+        batch: list[Span] = []
+        deadline = time.monotonic() + BATCH_INTERVAL
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, Span):
+                batch.append(item)
+            flush = item is not None and not isinstance(item, Span)
+            if batch and (len(batch) >= BATCH_SIZE or time.monotonic() >= deadline or flush):
+                self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + BATCH_INTERVAL
+            if flush:
+                item.set()  # flush marker is a threading.Event
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Export everything queued so far. False if it didn't finish in time."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+
+class _UnsampledRoot:
+    """Root of a trace that wasn't sampled: a no-op that also mutes its children."""
+    recording = False
+
+    def __init__(self, tracer: Tracer):
+        self._tracer = tracer
+        tracer._stack().append(_UNSAMPLED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+        return False
+
+    def set(self, key: str, value):
+        pass
+
+    def event(self, name: str, **attrs):
+        pass
+
+    def end(self):
+        stack = self._tracer._stack()
+        if _UNSAMPLED in stack:
+            del stack[stack.index(_UNSAMPLED):]
+
+
+# -- module API (no-ops unless start() was called) --
+
+def start(export: str, sample: float = 1.0, service_name: str = "krim") -> Tracer:
+    global _tracer
+    _tracer = Tracer(export, sample, service_name)
+    return _tracer
+
+
+def stop() -> Tracer | None:
+    """Stop tracing and flush what's queued."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer:
+        tracer.flush()
+    return tracer
+
+
+def span(name: str, attrs: dict | None = None, kind: int = KIND_INTERNAL):
+    """Start a span; use as a context manager or call .end(). No-op when tracing is off."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return tracer.start_span(name, attrs, kind)
+
+
+def current():
+    """The active span on this thread, to hand to attach() on another thread."""
+    tracer = _tracer
+    return tracer.current() if tracer else None
+
+
+@contextmanager
+def attach(parent):
+    """Make `parent` (from current()) the active span on this thread."""
+    tracer = _tracer
+    if tracer is None or parent is None:
+        yield
+        return
+    stack = tracer._stack()
+    stack.append(parent)
+    try:
+        yield
+    finally:
+        if stack and stack[-1] is parent:
+            stack.pop()
+
+
+def event(name: str, **attrs):
+    """Add an event to the active span."""
+    tracer = _tracer
+    if tracer is None:
+        return
+    active = tracer.current()
+    if isinstance(active, Span):
+        active.event(name, **attrs)
+
+
+def traced(name: str, kind: int = KIND_INTERNAL) -> Callable[[F], F]:
+    """Decorator form of span()."""
+    def wrap(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            with span(name, kind=kind):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return wrap
@@ -0,0 +1,295 @@
+"""Fast file walker - os.scandir on a thread pool, honouring .gitignore.
+
+Shared by the glob and read_many tools and the project tree in the system prompt. Every
+directory is one task: scan it, read its .gitignore (if any) into compiled
+rules, and queue the subdirectories that aren't ignored. Ignored
+directories are never entered, which is where the time goes in a repo with
+node_modules or a virtualenv.
+
+Supported gitignore syntax: comments, `!` negation, trailing `/` (dirs
+only), anchored patterns (containing `/`), `*`, `?`, `[...]` and `**`.
+Rules come from .git/info/exclude and every .gitignore on the way down;
+the last matching rule wins, deeper files overriding shallower ones.
+"""
+
+from __future__ import annotations
+
+import glob as globlib
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+ALWAYS_SKIP = {".git", ".hg", ".svn"}
+# skipped even without a .gitignore saying so (the old project-tree fallback list)
+NOISE = {"node_modules", "__pycache__", ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache"}
+MAX_WORKERS = 8
+
+
+def translate(pattern: str) -> str:
+    """Glob (gitignore flavour) -> regex body for a /-separated relative path."""
+    out: list[str] = []
+    i, n = 0, len(pattern)
+    if pattern.startswith("**/"):
+        out.append("(?:.*/)?")
+        i = 3
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("/**/", i):
+            out.append("/(?:.*/)?")
+            i += 4
+            continue
+        if pattern.startswith("/**", i) and i + 3 == n:
+            out.append("/.*")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+@dataclass(frozen=True)
+class Rule:
+    regex: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+def parse_gitignore(text: str) -> list[Rule]:
+    rules = []
+    for line in text.splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):  # \! and \# are literal
+            line = line[1:] if line[1:2] in ("!", "#") else line
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        if "/" in line:  # anchored to the .gitignore's directory
+            body = translate(line.lstrip("/"))
+        else:
+            body = "(?:.*/)?" + translate(line)
+        rules.append(Rule(re.compile(f"^{body}$"), negate, dir_only))
+    return rules
+
+
+@dataclass(frozen=True)
+class Ignore:
+    """Rule layers, shallowest first: (base, prefix, rules).
+
+    base is the rules' directory relative to the walk root. Rules from above
+    the walk root (when walking a subdirectory of a repo) have base "" and a
+    prefix: the walk root's path relative to their directory.
+    """
+
+    layers: tuple[tuple[str, str, tuple[Rule, ...]], ...] = ()
+
+    def add(self, base: str, rules: list[Rule], prefix: str = "") -> Ignore:
+        return Ignore(self.layers + ((base, prefix, tuple(rules)),)) if rules else self
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        result = False
+        for base, prefix, rules in self.layers:
+            if base:
+                if not rel.startswith(base + "/"):
+                    continue
+                sub = rel[len(base) + 1:]
+            else:
+                sub = rel
+            if prefix:
+                sub = f"{prefix}/{sub}"
+            for rule in rules:
+                if (is_dir or not rule.dir_only) and rule.regex.match(sub):
+                    result = not rule.negate
+        return result
+
+
+def _read_rules(path: str) -> list[Rule]:
+    try:
+        with open(path, "r", errors="replace") as f:
+            return parse_gitignore(f.read())
+    except OSError:
+        return []
+
+
+def _base_ignore(root: str) -> Ignore:
+    """Rules that apply at root: .git/info/exclude plus .gitignore files from the repo root down to root."""
+    repo = root
+    while not os.path.exists(os.path.join(repo, ".git")):
+        parent = os.path.dirname(repo)
+        if parent == repo:
+            return Ignore()  # not in a repo: only root's own .gitignore (read by the walk) applies
+        repo = parent
+    ignore = Ignore()
+    rel = os.path.relpath(root, repo).replace(os.sep, "/")
+    prefix = "" if rel == "." else rel
+    ignore = ignore.add("", _read_rules(os.path.join(repo, ".git", "info", "exclude")), prefix)
+    if prefix:
+        d, parts = repo, prefix.split("/")
+        for i in range(len(parts)):
+            ignore = ignore.add("", _read_rules(os.path.join(d, ".gitignore")), "/".join(parts[i:]))
+            d = os.path.join(d, parts[i])
+    return ignore
+
+
+def path_ignored(root: str, rel: str, is_dir: bool, skip_noise: bool = True,
+                 layers: dict[str, Ignore] | None = None) -> bool:
+    """Would walk(root) skip rel (itself or via an ancestor)? `layers` caches rules per directory."""
+    layers = {} if layers is None else layers
+    if "" not in layers:
+        layers[""] = _base_ignore(root).add("", _read_rules(os.path.join(root, ".gitignore")))
+    ignore = layers[""]
+    parts = rel.split("/")
+    for i, name in enumerate(parts):
+        sub = "/".join(parts[:i + 1])
+        last = i == len(parts) - 1
+        as_dir = is_dir or not last
+        if as_dir and (name in ALWAYS_SKIP or (skip_noise and name in NOISE)):
+            return True
+        if ignore.ignored(sub, as_dir):
+            return True
+        if not last:
+            if sub not in layers:
+                layers[sub] = ignore.add(sub, _read_rules(os.path.join(root, sub, ".gitignore")))
+            ignore = layers[sub]
+    return False
+
+
+@dataclass
+class FileEntry:
+    path: str  # relative to the walk root, / separated
+    mtime: float = 0.0
+    is_dir: bool = False
+
+
+def _scan(root: str, rel: str, depth: int, ignore: Ignore, gitignore: bool, skip_noise: bool,
+          want_mtime: bool, dir_filter) -> tuple[list[FileEntry], list[tuple[str, int, Ignore]]]:
+    full = os.path.join(root, rel) if rel else root
+    if gitignore:
+        ignore = ignore.add(rel, _read_rules(os.path.join(full, ".gitignore")))
+    files: list[FileEntry] = []
+    dirs: list[tuple[str, int, Ignore]] = []
+    try:
+        it = os.scandir(full)
+    except OSError:
+        return files, dirs
+    with it:
+        for entry in it:
+            child = f"{rel}/{entry.name}" if rel else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in ALWAYS_SKIP or (skip_noise and entry.name in NOISE):
+                    continue
+                if gitignore and ignore.ignored(child, True):
+                    continue
+                if dir_filter is None or dir_filter(child):
+                    dirs.append((child, depth + 1, ignore))
+            else:
+                if gitignore and ignore.ignored(child, False):
+                    continue
+                mtime = 0.0
+                if want_mtime:
+                    try:
+                        mtime = entry.stat(follow_symlinks=False).st_mtime
+                    except OSError:
+                        continue
+                files.append(FileEntry(child, mtime))
+    return files, dirs
+
+
+def walk(
+    root: str,
+    max_depth: int | None = None,
+    gitignore: bool = True,
+    skip_noise: bool = True,
+    want_mtime: bool = False,
+    dir_filter=None,
+    workers: int = MAX_WORKERS,
+    include_dirs: bool = False,
+) -> list[FileEntry]:
+    """Every file under root that isn't ignored, in no particular order.
+
+    max_depth: directories deeper than this are not entered (0 = root only).
+    dir_filter: optional callable(rel_dir) -> bool to prune directories early.
+    include_dirs: also return the directories entered (is_dir=True).
+    """
+    root = os.path.abspath(root)
+    ignore = _base_ignore(root) if gitignore else Ignore()
+    args = (gitignore, skip_noise, want_mtime, dir_filter)
+    found: list[FileEntry] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="krim-walk") as pool:
+        pending = {pool.submit(_scan, root, "", 0, ignore, *args)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                files, dirs = fut.result()
+                found.extend(files)
+                for rel, depth, sub_ignore in dirs:
+                    if max_depth is None or depth <= max_depth:
+                        if include_dirs:
+                            found.append(FileEntry(rel, is_dir=True))
+                        pending.add(pool.submit(_scan, root, rel, depth, sub_ignore, *args))
+    return found
+
+
+def split_glob(pattern: str) -> tuple[str, str]:
+    """'src/**/test_*.py' -> ('src', '**/test_*.py'): the literal leading directories, then the rest."""
+    parts = [p for p in pattern.split("/") if p not in ("", ".")]
+    literal = []
+    for p in parts[:-1]:
+        if globlib.has_magic(p):
+            break
+        literal.append(p)
+    head = "/".join(literal)
+    if pattern.startswith("/"):
+        head = "/" + head
+    return head, "/".join(parts[len(literal):])
+
+
+def glob_files(pattern: str, gitignore: bool = True, skip_noise: bool = True) -> list[str]:
+    """Files matching pattern (* within one directory, ** across), sorted; its literal head is never ignored."""
+    head, rest = split_glob(pattern)
+    base = head or "."
+    if not rest or not os.path.isdir(base):
+        return []
+    regex = re.compile("^" + translate(rest) + "$")
+    entries = walk(base, max_depth=None if "**" in rest else rest.count("/"),
+                   gitignore=gitignore, skip_noise=skip_noise)
+    return sorted(os.path.join(head, e.path) if head else e.path for e in entries if regex.match(e.path))
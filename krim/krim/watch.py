@@ -0,0 +1,312 @@
+"""Working-tree watcher - tells krim's caches what changed, instead of them re-checking.
+
+Opt in with "watch": "auto" (inotify on Linux, else polling), "inotify" or
+"poll". The watcher keeps a dirty set of paths (relative to the root) and
+calls subscribers with each batch of changes, or with None when it lost
+track (inotify queue overflow) and everything must be assumed changed.
+
+inotify (via ctypes, no dependency): one watch per directory the walker
+would enter, so gitignored trees and node_modules cost nothing, plus .git
+itself for index/HEAD changes. New directories are watched as they appear.
+Events are read on a background thread; sync() drains whatever the kernel
+has queued so far, so a reader that calls it first never sees stale data
+for changes that already happened.
+
+Polling re-walks the tree every POLL_INTERVAL seconds and diffs mtimes. It
+is the fallback when inotify is missing or out of watches
+(fs.inotify.max_user_watches).
+
+Subscribers: the command cache (drops results on any change) and FileIndex
+below, which keeps the glob tool's file list current in O(changed paths).
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+from typing import Callable
+
+from rich.console import Console
+
+from krim.walk import FileEntry, path_ignored, walk
+
+console = Console()
+
+POLL_INTERVAL = 1.0
+SKIP = {".krim"}  # krim's own sessions and spilled results change every turn
+MODES = ("off", "auto", "inotify", "poll")
+GIT_FILES = {"index", "HEAD", "packed-refs"}  # in .git, only these matter (not every *.lock git takes)
+
+Listener = Callable[[set[str] | None], None]
+
+# <sys/inotify.h>
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF = 0x400, 0x800
+IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR = 0x4000, 0x8000, 0x01000000, 0x40000000
+IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+
+def _skipped(rel: str) -> bool:
+    return rel.split("/", 1)[0] in SKIP
+
+
+class _Inotify:
+    name = "inotify"
+
+    def __init__(self, root: str):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is Linux-only")
+        self.root = root
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wds: dict[int, str] = {}
+        self._layers: dict = {}
+        try:
+            self._add("")
+            if os.path.isdir(os.path.join(root, ".git")):
+                self._add(".git")
+            self._add_tree("")
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, rel: str):
+        path = os.path.join(self.root, rel) if rel else self.root
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "out of inotify watches (fs.inotify.max_user_watches)")
+            return  # gone already, or not a directory
+        self.wds[wd] = rel
+
+    def _add_tree(self, rel: str) -> set[str]:
+        """Watch every directory under rel; returns the files found (they may predate the watch)."""
+        found = set()
+        base = os.path.join(self.root, rel) if rel else self.root
+        for e in walk(base, include_dirs=True):
+            sub = f"{rel}/{e.path}" if rel else e.path
+            if _skipped(sub):
+                continue
+            if e.is_dir:
+                self._add(sub)
+            else:
+                found.add(sub)
+        return found
+
+    def read(self) -> set[str] | None:
+        changed: set[str] = set()
+        overflow = False
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            off = 0
+            while off + _EVENT.size <= len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, off)
+                name = os.fsdecode(buf[off + _EVENT.size:off + _EVENT.size + length].rstrip(b"\0"))
+                off += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.wds.pop(wd, None)
+                    continue
+                base = self.wds.get(wd)
+                if base is None:
+                    continue
+                rel = f"{base}/{name}" if base and name else (name or base)
+                if not rel or _skipped(rel) or (base == ".git" and name not in GIT_FILES):
+                    continue
+                changed.add(rel)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and not base.startswith(".git"):
+                    if not path_ignored(self.root, rel, True, layers=self._layers):
+                        self._add(rel)
+                        changed |= self._add_tree(rel)
+        if any(p.endswith(".gitignore") for p in changed):
+            self._layers.clear()
+        return None if overflow else changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class _Poll:
+    name = "poll"
+    fd = -1
+
+    def __init__(self, root: str):
+        self.root = root
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict[str, float]:
+        files = {e.path: e.mtime for e in walk(self.root, want_mtime=True) if not _skipped(e.path)}
+        for name in ("index", "HEAD"):
+            try:
+                files[f".git/{name}"] = os.stat(os.path.join(self.root, ".git", name)).st_mtime
+            except OSError:
+                pass
+        return files
+
+    def read(self) -> set[str] | None:
+        new = self._scan()
+        old, self.snapshot = self.snapshot, new
+        return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    def __init__(self, root: str, mode: str = "auto", interval: float = POLL_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.mode = mode
+        self.interval = interval
+        self.backend: _Inotify | _Poll | None = None
+        self.dirty: set[str] = set()
+        self.overflows = 0
+        self._listeners: list[Listener] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, fn: Listener):
+        self._listeners.append(fn)
+
+    def start(self) -> str:
+        """Start watching; returns the backend used."""
+        if self.mode in ("auto", "inotify"):
+            try:
+                self.backend = _Inotify(self.root)
+            except (OSError, AttributeError) as e:  # AttributeError: libc without inotify
+                if self.mode == "inotify":
+                    console.print(f"[yellow]watch: inotify unavailable ({e}), polling instead[/]")
+        if self.backend is None:
+            self.backend = _Poll(self.root)
+        self._thread = threading.Thread(target=self._loop, name="krim-watch", daemon=True)
+        self._thread.start()
+        return self.backend.name
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if self.backend.fd >= 0:
+                try:
+                    ready, _, _ = select.select([self.backend.fd], [], [], 0.2)
+                except (OSError, ValueError):  # closed under us by stop()
+                    return
+                if ready:
+                    self.sync()
+            elif not self._stop.wait(self.interval):
+                with self._lock:
+                    self._emit(self.backend.read())
+
+    def sync(self):
+        """Deliver every change the kernel has reported so far (no-op when polling)."""
+        if self.backend is None or self.backend.fd < 0:
+            return
+        with self._lock:
+            try:
+                changed = self.backend.read()
+            except OSError:
+                return
+            self._emit(changed)
+
+    def _emit(self, changed: set[str] | None):
+        if changed is None:
+            self.overflows += 1
+        elif not changed:
+            return
+        else:
+            self.dirty |= changed
+        for fn in list(self._listeners):
+            try:
+                fn(changed)
+            except Exception as e:
+                console.print(f"[yellow]watch: subscriber failed: {e}[/]")
+
+    def take_dirty(self) -> set[str]:
+        with self._lock:
+            dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(1)
+        with self._lock:
+            if self.backend:
+                self.backend.close()
+
+
+class FileIndex:
+    """Non-ignored files under the watched root with their mtimes, updated per changed path."""
+
+    def __init__(self, watcher: Watcher):
+        self.watcher = watcher
+        self.root = watcher.root
+        self.files: dict[str, float] = {}
+        self.rebuilds = 0
+        self._layers: dict = {}
+        self._lock = threading.Lock()
+        self._rebuild()
+        watcher.subscribe(self._on_change)
+
+    def _rebuild(self):
+        self._layers.clear()
+        self.files = {e.path: e.mtime for e in walk(self.root, want_mtime=True) if not _skipped(e.path)}
+        self.rebuilds += 1
+
+    def _on_change(self, changed: set[str] | None):
+        with self._lock:
+            if changed is None or any(p.endswith(".gitignore") or p == ".git/info/exclude" for p in changed):
+                self._rebuild()  # ignore rules changed: what's listed may change anywhere
+                return
+            for rel in changed:
+                if not rel.startswith(".git/") and rel != ".git" and not _skipped(rel):
+                    self._update(rel)
+
+    def _update(self, rel: str):
+        try:
+            st = os.stat(os.path.join(self.root, rel), follow_symlinks=False)
+        except OSError:
+            st = None
+        if st is None or stat.S_ISDIR(st.st_mode):
+            # gone (or now a directory): drop it and anything that was under it
+            if self.files.pop(rel, None) is None:
+                prefix = rel + "/"
+                for p in [p for p in self.files if p.startswith(prefix)]:
+                    del self.files[p]
+            if st is not None and not path_ignored(self.root, rel, True, layers=self._layers):
+                for e in walk(os.path.join(self.root, rel), want_mtime=True):
+                    self.files[f"{rel}/{e.path}"] = e.mtime
+        elif not path_ignored(self.root, rel, False, layers=self._layers):
+            self.files[rel] = st.st_mtime
+
+    def entries(self, under: str = "") -> list[FileEntry] | None:
+        """Files under the absolute dir `under` (paths relative to it), or None if it's outside the root."""
+        self.watcher.sync()
+        under = os.path.abspath(under or self.root)
+        if under == self.root:
+            prefix = ""
+        elif under.startswith(self.root + os.sep):
+            prefix = os.path.relpath(under, self.root).replace(os.sep, "/") + "/"
+        else:
+            return None
+        with self._lock:
+            return [FileEntry(p[len(prefix):], m) for p, m in self.files.items() if p.startswith(prefix)]
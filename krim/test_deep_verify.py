@@ -874,16 +874,16 @@ print("\n=== TOOL REGISTRY ===")
 def test_tool_registry():
     from krim.tools import create_tools, get_tool, tool_schemas
     tools = create_tools()
-    assert len(tools) == 4
+    assert len(tools) == 7
     names = {t.name for t in tools}
-    assert names == {"read", "write", "edit", "bash"}
-test("registry: creates 4 tools", test_tool_registry)
+    assert names == {"read", "read_many", "write", "edit", "glob", "bash", "job"}
+test("registry: creates 7 tools", test_tool_registry)
 
 def test_tool_schemas():
     from krim.tools import create_tools, tool_schemas
     tools = create_tools()
     schemas = tool_schemas(tools)
-    assert len(schemas) == 4
+    assert len(schemas) == 7
     for s in schemas:
         assert "name" in s
         assert "description" in s
@@ -1405,6 +1405,2245 @@ def test_normalize_whitespace():
     assert _normalize_whitespace("") == ""
 test("fuzzy: normalize whitespace", test_normalize_whitespace)
 
+# ============================================================
+# 24. STREAM RESUME
+# ============================================================
+print("\n=== STREAM RESUME ===")
+
+def _fake_stream_client(scripts):
+    """Fake anthropic client: each messages.stream() plays the next event script."""
+    import threading
+    from types import SimpleNamespace as NS
+    calls = []
+
+    class FakeStream:
+        def __init__(self, events):
+            self.events = events
+            self.closed = threading.Event()
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def close(self):
+            self.closed.set()
+        def __iter__(self):
+            for ev in self.events:
+                if ev == "stall":  # hang until the connection is closed
+                    self.closed.wait(5)
+                if self.closed.is_set():
+                    raise ConnectionError("stream closed")
+                if isinstance(ev, Exception):
+                    raise ev
+                yield ev
+        def get_final_message(self):
+            return NS(stop_reason="end_turn")
+
+    def stream(**kwargs):
+        calls.append(kwargs)
+        return FakeStream(scripts[len(calls) - 1])
+
+    return NS(messages=NS(stream=stream)), calls
+
+def _text_ev(t):
+    from types import SimpleNamespace as NS
+    return NS(type="content_block_delta", delta=NS(type="text_delta", text=t))
+
+def test_stream_resume_prefill():
+    """Partial text is kept and sent back as prefill; nothing is printed twice."""
+    from krim.models.claude import ClaudeModel
+    from krim.retry import with_retry
+    client, calls = _fake_stream_client([
+        [_text_ev("Hello "), _text_ev("wor"), ConnectionError("reset")],
+        [_text_ev("ld!")],
+    ])
+    model = ClaudeModel.__new__(ClaudeModel)
+    model.model, model.max_tokens, model.client, model._checkpoint = "m", 100, client, None
+    printed = []
+    msgs = [{"role": "user", "content": "hi"}]
+    resp = with_retry(model.chat, base_delay=0.01)(messages=msgs, tools=[], stream_callback=printed.append)
+    assert resp.text == "Hello world!"
+    assert "".join(printed) == "Hello world!"
+    assert calls[1]["messages"][-1] == {"role": "assistant", "content": "Hello wor"}
+    assert len(msgs) == 1  # caller's history untouched
+test("stream resume: partial text continues via prefill", test_stream_resume_prefill)
+
+def test_stream_resume_completed_tool_calls():
+    """Completed tool_use blocks are returned without another request."""
+    from types import SimpleNamespace as NS
+    from krim.models.claude import ClaudeModel
+    from krim.retry import with_retry
+    client, calls = _fake_stream_client([[
+        NS(type="content_block_start", content_block=NS(type="tool_use", id="t1", name="bash")),
+        NS(type="content_block_delta", delta=NS(type="input_json_delta", partial_json='{"command": "ls"}')),
+        NS(type="content_block_stop"),
+        NS(type="content_block_start", content_block=NS(type="tool_use", id="t2", name="bash")),
+        ConnectionError("reset"),
+    ]])
+    model = ClaudeModel.__new__(ClaudeModel)
+    model.model, model.max_tokens, model.client, model._checkpoint = "m", 100, client, None
+    msgs = [{"role": "user", "content": "hi"}]
+    resp = with_retry(model.chat, base_delay=0.01)(messages=msgs, tools=[], stream_callback=lambda t: None)
+    assert len(calls) == 1
+    assert [tc.id for tc in resp.tool_calls] == ["t1"]
+    assert resp.tool_calls[0].args == {"command": "ls"}
+    assert not resp.stop
+test("stream resume: completed tool calls survive the break", test_stream_resume_completed_tool_calls)
+
+def test_stream_no_checkpoint_on_fatal_error():
+    from krim.models.claude import ClaudeModel
+    client, calls = _fake_stream_client([[_text_ev("abc"), ValueError("bad")]])
+    model = ClaudeModel.__new__(ClaudeModel)
+    model.model, model.max_tokens, model.client, model._checkpoint = "m", 100, client, None
+    try:
+        model.chat([{"role": "user", "content": "hi"}], [], stream_callback=lambda t: None)
+        assert False, "should have raised"
+    except ValueError:
+        pass
+    assert model._checkpoint is None
+test("stream resume: non-retriable error leaves no checkpoint", test_stream_no_checkpoint_on_fatal_error)
+
+# ============================================================
+# 25. SESSIONS
+# ============================================================
+print("\n=== SESSIONS ===")
+
+def test_session_roundtrip():
+    from pathlib import Path
+    from krim.session import Session
+    with tempfile.TemporaryDirectory() as td:
+        s = Session.create(Path(td) / "sessions", "claude", "m")
+        s.append({"role": "user", "content": "hi"})
+        s.append({"role": "assistant", "content": "hello"})
+        s.record_stats({"turns": 1, "tool_calls": 0, "compactions": 0, "tool_call_names": {}}, 1, 0, 42)
+        s.close()
+        assert (Path(td) / "sessions" / ".gitignore").read_text() == "*\n"
+        state = Session.open(Path(td) / "sessions").load()
+        assert state.id == s.id
+        assert state.provider == "claude"
+        assert [m["content"] for m in state.messages] == ["hi", "hello"]
+        assert state.total_turns == 1
+        assert state.tokens == 42
+test("session: write, reopen latest, load", test_session_roundtrip)
+
+def test_session_reset_and_torn_line():
+    from pathlib import Path
+    from krim.session import Session
+    with tempfile.TemporaryDirectory() as td:
+        s = Session.create(Path(td), "claude", "m")
+        for i in range(5):
+            s.append({"role": "user", "content": f"q{i}"})
+        s.reset([{"role": "system", "content": "sys"}, {"role": "user", "content": "q4"}])
+        s.append({"role": "assistant", "content": "a4"})
+        s.close()
+        with open(s.path, "a") as f:
+            f.write('{"t": "msg", "m": {"role": "us')  # crash mid-write
+        state = Session.open(Path(td), s.id).load()
+        assert [m["content"] for m in state.messages] == ["q4", "a4"]
+test("session: compaction reset and torn last line", test_session_reset_and_torn_line)
+
+def test_session_agent_logs_and_restores():
+    from pathlib import Path
+    from krim.agent import Agent
+    from krim.session import Session
+    from krim.models.base import Model, ModelResponse
+
+    class MockModel(Model):
+        def chat(self, messages, tools, stream_callback=None):
+            return ModelResponse(text="done", tool_calls=[], stop=True)
+
+    with tempfile.TemporaryDirectory() as td:
+        session = Session.create(Path(td), "claude", "m")
+        agent = Agent(MockModel(), "claude", "sys", [], max_turns=2, session=session)
+        agent.run("task one")
+        session.close()
+
+        fresh = Agent(MockModel(), "claude", "new sys", [], max_turns=2)
+        fresh.restore(Session.open(Path(td)).load())
+        assert fresh.messages[0] == {"role": "system", "content": "new sys"}
+        assert fresh.messages[1:] == agent.messages[1:]
+        assert fresh.total_turns == 1
+        assert fresh.last_stats.turns == 1
+test("session: agent logs messages and restores them", test_session_agent_logs_and_restores)
+
+def test_session_restore_drops_dangling_tool_use():
+    from krim.agent import Agent
+    from krim.session import SessionState
+    from krim.models.base import Model, ModelResponse
+
+    class MockModel(Model):
+        def chat(self, messages, tools, stream_callback=None):
+            return ModelResponse(text="ok", tool_calls=[], stop=True)
+
+    agent = Agent(MockModel(), "claude", "sys", [], max_turns=1)
+    agent.restore(SessionState(id="x", messages=[
+        {"role": "user", "content": "go"},
+        {"role": "assistant", "content": [{"type": "tool_use", "id": "t1", "name": "bash", "input": {}}]},
+    ]))
+    assert agent.messages[-1] == {"role": "user", "content": "go"}
+test("session: restore drops dangling tool_use", test_session_restore_drops_dangling_tool_use)
+
+def test_session_resume_twice_after_crash():
+    from pathlib import Path
+    from krim.agent import Agent
+    from krim.session import Session
+    from krim.models.base import Model, ModelResponse
+
+    class MockModel(Model):
+        def chat(self, messages, tools, stream_callback=None):
+            return ModelResponse(text="done", tool_calls=[], stop=True)
+
+    with tempfile.TemporaryDirectory() as td:
+        session = Session.create(Path(td), "claude", "m")
+        Agent(MockModel(), "claude", "sys", [], max_turns=2, session=session).run("task one")
+        session.append({"role": "assistant", "content": [{"type": "tool_use", "id": "t1", "name": "bash", "input": {}}]})
+        session.close()
+        with open(session.path, "a") as f:
+            f.write('{"t": "msg", "m": {"role": "us')  # crash mid-write
+
+        for prompt in ("task two", "task three"):
+            session = Session.open(Path(td))
+            agent = Agent(MockModel(), "claude", "sys", [], max_turns=2, session=session)
+            agent.restore(session.load())
+            agent.run(prompt)
+            session.close()
+
+        state = Session.open(Path(td)).load()
+        contents = [m["content"] for m in state.messages]
+        assert contents == ["task one", "done", "task two", "done", "task three", "done"], contents
+test("session: resume twice after a crash keeps every prompt", test_session_resume_twice_after_crash)
+
+# ============================================================
+# 26. MODEL ROUTING
+# ============================================================
+print("\n=== MODEL ROUTING ===")
+
+def _router(**rules):
+    from krim.models.router import RouterModel, RoutingRules
+    from krim.models.base import Model, ModelResponse
+
+    class Tier(Model):
+        def __init__(self, name):
+            self.name = name
+        def chat(self, messages, tools, stream_callback=None):
+            return ModelResponse(text=self.name, tool_calls=[], stop=True)
+
+    return RouterModel(Tier("strong"), Tier("fast"), RoutingRules(**rules))
+
+def _claude_tool_turn(result):
+    return [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "fix it"},
+        {"role": "assistant", "content": [{"type": "tool_use", "id": "t1", "name": "bash", "input": {}}]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1", "content": result}]},
+    ]
+
+def test_router_first_turn_strong_summary_fast():
+    r = _router()
+    msgs = [{"role": "system", "content": "sys"}, {"role": "user", "content": "plan this"}]
+    assert r.route(msgs, [{"name": "bash"}]) == "strong"
+    assert r.route(msgs, []) == "fast"
+    assert r.chat(msgs, []).text == "fast"
+    assert r.counts == {"strong": 0, "fast": 1}
+test("routing: first turn strong, tool-less summary fast", test_router_first_turn_strong_summary_fast)
+
+def test_router_follow_up_heuristics():
+    r = _router()
+    tools = [{"name": "bash"}]
+    assert r.route(_claude_tool_turn("ok"), tools) == "fast"
+    assert r.route(_claude_tool_turn("error: boom"), tools) == "strong"
+    assert r.route(_claude_tool_turn("FAILED\n[exit code: 1]"), tools) == "strong"
+    assert r.route(_claude_tool_turn("x" * 5000), tools) == "strong"
+    assert _router(strong_turns=2).route(_claude_tool_turn("ok"), tools) == "strong"
+test("routing: follow-up size, errors and turn number", test_router_follow_up_heuristics)
+
+def test_router_openai_tool_messages():
+    r = _router()
+    msgs = [
+        {"role": "user", "content": "go"},
+        {"role": "assistant", "tool_calls": [{"id": "t1"}]},
+        {"role": "tool", "tool_call_id": "t1", "name": "bash", "content": "fine"},
+    ]
+    assert r.route(msgs, [{"name": "bash"}]) == "fast"
+    msgs[-1]["content"] = "error: nope"
+    assert r.route(msgs, [{"name": "bash"}]) == "strong"
+test("routing: openai tool result messages", test_router_openai_tool_messages)
+
+def test_create_model_router():
+    from krim.models import create_model
+    from krim.models.router import RouterModel
+    from krim.models.claude import ClaudeModel
+    assert isinstance(create_model("claude", "a"), ClaudeModel)
+    assert isinstance(create_model("claude", "a", fast_model="a"), ClaudeModel)
+    m = create_model("claude", "a", fast_model="b", routing={"strong_turns": 3})
+    assert isinstance(m, RouterModel)
+    assert m.fast.model == "b" and m.rules.strong_turns == 3
+test("routing: create_model wraps tiers only when fast_model differs", test_create_model_router)
+
+def test_fast_model_flags_keep_prompt():
+    from krim.__main__ import parse_args
+    args = parse_args(["--fast", "big task, cheap follow-ups"])
+    assert args.fast and args.fast_model is None and args.prompt == "big task, cheap follow-ups"
+    args = parse_args(["--fast-model", "gpt-4o-mini", "add tests"])
+    assert args.fast_model == "gpt-4o-mini" and args.prompt == "add tests"
+test("routing: --fast/--fast-model never swallow the prompt", test_fast_model_flags_keep_prompt)
+
+# ============================================================
+# 27. MCP MULTIPLEXING
+# ============================================================
+print("\n=== MCP MULTIPLEXING ===")
+
+# minimal stdio MCP server: answers concurrently, out of order, with progress
+FAKE_MCP_SERVER = r'''
+import json, sys, threading, time
+lock = threading.Lock()
+def send(msg):
+    data = json.dumps(msg).encode()
+    with lock:
+        sys.stdout.buffer.write(b"Content-Length: %d\r\n\r\n" % len(data) + data)
+        sys.stdout.buffer.flush()
+def recv():
+    length = 0
+    while True:
+        line = sys.stdin.buffer.readline()
+        if not line:
+            sys.exit(0)
+        if not line.strip():
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return json.loads(sys.stdin.buffer.read(length))
+def call(msg):
+    args = msg["params"]["arguments"]
+    token = msg["params"].get("_meta", {}).get("progressToken")
+    send({"jsonrpc": "2.0", "method": "notifications/progress",
+          "params": {"progressToken": token, "progress": 1, "total": 2}})
+    if args.get("die"):
+        import os; os._exit(1)
+    time.sleep(args.get("sleep", 0))
+    send({"jsonrpc": "2.0", "id": msg["id"],
+          "result": {"content": [{"type": "text", "text": "slept %s" % args.get("sleep", 0)}]}})
+while True:
+    msg = recv()
+    if "id" not in msg:
+        continue
+    if msg["method"] == "initialize":
+        send({"jsonrpc": "2.0", "id": msg["id"], "result": {"capabilities": {}}})
+    elif msg["method"] == "tools/list":
+        send({"jsonrpc": "2.0", "id": msg["id"], "result": {"tools": [
+            {"name": "nap", "description": "sleep", "inputSchema": {"properties": {"sleep": {"type": "number"}}}}]}})
+    elif msg["method"] == "tools/call":
+        threading.Thread(target=call, args=(msg,)).start()
+'''
+
+def _fake_mcp(td):
+    from krim.mcp import McpServer, McpServerConfig
+    script = os.path.join(td, "server.py")
+    with open(script, "w") as f:
+        f.write(FAKE_MCP_SERVER)
+    server = McpServer(McpServerConfig(name="fake", command=[sys.executable, script]))
+    server.start()
+    return server
+
+def test_mcp_concurrent_calls():
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    with tempfile.TemporaryDirectory() as td:
+        server = _fake_mcp(td)
+        try:
+            assert [t.name for t in server.tools] == ["nap"]
+            t0 = time.monotonic()
+            with ThreadPoolExecutor(3) as pool:
+                outs = list(pool.map(lambda s: server.call_tool("nap", {"sleep": s}), [0.5, 0.3, 0.1]))
+            elapsed = time.monotonic() - t0
+            assert outs == ["slept 0.5", "slept 0.3", "slept 0.1"]
+            assert elapsed < 0.85, f"calls serialized: {elapsed:.2f}s"
+        finally:
+            server.stop()
+test("mcp mux: concurrent calls resolve by id", test_mcp_concurrent_calls)
+
+def test_mcp_notification_handler():
+    with tempfile.TemporaryDirectory() as td:
+        server = _fake_mcp(td)
+        try:
+            seen = []
+            server.on_notification("notifications/progress", seen.append)
+            server.call_tool("nap", {"sleep": 0})
+            assert seen and seen[0]["progress"] == 1
+            assert isinstance(seen[0]["progressToken"], int)
+        finally:
+            server.stop()
+test("mcp mux: notifications routed to handlers", test_mcp_notification_handler)
+
+def test_mcp_server_death_fails_pending():
+    import time
+    with tempfile.TemporaryDirectory() as td:
+        server = _fake_mcp(td)
+        try:
+            t0 = time.monotonic()
+            out = server.call_tool("nap", {"die": True})
+            assert out.startswith("error: MCP call failed")
+            assert time.monotonic() - t0 < 5
+            assert server.call_tool("nap", {}).startswith("error: MCP call failed")
+        finally:
+            server.stop()
+test("mcp mux: server exit fails in-flight calls fast", test_mcp_server_death_fails_pending)
+
+def test_agent_overlaps_adjacent_mcp_calls():
+    import threading, time
+    from krim.agent import Agent
+    from krim.models.base import Model, ModelResponse, ToolCall
+    from krim.tools.base import Tool
+
+    log = []
+    lock = threading.Lock()
+
+    class SlowTool(Tool):
+        description = "slow"
+        parameters = {}
+        def __init__(self, name):
+            self.name = name
+        def run(self, **kwargs):
+            with lock:
+                log.append(("start", self.name, time.monotonic()))
+            time.sleep(0.3)
+            with lock:
+                log.append(("end", self.name, time.monotonic()))
+            return self.name
+
+    class MockModel(Model):
+        def __init__(self):
+            self.calls = 0
+        def chat(self, messages, tools, stream_callback=None):
+            self.calls += 1
+            if self.calls == 1:  # mcp a, mcp b, native write, mcp c (must see the write), mcp d
+                names = ["a", "b", "write", "c", "d"]
+                return ModelResponse(text="", tool_calls=[ToolCall(str(i), n, {}) for i, n in enumerate(names)], stop=False)
+            return ModelResponse(text="ok", tool_calls=[], stop=True)
+
+    agent = Agent(MockModel(), "claude", "sys", [SlowTool("write")], max_turns=3,
+                  mcp_tools=[SlowTool(n) for n in "abcd"])
+    t0 = time.monotonic()
+    agent.run("go")
+    elapsed = time.monotonic() - t0
+    when = {(ev, name): t for ev, name, t in log}
+    assert when[("start", "b")] < when[("end", "a")]  # adjacent MCP calls overlap
+    assert when[("start", "write")] >= max(when[("end", "a")], when[("end", "b")])
+    assert min(when[("start", "c")], when[("start", "d")]) >= when[("end", "write")]  # order kept across it
+    assert elapsed < 1.2, f"{elapsed:.2f}s"
+    results = [b["content"] for b in agent.messages[-2]["content"]]
+    assert results == ["a", "b", "write", "c", "d"]
+test("mcp mux: adjacent MCP calls overlap; native calls keep the model's order", test_agent_overlaps_adjacent_mcp_calls)
+
+# ============================================================
+# 28. MCP STARTUP + TOOL CACHE
+# ============================================================
+print("\n=== MCP STARTUP + TOOL CACHE ===")
+
+def _fake_mcp_configs(td, names, delay=0.0):
+    from krim.mcp import McpServerConfig
+    script = os.path.join(td, "server.py")
+    with open(script, "w") as f:
+        f.write(f"import time; time.sleep({delay})\n" + FAKE_MCP_SERVER)
+    return [McpServerConfig(name=n, command=[sys.executable, script], env={"N": n}) for n in names]
+
+def test_mcp_parallel_start():
+    import time
+    from krim.mcp import start_mcp_servers
+    with tempfile.TemporaryDirectory() as td:
+        configs = _fake_mcp_configs(td, ["a", "b", "c"], delay=0.4)
+        t0 = time.monotonic()
+        tools, servers = start_mcp_servers(configs)
+        try:
+            assert time.monotonic() - t0 < 1.0, "servers started serially"
+            assert [s.config.name for s in servers] == ["a", "b", "c"]
+            assert len(tools) == 3
+        finally:
+            for s in servers:
+                s.stop()
+test("mcp start: servers boot concurrently", test_mcp_parallel_start)
+
+def test_mcp_tools_changed_updates_shared_list():
+    from krim.agent import Agent
+    from krim.mcp import start_mcp_servers
+    from krim.models.base import Model, ModelResponse
+
+    class MockModel(Model):
+        def chat(self, messages, tools, stream_callback=None):
+            return ModelResponse(text="ok", tool_calls=[], stop=True)
+
+    with tempfile.TemporaryDirectory() as td:
+        tools, servers = start_mcp_servers(_fake_mcp_configs(td, ["a"]))
+        try:
+            agent = Agent(MockModel(), "claude", "sys", [], mcp_tools=tools)
+            before = agent.mcp_tools[0]
+            servers[0]._discover_tools()  # what a tools/list_changed notification triggers
+            assert agent.mcp_tools is tools and agent.mcp_tools == servers[0].tools
+            assert agent.mcp_tools[0] is not before
+        finally:
+            for s in servers:
+                s.stop()
+test("mcp start: a tools/list_changed refresh reaches the agent", test_mcp_tools_changed_updates_shared_list)
+
+def test_mcp_cached_tools_dont_block():
+    import time
+    from pathlib import Path
+    from krim.mcp import start_mcp_servers
+    with tempfile.TemporaryDirectory() as td:
+        cache = Path(td) / "mcp-cache.json"
+        configs = _fake_mcp_configs(td, ["a"], delay=0.5)
+        _, servers = start_mcp_servers(configs, cache_path=cache)
+        for s in servers:
+            s.stop()
+        assert cache.is_file()
+
+        t0 = time.monotonic()
+        tools, servers = start_mcp_servers(_fake_mcp_configs(td, ["a"], delay=0.5), cache_path=cache)
+        try:
+            assert time.monotonic() - t0 < 0.3, "cached server blocked startup"
+            assert [t.name for t in tools] == ["nap"]
+            # the call waits for the background boot to finish
+            assert tools[0].run(sleep=0) == "slept 0"
+        finally:
+            for s in servers:
+                s.stop()
+test("mcp start: cached schemas return before the server is up", test_mcp_cached_tools_dont_block)
+
+def test_mcp_live_tools_beat_stale_cache():
+    from pathlib import Path
+    from krim.mcp import McpServer, ToolCache, start_mcp_servers
+    with tempfile.TemporaryDirectory() as td:
+        slow = _fake_mcp_configs(td, ["slow"], delay=0.5)[0]  # uncached: startup blocks on it...
+        fast_dir = os.path.join(td, "fast")
+        os.makedirs(fast_dir)
+        fast = _fake_mcp_configs(fast_dir, ["fast"])[0]  # ...while the cached one finishes booting
+        cache = Path(td) / "mcp-cache.json"
+        stale = McpServer(fast)
+        stale.tool_specs = [{"name": "old_tool", "description": "gone", "inputSchema": {}}]
+        ToolCache(cache).update(fast, stale)
+        tools, servers = start_mcp_servers([slow, fast], cache_path=cache)
+        try:
+            assert servers[1]._ready.wait(5)
+            assert [t.name for t in servers[1].tools] == ["nap"]
+            assert [t.name for t in tools] == ["nap", "nap"]
+        finally:
+            for s in servers:
+                s.stop()
+test("mcp start: a live tools/list replaces cached schemas, never the reverse", test_mcp_live_tools_beat_stale_cache)
+
+def test_mcp_cache_key_and_refresh():
+    from pathlib import Path
+    from krim.mcp import ToolCache, McpServerConfig, McpServer
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "c.json"
+        a = McpServerConfig(name="x", command=["node", "s.js"], env={"K": "1"})
+        b = McpServerConfig(name="x", command=["node", "s.js"], env={"K": "2"})
+        assert ToolCache.key(a) != ToolCache.key(b)
+        server = McpServer(a)
+        server.tool_specs = [{"name": "t1"}]
+        cache = ToolCache(path)
+        cache.update(a, server)
+        assert '"K"' not in path.read_text()  # env (secrets) only hashed
+        assert ToolCache(path).get(a) == [{"name": "t1"}]
+        assert ToolCache(path).get(b) is None
+        server.tool_specs = [{"name": "t1"}, {"name": "t2"}]
+        cache.update(a, server)
+        assert len(ToolCache(path).get(a)) == 2
+test("mcp start: tool cache keyed by command+env, refreshed on change", test_mcp_cache_key_and_refresh)
+
+def test_mcp_failed_start_fails_fast():
+    from krim.mcp import McpServer, McpServerConfig
+    server = McpServer(McpServerConfig(name="gone", command=["/nonexistent/mcp-server"]))
+    try:
+        server.start()
+    except Exception:
+        pass
+    assert "failed to start" in server.call_tool("x", {})
+test("mcp start: calls to a server that failed to boot error out", test_mcp_failed_start_fails_fast)
+
+# ============================================================
+# 29. MCP LAZY ACTIVATION
+# ============================================================
+print("\n=== MCP LAZY ACTIVATION ===")
+
+def test_mcp_lazy_spawns_on_first_call():
+    from pathlib import Path
+    from krim.mcp import start_mcp_servers, ToolCache
+    with tempfile.TemporaryDirectory() as td:
+        cache = Path(td) / "mcp-cache.json"
+        cfg = _fake_mcp_configs(td, ["a"])[0]
+        cfg.lazy = True
+        cache.write_text(json.dumps({ToolCache.key(cfg): {"name": "a", "version": None, "tools": [{"name": "nap"}]}}))
+        tools, servers = start_mcp_servers([cfg], cache_path=cache)
+        try:
+            assert [t.name for t in tools] == ["nap"]
+            assert servers[0].process is None  # nothing spawned yet
+            assert tools[0].run(sleep=0) == "slept 0"
+            assert servers[0].running
+        finally:
+            for s in servers:
+                s.stop()
+test("mcp lazy: cached server spawns on first call", test_mcp_lazy_spawns_on_first_call)
+
+def test_mcp_idle_shutdown_and_respawn():
+    import time
+    from krim.mcp import McpServer
+    with tempfile.TemporaryDirectory() as td:
+        cfg = _fake_mcp_configs(td, ["a"])[0]
+        cfg.idle_timeout = 0.3
+        server = McpServer(cfg)
+        try:
+            assert server.call_tool("nap", {"sleep": 0}) == "slept 0"
+            first = server.process.pid
+            time.sleep(0.6)
+            assert not server.running, "idle server still running"
+            assert server.call_tool("nap", {"sleep": 0}) == "slept 0"
+            assert server.process.pid != first
+        finally:
+            server.stop()
+test("mcp lazy: idle shutdown and transparent respawn", test_mcp_idle_shutdown_and_respawn)
+
+def test_mcp_idle_timer_waits_for_inflight_call():
+    import time
+    from krim.mcp import McpServer
+    with tempfile.TemporaryDirectory() as td:
+        cfg = _fake_mcp_configs(td, ["a"])[0]
+        cfg.idle_timeout = 0.2
+        server = McpServer(cfg)
+        try:
+            server.call_tool("nap", {"sleep": 0})
+            # the idle timer fires mid-call; the call must still succeed
+            assert server.call_tool("nap", {"sleep": 0.5}) == "slept 0.5"
+        finally:
+            server.stop()
+test("mcp lazy: idle timer never kills an in-flight call", test_mcp_idle_timer_waits_for_inflight_call)
+
+def test_mcp_config_lazy_fields():
+    from pathlib import Path
+    from krim.mcp import load_mcp_config, McpServer, MCP_LAZY_IDLE_TIMEOUT
+    with tempfile.TemporaryDirectory() as td:
+        (Path(td) / "mcp.json").write_text(json.dumps({"mcpServers": {
+            "a": {"command": ["x"], "lazy": True},
+            "b": {"command": ["y"], "idleTimeout": 30},
+        }}))
+        a, b = load_mcp_config(global_dir=Path(td))
+        assert a.lazy and a.idle_timeout is None
+        assert McpServer(a).idle_timeout == MCP_LAZY_IDLE_TIMEOUT
+        assert not b.lazy and McpServer(b).idle_timeout == 30
+test("mcp lazy: config fields and default idle timeout", test_mcp_config_lazy_fields)
+
+# ============================================================
+# 30. MCP DAEMON
+# ============================================================
+print("\n=== MCP DAEMON ===")
+
+def _run_daemon(td):
+    import threading, time
+    from pathlib import Path
+    from krim.mcpd import McpDaemon
+    sock = Path(td) / "d.sock"
+    daemon = McpDaemon(sock, idle_exit=0.5)
+    t = threading.Thread(target=daemon.serve, daemon=True)
+    t.start()
+    for _ in range(100):
+        if sock.exists():
+            break
+        time.sleep(0.02)
+    return daemon, sock, t
+
+def test_mcpd_shares_one_process():
+    from krim.mcpd import start_remote_servers
+    with tempfile.TemporaryDirectory() as td:
+        daemon, sock, t = _run_daemon(td)
+        cfg = _fake_mcp_configs(td, ["a"])[0]
+        tools1, servers1 = start_remote_servers([cfg], sock)
+        tools2, servers2 = start_remote_servers([cfg], sock)
+        try:
+            assert [x.name for x in tools1] == [x.name for x in tools2] == ["nap"]
+            assert tools1[0].run(sleep=0) == "slept 0"
+            assert tools2[0].run(sleep=0.1) == "slept 0.1"
+            assert len(daemon._servers) == 1  # two clients, one server process
+        finally:
+            for s in servers1 + servers2:
+                s.stop()
+        t.join(timeout=5)
+        assert not t.is_alive(), "daemon did not exit when idle"
+        assert not sock.exists()
+test("mcpd: clients share one pooled server", test_mcpd_shares_one_process)
+
+def test_mcpd_concurrent_calls_one_client():
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from krim.mcpd import start_remote_servers
+    with tempfile.TemporaryDirectory() as td:
+        daemon, sock, t = _run_daemon(td)
+        tools, servers = start_remote_servers(_fake_mcp_configs(td, ["a"]), sock)
+        try:
+            t0 = time.monotonic()
+            with ThreadPoolExecutor(3) as pool:
+                outs = list(pool.map(lambda s: tools[0].run(sleep=s), [0.4, 0.4, 0.4]))
+            assert outs == ["slept 0.4"] * 3
+            assert time.monotonic() - t0 < 1.0, "daemon serialized calls"
+        finally:
+            for s in servers:
+                s.stop()
+test("mcpd: concurrent calls over one connection", test_mcpd_concurrent_calls_one_client)
+
+def test_mcpd_owner_only():
+    import socket, stat
+    import krim.mcpd
+    from krim.mcpd import DaemonClient, _same_user
+    a, b = socket.socketpair(socket.AF_UNIX)
+    try:
+        assert _same_user(a)
+    finally:
+        a.close()
+        b.close()
+    with tempfile.TemporaryDirectory() as td:
+        daemon, sock, t = _run_daemon(td)
+        assert stat.S_IMODE(os.stat(sock).st_mode) == 0o600
+        orig = krim.mcpd._same_user
+        krim.mcpd._same_user = lambda conn: False  # as if another local user connected
+        try:
+            client = DaemonClient(sock)
+            try:
+                client.request({"op": "tools", "server": {}}, timeout=5)
+                assert False, "foreign peer was served"
+            except ConnectionError:
+                pass
+            client.close()
+        finally:
+            krim.mcpd._same_user = orig
+        t.join(timeout=5)
+test("mcpd: socket is 0600 and other users' connections are refused", test_mcpd_owner_only)
+
+def test_mcpd_fallback_to_local():
+    from pathlib import Path
+    from krim.mcp import start_mcp_servers, McpServer
+    import krim.mcpd
+    with tempfile.TemporaryDirectory() as td:
+        orig = krim.mcpd.connect
+        krim.mcpd.connect = lambda path, autostart=True: orig(path, autostart=False)
+        try:
+            tools, servers = start_mcp_servers(_fake_mcp_configs(td, ["a"]), daemon_socket=Path(td) / "none.sock")
+        finally:
+            krim.mcpd.connect = orig
+        try:
+            assert len(servers) == 1 and isinstance(servers[0], McpServer)
+        finally:
+            for s in servers:
+                s.stop()
+test("mcpd: unreachable daemon falls back to local servers", test_mcpd_fallback_to_local)
+
+# ============================================================
+# 31. MCP FRAMING
+# ============================================================
+print("\n=== MCP FRAMING ===")
+
+def _frame(msg):
+    data = json.dumps(msg).encode()
+    return b"Content-Length: %d\r\n\r\n" % len(data) + data
+
+def test_frame_reader_mixed_and_split():
+    import threading
+    from krim.mcp import FrameReader
+    r, w = os.pipe()
+    try:
+        reader = FrameReader(r)
+        big = {"id": 3, "result": {"text": "x" * (3 * 1024 * 1024)}}
+        payload = _frame({"id": 1}) + b'{"id": 2}\n' + _frame(big) + _frame({"id": 4, "u": "é中"})
+        def writer():
+            for i in range(0, len(payload), 7000):  # headers and bodies split across reads
+                os.write(w, payload[i:i + 7000])
+        t = threading.Thread(target=writer)
+        t.start()
+        got = [reader.read_message(timeout=5) for _ in range(4)]
+        t.join()
+        assert [m["id"] for m in got] == [1, 2, 3, 4]
+        assert len(got[2]["result"]["text"]) == 3 * 1024 * 1024
+        assert got[3]["u"] == "é中"
+    finally:
+        os.close(r)
+        os.close(w)
+test("framing: content-length + ndjson, split reads, large body", test_frame_reader_mixed_and_split)
+
+def test_frame_reader_buffered_burst_no_timeout():
+    """Two messages in one read: the second must come from the buffer, not select()."""
+    import time
+    from krim.mcp import FrameReader
+    r, w = os.pipe()
+    try:
+        reader = FrameReader(r)
+        os.write(w, _frame({"id": 1}) + _frame({"id": 2}))
+        assert reader.read_message(timeout=1)["id"] == 1
+        t0 = time.monotonic()
+        assert reader.read_message(timeout=1)["id"] == 2
+        assert time.monotonic() - t0 < 0.1
+        try:
+            reader.read_message(timeout=0.2)
+            assert False, "should time out"
+        except TimeoutError:
+            pass
+    finally:
+        os.close(r)
+        os.close(w)
+test("framing: buffered burst, then real timeout", test_frame_reader_buffered_burst_no_timeout)
+
+def test_frame_reader_eof():
+    from krim.mcp import FrameReader
+    r, w = os.pipe()
+    reader = FrameReader(r)
+    os.write(w, b"Content-Length: 50\r\n\r\n{")
+    os.close(w)
+    try:
+        reader.read_message(timeout=1)
+        assert False, "should raise"
+    except ConnectionError:
+        pass
+    finally:
+        os.close(r)
+test("framing: EOF mid-body raises ConnectionError", test_frame_reader_eof)
+
+# ============================================================
+# 32. LARGE RESULT SPILL
+# ============================================================
+print("\n=== LARGE RESULT SPILL ===")
+
+def test_spill_small_output_untouched():
+    from pathlib import Path
+    from krim.spill import ResultStore
+    with tempfile.TemporaryDirectory() as td:
+        store = ResultStore(Path(td) / "results" / "s1")
+        assert store.limit("short", 100) == "short"
+        assert not (Path(td) / "results").exists()
+test("spill: small output passes through, nothing written", test_spill_small_output_untouched)
+
+def test_spill_preview_and_paging():
+    from pathlib import Path
+    from krim.spill import ResultStore
+    from krim.tools.result import ResultTool
+    with tempfile.TemporaryDirectory() as td:
+        store = ResultStore(Path(td) / "results" / "s1", preview_chars=2_000)
+        text = "\n".join(f"row {i} {'needle' if i % 1000 == 0 else 'hay'}" for i in range(1, 50_001))
+        out = store.limit(text, 30_000)
+        assert len(out) < 2_500
+        assert "saved as r1" in out and "50,000 lines" in out
+        assert (Path(td) / "results" / ".gitignore").is_file()
+
+        tool = ResultTool(store)
+        page = tool.run(id="r1", offset=100, limit=3)
+        assert page.splitlines()[0].split("\t") == ["   100", "row 100 hay"]
+        assert "continue with offset=103" in page
+        hits = tool.run(id="r1", grep="needle", limit=5)
+        assert hits.splitlines()[0].endswith("row 1000 needle")
+        assert "continue with offset=5001" in hits
+        assert "error" in tool.run(id="../etc/passwd")
+test("spill: preview + handle, page and grep via result tool", test_spill_preview_and_paging)
+
+def test_spill_bash_output():
+    from pathlib import Path
+    from krim.spill import ResultStore
+    from krim.tools.bash import BashTool
+    with tempfile.TemporaryDirectory() as td:
+        store = ResultStore(Path(td) / "s1")
+        bash = BashTool()
+        bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False,
+                       max_output_chars=1_000, results=store)
+        out = bash.run("seq 1 20000")
+        assert "saved as r1" in out
+        assert store.read("r1", offset=20000, limit=1).endswith("20000")
+test("spill: bash output spilled instead of truncated", test_spill_bash_output)
+
+def test_spill_mcp_output():
+    from pathlib import Path
+    from krim.spill import ResultStore
+    from krim.mcp import McpServer
+    with tempfile.TemporaryDirectory() as td:
+        store = ResultStore(Path(td) / "s1", preview_chars=500)
+        server = McpServer(_fake_mcp_configs(td, ["a"])[0], results=store)
+        server.start()
+        try:
+            server._send = lambda method, params=None, **kw: {
+                "result": {"content": [{"type": "text", "text": "x" * 40_000}]}}
+            out = server.call_tool("nap", {})
+            assert "saved as r1" in out and len(out) < 1_000
+        finally:
+            server.stop()
+test("spill: MCP output spilled instead of truncated", test_spill_mcp_output)
+
+# ============================================================
+# 33. BENCHMARKS
+# ============================================================
+print("\n=== BENCHMARKS ===")
+
+def test_compact_long_history_matches_full_recount():
+    from krim.compaction import compact, estimate_message_tokens, _drop_oldest_group
+    import bench
+    msgs = bench.conversation(2_000)
+    fast = compact(msgs, max_tokens=20_000)
+    # reference: the same drops, re-estimating the whole history each time
+    slow = compact(msgs, max_tokens=10**9)
+    while len(slow) > 4 and estimate_message_tokens(slow) > 20_000 * 0.6:
+        _drop_oldest_group(slow, start=1)
+    assert fast == slow
+    assert fast[0]["role"] == "system" and fast[1]["role"] == "assistant"
+    assert estimate_message_tokens(fast) <= 12_000
+test("bench: compact running total drops the same groups", test_compact_long_history_matches_full_recount)
+
+def test_bench_flags_regression():
+    import subprocess
+    with tempfile.TemporaryDirectory() as td:
+        baseline = os.path.join(td, "baseline.json")
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench.py")
+        run = lambda *a: subprocess.run([sys.executable, script, "--baseline", baseline, "-k", "truncate", *a],
+                                        capture_output=True, text=True)
+        first = run()
+        assert first.returncode == 0 and "baseline saved" in first.stdout
+        with open(baseline) as f:
+            data = json.load(f)
+        data["results"]["truncate: 10MB string"] = 1e-9  # pretend it used to be instant
+        with open(baseline, "w") as f:
+            json.dump(data, f)
+        second = run("--threshold", "0.5")
+        assert second.returncode == 1 and "REGRESSION" in second.stdout
+test("bench: slower than baseline fails the run", test_bench_flags_regression)
+
+# ============================================================
+# 34. REPLAY PROVIDER
+# ============================================================
+print("\n=== REPLAY PROVIDER ===")
+
+def _write_fixture(td, *records):
+    path = os.path.join(td, "fixture.jsonl")
+    with open(path, "w") as f:
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+    return path
+
+def test_replay_streams_in_order():
+    import time
+    from krim.models.replay import ReplayModel
+    with tempfile.TemporaryDirectory() as td:
+        path = _write_fixture(td,
+            {"t": "meta", "delay": 0.02},
+            {"t": "response", "chunks": ["a", "b", "c"], "tool_calls": [{"id": "t1", "name": "bash", "args": {"command": "ls"}}]},
+            {"t": "response", "chunks": ["done"], "delay": 0})
+        model = ReplayModel(path)
+        got = []
+        t0 = time.perf_counter()
+        r1 = model.chat([], [], got.append)
+        assert time.perf_counter() - t0 >= 0.04  # two gaps between three chunks
+        assert got == ["a", "b", "c"] and r1.text == "abc" and not r1.stop
+        assert r1.tool_calls[0].name == "bash" and r1.tool_calls[0].args == {"command": "ls"}
+        r2 = model.chat([], [])
+        assert r2.text == "done" and r2.stop and not r2.tool_calls
+        try:
+            model.chat([], [])
+            assert False, "should raise"
+        except RuntimeError as e:
+            assert "no more responses" in str(e)
+test("replay: chunks streamed with delay, then exhausted", test_replay_streams_in_order)
+
+def test_replay_record_roundtrip():
+    from krim.models.base import Model, ModelResponse, ToolCall
+    from krim.models.replay import RecordingModel, ReplayModel
+
+    class Live(Model):
+        def chat(self, messages, tools, stream_callback=None):
+            for chunk in ["hel", "lo"]:
+                if stream_callback:
+                    stream_callback(chunk)
+            return ModelResponse(text="hello", tool_calls=[ToolCall("t9", "read", {"path": "x"})], stop=False)
+
+    with tempfile.TemporaryDirectory() as td:
+        path = os.path.join(td, "rec.jsonl")
+        rec = RecordingModel(Live(), path)
+        streamed = []
+        rec.chat([], [], streamed.append)
+        rec.chat([], [])  # non-streaming: stored as one chunk
+        rec.close()
+        assert streamed == ["hel", "lo"]
+        replay = ReplayModel(path, delay=0, latency=0)
+        got = []
+        r = replay.chat([], [], got.append)
+        assert got == ["hel", "lo"] and r.tool_calls == [ToolCall("t9", "read", {"path": "x"})]
+        assert replay.chat([], []).text == "hello"
+test("replay: recorder output plays back the same responses", test_replay_record_roundtrip)
+
+def test_replay_drives_agent():
+    from krim.agent import Agent
+    from krim.models import create_model
+    from krim.tools.bash import BashTool
+    with tempfile.TemporaryDirectory() as td:
+        path = _write_fixture(td,
+            {"t": "response", "chunks": [], "tool_calls": [{"id": "t1", "name": "bash", "args": {"command": "echo replayed"}}]},
+            {"t": "response", "chunks": ["all ", "done"]})
+        bash = BashTool()
+        bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False)
+        agent = Agent(create_model("replay", path), "replay", "sys", [bash], max_turns=5)
+        agent.run("go")
+        results = [m["content"] for m in agent.messages if m.get("role") == "tool"]
+        assert results and "replayed" in results[0]
+        assert agent.messages[-1] == {"role": "assistant", "content": "all done"}
+    try:
+        create_model("replay")
+        assert False, "should raise"
+    except ValueError:
+        pass
+test("replay: create_model('replay', path) runs an agent offline", test_replay_drives_agent)
+
+# ============================================================
+# 35. PROFILING
+# ============================================================
+print("\n=== PROFILING ===")
+
+def test_profiling_off_is_noop():
+    from krim import profiling
+    assert not profiling.enabled()
+    assert profiling.span("a") is profiling.span("b")  # one shared no-op
+    calls = []
+    f = profiling.traced("x")(lambda v: calls.append(v) or v)
+    assert f(3) == 3 and calls == [3]
+test("profiling: off by default, span is a shared no-op", test_profiling_off_is_noop)
+
+def test_profiling_tree_and_threads():
+    import threading
+    from krim import profiling
+    p = profiling.start()
+    try:
+        with profiling.span("outer"):
+            for _ in range(3):
+                with profiling.span("inner"):
+                    pass
+            def worker():
+                with profiling.span("worker"):
+                    pass
+            t = threading.Thread(target=worker)
+            t.start()
+            t.join()
+    finally:
+        assert profiling.stop() is p
+    tree = p.tree()
+    assert tree[("outer",)][1] == 1 and tree[("outer", "inner")][1] == 3
+    assert ("worker",) in tree  # other threads keep their own stack
+    report = p.report()
+    assert "\n  outer" in report and "\n    inner" in report and "x3" in report
+test("profiling: nested spans aggregate per path and thread", test_profiling_tree_and_threads)
+
+def test_profiling_chrome_trace():
+    from krim import profiling
+    with tempfile.TemporaryDirectory() as td:
+        out = os.path.join(td, "trace.json")
+        p = profiling.start(out)
+        with profiling.span("git.status"):
+            pass
+        profiling.stop().finish()
+        with open(out) as f:
+            events = json.load(f)["traceEvents"]
+        assert events[0]["name"] == "git.status" and events[0]["cat"] == "git"
+        assert events[0]["ph"] == "X" and events[0]["dur"] >= 0
+test("profiling: --profile-out x.json writes Chrome trace events", test_profiling_chrome_trace)
+
+def test_profiling_flag_keeps_prompt():
+    from krim.__main__ import parse_args
+    args = parse_args(["--profile", "why is this slow"])
+    assert args.profile and args.profile_out is None and args.prompt == "why is this slow"
+    args = parse_args(["--profile-out", "trace.json", "task"])
+    assert args.profile_out == "trace.json" and args.prompt == "task"
+test("profiling: --profile takes no value, so the prompt stays the prompt", test_profiling_flag_keeps_prompt)
+
+def test_profiling_agent_spans():
+    from krim import profiling
+    from krim.agent import Agent
+    from krim.models.replay import ReplayModel
+    from krim.tools.read import ReadTool
+    with tempfile.TemporaryDirectory() as td:
+        path = os.path.join(td, "fx.jsonl")
+        with open(path, "w") as f:
+            f.write(json.dumps({"t": "response", "chunks": ["x"], "tool_calls": [
+                {"id": "t1", "name": "read", "args": {"path": path}}]}) + "\n")
+            f.write(json.dumps({"t": "response", "chunks": ["ok"]}) + "\n")
+        agent = Agent(ReplayModel(path), "claude", "sys", [ReadTool()], max_turns=3)
+        p = profiling.start()
+        try:
+            agent.run("go")
+        finally:
+            profiling.stop()
+        tree = p.tree()
+        assert tree[("agent.run", "model.chat")][1] == 2
+        assert any(path[-1] == "render" for path in tree)  # at flush time, not per delta
+        assert tree[("agent.run", "tool.read")][1] == 1
+test("profiling: agent run records model, render and tool spans", test_profiling_agent_spans)
+
+# ============================================================
+# 36. TRACING
+# ============================================================
+print("\n=== TRACING ===")
+
+def _exported_spans(path):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            for rs in json.loads(line)["resourceSpans"]:
+                for ss in rs["scopeSpans"]:
+                    spans.extend(ss["spans"])
+    return spans
+
+def test_tracing_off_is_noop():
+    from krim import tracing
+    assert tracing.current() is None
+    with tracing.span("a") as s:
+        s.set("k", 1)
+        assert not s.recording
+    assert tracing.span("b") is tracing.span("c")
+test("tracing: off by default, spans are no-ops", test_tracing_off_is_noop)
+
+def test_tracing_agent_run_otlp():
+    from krim import tracing
+    from krim.agent import Agent
+    from krim.models.replay import ReplayModel
+    from krim.tools.bash import BashTool
+    with tempfile.TemporaryDirectory() as td:
+        fixture = os.path.join(td, "fx.jsonl")
+        with open(fixture, "w") as f:
+            f.write(json.dumps({"t": "response", "chunks": ["x"], "usage": {"input_tokens": 7, "output_tokens": 2},
+                                "tool_calls": [{"id": "t1", "name": "bash", "args": {"command": "exit 3"}}]}) + "\n")
+            f.write(json.dumps({"t": "response", "chunks": ["ok"]}) + "\n")
+        bash = BashTool()
+        bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False)
+        out = os.path.join(td, "traces.jsonl")
+        tracing.start(out)
+        try:
+            Agent(ReplayModel(fixture), "claude", "sys", [bash], max_turns=3).run("go")
+        finally:
+            tracing.stop()
+        spans = _exported_spans(out)
+        first = lambda name: next(s for s in spans if s["name"] == name)
+        run, turn, chat = first("agent.run"), first("agent.turn"), first("model.chat")
+        tool, bash_span = first("tool.bash"), first("bash.exec")
+        assert "parentSpanId" not in run and len(run["traceId"]) == 32
+        assert {s["traceId"] for s in spans} == {run["traceId"]}
+        assert turn["parentSpanId"] == run["spanId"]
+        assert chat["parentSpanId"] == tool["parentSpanId"] == turn["spanId"]
+        assert bash_span["parentSpanId"] == tool["spanId"]
+        attrs = lambda s: {a["key"]: a["value"] for a in s["attributes"]}
+        assert attrs(chat)["gen_ai.usage.input_tokens"] == {"intValue": "7"}
+        assert attrs(tool)["process.exit.code"] == {"intValue": "3"}
+        assert attrs(bash_span)["process.exit.code"] == {"intValue": "3"}
+        assert attrs(run)["krim.turns"] == {"intValue": "2"}
+test("tracing: agent run exports run > turn > chat/tool > bash spans", test_tracing_agent_run_otlp)
+
+def test_openai_stream_usage():
+    from types import SimpleNamespace as NS
+    from krim.models.openai import OpenAIModel
+    sent = {}
+
+    def create(**kwargs):
+        sent.update(kwargs)
+        chunks = [NS(usage=None, choices=[NS(delta=NS(content="hi", tool_calls=None))]),
+                  NS(usage=NS(prompt_tokens=11, completion_tokens=3), choices=[])]
+
+        class Stream(list):
+            def close(self):
+                pass
+        return Stream(chunks)
+
+    model = OpenAIModel.__new__(OpenAIModel)
+    model.model, model.max_tokens = "m", 100
+    model.client = NS(chat=NS(completions=NS(create=create)))
+    resp = model.chat([{"role": "user", "content": "x"}], [], stream_callback=lambda d: None)
+    assert sent["stream_options"] == {"include_usage": True}
+    assert resp.text == "hi" and resp.usage == {"input_tokens": 11, "output_tokens": 3}
+test("tracing: openai streams ask for usage and report it", test_openai_stream_usage)
+
+def test_tracing_sampling_and_retry_events():
+    from krim import tracing
+    from krim.retry import with_retry
+    with tempfile.TemporaryDirectory() as td:
+        out = os.path.join(td, "traces.jsonl")
+        tracing.start(out, sample=0.0)
+        try:
+            with tracing.span("root"):
+                with tracing.span("child") as child:
+                    assert not child.recording  # unsampled trace mutes its children
+        finally:
+            tracing.stop()
+        assert not os.path.exists(out)
+
+        tracing.start(out)
+        attempts = []
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise ConnectionError("reset")
+            return "ok"
+        try:
+            with tracing.span("model.chat"):
+                assert with_retry(flaky, base_delay=0)() == "ok"
+        finally:
+            tracing.stop()
+        event = _exported_spans(out)[0]["events"][0]
+        assert event["name"] == "retry"
+        assert {"key": "attempt", "value": {"intValue": "1"}} in event["attributes"]
+test("tracing: sample=0 drops whole traces; retries become span events", test_tracing_sampling_and_retry_events)
+
+def test_tracing_collector_and_threads():
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from krim import tracing
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            self.send_response(200)
+            self.end_headers()
+        def log_message(self, *a):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    tracing.start(f"http://127.0.0.1:{httpd.server_port}/v1/traces")
+    try:
+        with tracing.span("parent"):
+            parent = tracing.current()
+            def worker():
+                with tracing.attach(parent):
+                    with tracing.span("mcp.tools/call"):
+                        pass
+            t = threading.Thread(target=worker)
+            t.start()
+            t.join()
+    finally:
+        tracing.stop()
+        httpd.shutdown()
+    path, body = received[0]
+    assert path == "/v1/traces"
+    spans = {s["name"]: s for s in body["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    assert spans["mcp.tools/call"]["parentSpanId"] == spans["parent"]["spanId"]
+test("tracing: POSTs batches to a collector; attach() carries parents across threads", test_tracing_collector_and_threads)
+
+# ============================================================
+# 37. STREAM RENDER
+# ============================================================
+print("\n=== STREAM RENDER ===")
+
+class _CountingFile:
+    def __init__(self):
+        self.writes = []
+    def write(self, s):
+        self.writes.append(s)
+        return len(s)
+    def flush(self):
+        pass
+    def isatty(self):
+        return True
+
+def test_render_plain_coalesces():
+    from rich.console import Console
+    from krim.render import PlainRenderer
+    f = _CountingFile()
+    r = PlainRenderer(Console(file=f, force_terminal=True), interval=10, max_chars=256)
+    deltas = ["[red]x[/]"] + ["tok "] * 999
+    for d in deltas:
+        r.write(d)
+    r.close()
+    assert "".join(f.writes) == "".join(deltas)  # raw text: no markup parsing
+    assert len(f.writes) <= 20, len(f.writes)
+test("render: plain coalesces deltas into few raw writes", test_render_plain_coalesces)
+
+def test_render_plain_flushes_stalled_tail():
+    import time
+    from rich.console import Console
+    from krim.render import PlainRenderer
+    f = _CountingFile()
+    r = PlainRenderer(Console(file=f, force_terminal=True), interval=0.02)
+    r.write("a")  # first write may flush immediately
+    r.write("b")
+    deadline = time.monotonic() + 2
+    while "".join(f.writes) != "ab" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "".join(f.writes) == "ab"  # flushed without another delta or close()
+    r.close()
+test("render: a stalled stream's tail is flushed by the timer", test_render_plain_flushes_stalled_tail)
+
+def test_render_auto_headless_writes_once():
+    import io
+    from rich.console import Console
+    from krim.render import FinalRenderer, create_renderer
+    buf = io.StringIO()
+    r = create_renderer("auto", Console(file=buf))  # not a terminal
+    assert isinstance(r, FinalRenderer)
+    with r:
+        r.write("hello ")
+        r.write("world")
+        assert buf.getvalue() == ""
+    assert buf.getvalue() == "hello world"
+test("render: auto on a non-terminal writes the text once at the end", test_render_auto_headless_writes_once)
+
+def test_render_markdown_live():
+    import io
+    from rich.console import Console
+    from krim.render import create_renderer
+    buf = io.StringIO()
+    with create_renderer("markdown", Console(file=buf, force_terminal=True, width=40)) as r:
+        for d in ["# Ti", "tle\n\n", "some **bold** text"]:
+            r.write(d)
+    out = buf.getvalue()
+    assert "Title" in out and "bold" in out
+    assert "**" not in out and "# Title" not in out  # rendered, not raw markdown
+test("render: markdown mode renders through rich Live", test_render_markdown_live)
+
+# ============================================================
+# 38. PARALLEL SUBTASKS
+# ============================================================
+print("\n=== PARALLEL SUBTASKS ===")
+
+def _subtask_repo(td):
+    import subprocess
+    repo = os.path.join(td, "repo")
+    os.makedirs(repo)
+    for name in ("a.txt", "b.txt"):
+        with open(os.path.join(repo, name), "w") as f:
+            f.write(f"{name} v1\n")
+    for cmd in (["init", "-q", "-b", "main"], ["config", "user.email", "t@t"], ["config", "user.name", "t"],
+                ["add", "."], ["commit", "-qm", "init"]):
+        subprocess.run(["git", *cmd], cwd=repo, check=True, capture_output=True)
+    return repo
+
+def _subtask_factory(writes):
+    """Agent factory whose model writes the file named by its task, then stops."""
+    from krim.agent import Agent
+    from krim.models.base import Model, ModelResponse, ToolCall
+    from krim.tools import create_tools
+
+    class TaskModel(Model):
+        def chat(self, messages, tools, stream_callback=None):
+            task = next(m["content"] for m in messages if m["role"] == "user")
+            path, content = writes[task]
+            if messages[-1]["role"] == "user":
+                return ModelResponse(text=None, tool_calls=[ToolCall("w1", "write", {"path": path, "content": content})], stop=False)
+            return ModelResponse(text=f"wrote {path}", tool_calls=[], stop=True)
+
+    def make(root, origin, out):
+        tools = create_tools()
+        for t in tools:
+            t.root, t.origin = root, origin
+        return Agent(TaskModel(), "openai", "sys", tools, render="off", out=out)
+    return make
+
+def test_tool_resolve_in_worktree():
+    from krim.tools.read import ReadTool
+    t = ReadTool()
+    assert t.resolve("x.py") == "x.py"  # no root: unchanged
+    t.root, t.origin = "/tmp/wt", "/home/u/repo"
+    assert t.resolve("src/x.py") == "/tmp/wt/src/x.py"
+    assert t.resolve("/home/u/repo/src/x.py") == "/tmp/wt/src/x.py"
+    assert t.resolve("/home/u/repo2/x.py") == "/home/u/repo2/x.py"  # only the checkout itself is remapped
+    assert t.resolve("/etc/hosts") == "/etc/hosts"
+test("subtasks: tool paths resolve into the worktree", test_tool_resolve_in_worktree)
+
+def test_subtasks_merge_disjoint():
+    import subprocess
+    from pathlib import Path
+    from krim.subtasks import format_results, run_subtasks
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as td:
+        repo = _subtask_repo(td)
+        os.chdir(repo)
+        try:
+            with open("a.txt", "a") as f:
+                f.write("user edit\n")  # dirty: committed before the worktrees branch off, if allowed to
+            make = _subtask_factory({"write a": ("a.txt", "a from subtask\n"),
+                                         "write c": (os.path.join(repo, "c.txt"), "new file\n")})
+            try:
+                run_subtasks(["write a", "write c"], make, Path(td) / "logs")
+                assert False, "ran on a dirty tree without auto_commit"
+            except RuntimeError as e:
+                assert "auto_commit is off" in str(e)
+            head = subprocess.run(["git", "log", "--format=%s"], capture_output=True, text=True).stdout
+            assert head == "init\n" and "user edit" in open("a.txt").read()  # nothing committed behind the user's back
+            results = run_subtasks(["write a", "write c"], make, Path(td) / "logs", max_parallel=2, auto_commit=True)
+            assert [r.status for r in results] == ["merged", "merged"], format_results(results)
+            assert results[0].files == ["a.txt"] and results[1].files == ["c.txt"]
+            assert results[1].summary == "wrote " + os.path.join(repo, "c.txt")
+            assert open("a.txt").read() == "a from subtask\n" and open("c.txt").read() == "new file\n"
+            branches = subprocess.run(["git", "branch"], capture_output=True, text=True).stdout
+            worktrees = subprocess.run(["git", "worktree", "list"], capture_output=True, text=True).stdout
+            assert "krim/sub-" not in branches and len(worktrees.splitlines()) == 1
+            assert len(list((Path(td) / "logs").glob("*.log"))) == 2
+            log = subprocess.run(["git", "log", "--format=%s"], capture_output=True, text=True).stdout
+            assert "krim: save uncommitted changes before subtasks" in log
+        finally:
+            os.chdir(cwd)
+test("subtasks: dirty tree needs auto_commit; disjoint edits run in worktrees and both merge", test_subtasks_merge_disjoint)
+
+def test_subtasks_conflict_kept():
+    import subprocess
+    from pathlib import Path
+    from krim.subtasks import format_results, run_subtasks
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as td:
+        repo = _subtask_repo(td)
+        os.chdir(repo)
+        try:
+            make = _subtask_factory({"write b one": ("b.txt", "one\n"), "write b two": ("b.txt", "two\n"),
+                                         "write nothing": ("b.txt", "b.txt v1\n")})
+            results = run_subtasks(["write b one", "write b two", "write nothing"], make, Path(td) / "logs")
+            assert [r.status for r in results] == ["merged", "conflict", "no changes"], format_results(results)
+            assert results[1].conflicts == ["b.txt"]
+            assert open("b.txt").read() == "one\n"  # first in task order wins, the merge was aborted
+            assert subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True).stdout == ""
+            branches = subprocess.run(["git", "branch"], capture_output=True, text=True).stdout
+            assert results[1].branch in branches and results[0].branch not in branches
+            assert "merge it manually" in format_results(results)
+        finally:
+            os.chdir(cwd)
+test("subtasks: conflicting merge is aborted and its branch kept", test_subtasks_conflict_kept)
+
+def test_parallel_tool():
+    from krim.tools.parallel import ParallelTool
+    seen = []
+    tool = ParallelTool(lambda tasks: seen.append(tasks) or "ok")
+    assert tool.schema()["input_schema"]["properties"]["tasks"]["items"] == {"type": "string"}
+    assert tool.run(tasks=["", "  "]).startswith("error:") and not seen
+    assert tool.run(tasks=["x", "y"]) == "ok" and seen == [["x", "y"]]
+test("subtasks: parallel tool hands tasks to the runner", test_parallel_tool)
+
+# ============================================================
+# 39. CANCELLATION
+# ============================================================
+print("\n=== CANCELLATION ===")
+
+def _cancel_after(token, delay):
+    import threading
+    t = threading.Timer(delay, token.cancel)
+    t.start()
+    return t
+
+def test_cancel_token_basics():
+    from krim import cancellation
+    token = cancellation.CancelToken()
+    fired = []
+    with token.on_cancel(lambda: fired.append("in")):
+        pass
+    with token.on_cancel(lambda: fired.append("held")):
+        token.cancel()
+        token.cancel()  # idempotent
+    assert fired == ["held"] and token.wait(0)
+    with token.on_cancel(lambda: fired.append("late")):  # already cancelled: runs at once
+        pass
+    assert fired == ["held", "late"]
+    assert not cancellation.current().cancelled  # inert outside a run
+    with cancellation.scope(token):
+        assert cancellation.current() is token
+        try:
+            cancellation.current().check()
+            assert False, "should raise"
+        except cancellation.Cancelled:
+            pass
+    assert cancellation.current() is not token
+test("cancel: token callbacks, scope and check", test_cancel_token_basics)
+
+def test_cancel_stalled_claude_stream():
+    import time
+    from krim import cancellation
+    from krim.models.claude import ClaudeModel
+    from krim.retry import with_retry
+    client, calls = _fake_stream_client([[_text_ev("Hel"), "stall", _text_ev("lo")]])
+    model = ClaudeModel.__new__(ClaudeModel)
+    model.model, model.max_tokens, model.client, model._checkpoint = "m", 100, client, None
+    token = cancellation.CancelToken()
+    printed = []
+    t0 = time.monotonic()
+    with cancellation.scope(token):
+        _cancel_after(token, 0.1)
+        try:
+            with_retry(model.chat, base_delay=0.01)(messages=[{"role": "user", "content": "hi"}], tools=[],
+                                                    stream_callback=printed.append)
+            assert False, "should raise"
+        except cancellation.Cancelled:
+            pass
+    assert time.monotonic() - t0 < 2  # the close unblocked the read; no retry
+    assert printed == ["Hel"] and len(calls) == 1 and model._checkpoint is None
+test("cancel: closing a stalled model stream raises Cancelled, no retry", test_cancel_stalled_claude_stream)
+
+def test_cancel_bash_kills_group():
+    import time
+    from krim import cancellation
+    from krim.tools.bash import BashTool
+    bash = BashTool()
+    bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False)
+    with tempfile.TemporaryDirectory() as td:
+        marker = os.path.join(td, "late")
+        token = cancellation.CancelToken()
+        t0 = time.monotonic()
+        with cancellation.scope(token):
+            _cancel_after(token, 0.3)
+            out = bash.run(f"echo started; (sleep 1; touch {marker}) & sleep 30")
+        assert time.monotonic() - t0 < 5
+        assert out.startswith(cancellation.CANCELLED_RESULT) and "started" in out
+        time.sleep(1.2)
+        assert not os.path.exists(marker)  # background child died with the group
+        with cancellation.scope(token):
+            assert bash.run("echo again") == cancellation.CANCELLED_RESULT
+test("cancel: bash kills the command's process group", test_cancel_bash_kills_group)
+
+def test_cancel_mcp_sends_notification():
+    import time
+    from krim import cancellation
+    from krim.mcp import McpServer, McpServerConfig
+    with tempfile.TemporaryDirectory() as td:
+        log = os.path.join(td, "notes.jsonl")
+        script = os.path.join(td, "server.py")
+        with open(script, "w") as f:
+            f.write(FAKE_MCP_SERVER.replace(
+                'if "id" not in msg:\n        continue',
+                f'if "id" not in msg:\n        open({log!r}, "a").write(json.dumps(msg) + "\\n"); continue'))
+        server = McpServer(McpServerConfig(name="fake", command=[sys.executable, script]))
+        server.start()
+        try:
+            token = cancellation.CancelToken()
+            t0 = time.monotonic()
+            with cancellation.scope(token):
+                _cancel_after(token, 0.2)
+                out = server.call_tool("nap", {"sleep": 5})
+            assert out == cancellation.CANCELLED_RESULT and time.monotonic() - t0 < 2
+            assert server.call_tool("nap", {"sleep": 0}) == "slept 0"  # connection still usable
+            notes = [json.loads(line) for line in open(log)]
+            cancelled = [n for n in notes if n["method"] == "notifications/cancelled"]
+            assert len(cancelled) == 1 and isinstance(cancelled[0]["params"]["requestId"], int)
+        finally:
+            server.stop()
+test("cancel: MCP call stops waiting and sends notifications/cancelled", test_cancel_mcp_sends_notification)
+
+def test_cancel_agent_transcript():
+    from krim import cancellation
+    from krim.agent import Agent
+    from krim.models import create_model
+    from krim.tools.bash import BashTool
+    with tempfile.TemporaryDirectory() as td:
+        path = _write_fixture(td,
+            {"t": "response", "chunks": ["partial ", "answer", " never"], "delay": 0.3},
+            {"t": "response", "tool_calls": [{"id": "t1", "name": "bash", "args": {"command": "sleep 30"}},
+                                             {"id": "t2", "name": "bash", "args": {"command": "echo skipped"}}]},
+            {"t": "response", "chunks": ["fine"]})
+        bash = BashTool()
+        bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False)
+        agent = Agent(create_model("replay", path), "replay", "sys", [bash], max_turns=5, render="off")
+
+        token = cancellation.CancelToken()
+        _cancel_after(token, 0.45)
+        stats = agent.run("first", cancel=token)
+        assert stats.cancelled
+        assert agent.messages[-1] == {"role": "assistant", "content": "partial answer\n\n[cancelled by user]"}
+
+        token = cancellation.CancelToken()
+        _cancel_after(token, 0.3)
+        stats = agent.run("second", cancel=token)
+        results = [m for m in agent.messages if m.get("role") == "tool"]
+        assert stats.cancelled and stats.tool_calls == 1  # t2 was never started
+        assert [r["tool_call_id"] for r in results] == ["t1", "t2"]
+        assert all(r["content"].startswith(cancellation.CANCELLED_RESULT) for r in results)
+        assert agent.messages[-1] == {"role": "assistant", "content": "[cancelled by user]"}
+
+        stats = agent.run("third")  # the next request just continues
+        assert not stats.cancelled and agent.messages[-1] == {"role": "assistant", "content": "fine"}
+test("cancel: agent closes the transcript and the next run continues", test_cancel_agent_transcript)
+
+# ============================================================
+# 40. BASH PROCESS LIMITS
+# ============================================================
+print("\n=== BASH PROCESS LIMITS ===")
+
+def _limited_bash(limits=None):
+    from krim.tools.bash import BashTool
+    bash = BashTool()
+    bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False, limits=limits)
+    return bash
+
+def test_bash_timeout_kills_group():
+    import time
+    bash = _limited_bash()
+    with tempfile.TemporaryDirectory() as td:
+        marker = os.path.join(td, "late")
+        t0 = time.monotonic()
+        out = bash.run(f"echo started; (sleep 1.5; touch {marker}) & sleep 30", timeout=1)
+        assert time.monotonic() - t0 < 3
+        assert out.startswith("error: command timed out after 1s (process group killed)") and "started" in out
+        time.sleep(1)
+        assert not os.path.exists(marker)
+    # a detached server that keeps the pipes open no longer leaks past the timeout
+    out = bash.run("sleep 30 & echo bg", timeout=1)
+    assert "timed out" in out and "bg" in out
+test("bash limits: timeout kills background children too", test_bash_timeout_kills_group)
+
+def test_bash_rlimits_applied():
+    bash = _limited_bash({"open_files": 64, "cpu_seconds": 1, "memory_mb": 256})
+    assert bash.run("ulimit -n") == "64"
+    out = bash.run(f"{sys.executable} -c 'x = bytearray(512 * 1024 * 1024)'")
+    assert "MemoryError" in out and "[exit code: 1]" in out
+    out = bash.run(f"{sys.executable} -c 'while True: pass'", timeout=20)
+    assert "[cpu limit of 1s reached" in out, out
+    assert _limited_bash().run("ulimit -n") != "64"  # per tool, not process-wide
+    try:
+        _limited_bash({"gpus": 1})
+        assert False, "should raise"
+    except ValueError as e:
+        assert "gpus" in str(e)
+test("bash limits: rlimits cap files, memory and cpu", test_bash_rlimits_applied)
+
+def test_bash_usage_reported():
+    from krim import process
+    import krim.tools.bash as bash_mod
+    r = process.run(f"{sys.executable} -c 'x = bytearray(80 * 1024 * 1024); print(len(x))'", os.getcwd(), 30)
+    assert r.returncode == 0 and r.stdout.strip() == str(80 * 1024 * 1024)
+    assert r.usage.peak_rss_mb >= 80 and r.usage.cpu_seconds > 0
+    bash = _limited_bash()
+    assert bash.run("echo hi") == "hi"  # cheap commands: no usage line
+    old = bash_mod.USAGE_NOTE_CPU
+    bash_mod.USAGE_NOTE_CPU = 0.0
+    try:
+        out = bash.run("echo hi")
+        assert out.startswith("hi\n[cpu: ") and out.endswith(" MB]")
+    finally:
+        bash_mod.USAGE_NOTE_CPU = old
+    assert bash.run("printf 'a\\377b'") == "a�b"  # undecodable bytes don't fail the call
+test("bash limits: peak RSS and CPU time reported", test_bash_usage_reported)
+
+# ============================================================
+# 41. BACKGROUND JOBS
+# ============================================================
+print("\n=== BACKGROUND JOBS ===")
+
+def test_job_ring_buffer():
+    from krim.jobs import RingBuffer
+    ring = RingBuffer(size=10)
+    ring.write(b"hello")
+    data, lost, pos = ring.read_from(0)
+    assert (data, lost, pos) == (b"hello", 0, 5)
+    ring.write(b"0123456789ab")  # overflows: oldest bytes go
+    data, lost, pos = ring.read_from(pos)
+    assert data == b"23456789ab" and lost == 2 and pos == 17
+    assert ring.read_from(pos) == (b"", 0, 17)
+test("jobs: ring buffer keeps the tail and counts what was dropped", test_job_ring_buffer)
+
+def test_job_poll_and_wait():
+    import time
+    from krim.tools import create_tools, get_tool
+    tools = create_tools()
+    bash, job = get_tool(tools, "bash"), get_tool(tools, "job")
+    bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False)
+    with tempfile.TemporaryDirectory() as td:
+        bash.run(f"cd {td}")
+        t0 = time.monotonic()
+        out = bash.run("echo one; sleep 0.5; echo two >&2; sleep 0.5; pwd; exit 3", background=True)
+        assert time.monotonic() - t0 < 0.5 and out.startswith("started job j1")
+        time.sleep(0.2)
+        first = job.run(action="poll", id="j1")
+        assert first.startswith("job j1: running") and first.endswith("one")
+        out = job.run(action="wait", id="j1", timeout=10)
+        assert out.startswith("job j1: exited 3 after") and "cpu:" in out
+        assert "one" not in out and out.split("\n")[1:] == ["two", os.path.realpath(td)]  # only new output
+        assert job.run(action="poll", id="j1").endswith("(no new output)")
+        short = job.run(action="wait", id="j1", timeout=0)
+        assert "exited 3" in short
+        assert job.run(action="poll", id="j9").startswith("error: no job 'j9'")
+test("jobs: background start, incremental poll, wait", test_job_poll_and_wait)
+
+def test_job_kill_and_limits():
+    import time
+    from krim import jobs as jobs_mod
+    from krim.tools import create_tools, get_tool
+    tools = create_tools()
+    bash, job = get_tool(tools, "bash"), get_tool(tools, "job")
+    bash.configure(deny_patterns=["rm -rf /"], allow_commands=[], ask_by_default=False)
+    assert bash.run("rm -rf /", background=True).startswith("error: command denied")  # same safety rules
+    with tempfile.TemporaryDirectory() as td:
+        marker = os.path.join(td, "late")
+        bash.run(f"(sleep 1; touch {marker}) & sleep 30", background=True)
+        out = job.run(action="wait", id="j1", timeout=0)
+        assert "[still running after 0s wait]" in out
+        assert job.run(action="kill", id="j1").startswith("job j1: killed after")
+        time.sleep(1.2)
+        assert not os.path.exists(marker)
+        assert "killed" in job.run(action="list")
+    old = jobs_mod.MAX_JOBS
+    jobs_mod.MAX_JOBS = 1
+    try:
+        assert bash.run("sleep 5", background=True).startswith("started job j2")
+        assert "max 1" in bash.run("sleep 5", background=True)
+    finally:
+        jobs_mod.MAX_JOBS = old
+        bash.jobs.kill_all()
+    assert not any(j.running for j in bash.jobs.jobs.values())
+test("jobs: kill stops the whole group; running jobs are capped", test_job_kill_and_limits)
+
+# ============================================================
+# 42. TEST WORKER
+# ============================================================
+print("\n=== TEST WORKER ===")
+
+def _test_project(td):
+    with open(os.path.join(td, "mod.py"), "w") as f:
+        f.write("def add(a, b):\n    return a + b\n")
+    with open(os.path.join(td, "test_mod.py"), "w") as f:
+        f.write(
+            "import pytest\nfrom mod import add\n"
+            "def test_ok():\n    assert add(1, 2) == 3\n"
+            "def test_bad():\n    assert add(1, 2) == 4\n"
+            "@pytest.mark.skip\ndef test_skip():\n    pass\n"
+        )
+
+def test_worker_structured_and_fresh():
+    from krim.testworker import TestWorker
+    with tempfile.TemporaryDirectory() as td:
+        _test_project(td)
+        worker = TestWorker(td)
+        try:
+            run = worker.run(["-q"])
+            assert run.exit_code == 1 and run.counts == {"passed": 1, "failed": 1, "skipped": 1}
+            assert [f.nodeid for f in run.failures] == ["test_mod.py::test_bad"]
+            assert "assert 3 == 4" in run.failures[0].message and not run.warm
+            pid = worker.proc.pid
+            with open(os.path.join(td, "mod.py"), "w") as f:  # project edits reach the next fork
+                f.write("def add(a, b):\n    return 4\n")
+            run = worker.run(["-q", "test_mod.py::test_bad"])
+            assert run.exit_code == 0 and run.counts == {"passed": 1} and run.warm
+            assert worker.proc.pid == pid  # same warm process
+        finally:
+            worker.stop()
+test("testworker: structured results; project edits picked up warm", test_worker_structured_and_fresh)
+
+def test_worker_stale_restart():
+    import time
+    from krim.testworker import TestWorker
+    with tempfile.TemporaryDirectory() as td, tempfile.TemporaryDirectory() as deps:
+        _test_project(td)
+        dep = os.path.join(deps, "krim_fake_dep.py")
+        with open(dep, "w") as f:
+            f.write("VALUE = 1\n")
+        old = os.environ.get("PYTHONPATH")
+        os.environ["PYTHONPATH"] = deps
+        worker = TestWorker(td, preload=["krim_fake_dep"])
+        try:
+            worker.start()
+            assert worker.run(["-q"]).warm
+            pid = worker.proc.pid
+            time.sleep(0.01)
+            with open(dep, "w") as f:  # e.g. a pip upgrade of a preloaded package
+                f.write("VALUE = 2\n")
+            run = worker.run(["-q"])
+            assert not run.warm and worker.restarts == 1 and worker.proc.pid != pid
+            assert run.counts == {"passed": 1, "failed": 1, "skipped": 1}
+        finally:
+            worker.stop()
+            if old is None:
+                os.environ.pop("PYTHONPATH", None)
+            else:
+                os.environ["PYTHONPATH"] = old
+test("testworker: a changed preloaded module restarts the worker", test_worker_stale_restart)
+
+def test_worker_project_venv_preloaded():
+    import subprocess, sysconfig, venv
+    from krim.testworker import TestWorker
+    with tempfile.TemporaryDirectory() as td:
+        _test_project(td)
+        venv.create(os.path.join(td, ".venv"), system_site_packages=True, with_pip=False)
+        python = os.path.join(td, ".venv", "bin", "python")
+        site_dir = subprocess.run([python, "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        imports = os.path.join(td, "imports.log")
+        with open(os.path.join(site_dir, "heavydep.py"), "w") as f:
+            f.write(f"import os\nwith open({imports!r}, 'a') as f:\n    f.write(f'{{os.getpid()}}\\n')\n")
+        with open(os.path.join(td, "test_dep.py"), "w") as f:
+            f.write("import heavydep\ndef test_dep():\n    pass\n")
+        worker = TestWorker(td, python=python, preload=["heavydep"])
+        try:
+            assert worker.run(["-q", "test_dep.py"]).counts == {"passed": 1}
+            with open(imports) as f:
+                warm = f.read()
+            assert str(worker.proc.pid) in warm.split()  # imported by the warm parent...
+            for _ in range(2):
+                assert worker.run(["-q", "test_dep.py"]).counts == {"passed": 1}
+            with open(imports) as f:
+                assert f.read() == warm  # ...and never again by a forked run
+        finally:
+            worker.stop()
+test("testworker: deps in a project-local .venv stay preloaded", test_worker_project_venv_preloaded)
+
+def test_worker_tool():
+    from krim.testworker import TestWorker
+    from krim.tools import create_tools, get_tool
+    from krim.tools.test import TestTool
+    bash = get_tool(create_tools(), "bash")
+    with tempfile.TemporaryDirectory() as td:
+        _test_project(td)
+        with open(os.path.join(td, "test_slow.py"), "w") as f:
+            f.write("import time\ndef test_slow():\n    time.sleep(30)\n")
+        bash.configure(deny_patterns=["pytest --pdb"], allow_commands=["pytest"], ask_by_default=True, cwd=td)
+        worker = TestWorker(td)
+        tool = TestTool(worker, bash)
+        try:
+            out = tool.run(args="-q test_mod.py")
+            assert out.startswith("1 passed, 1 failed, 1 skipped in ") and "(worker restarted)" in out
+            assert "\n\nFAILED test_mod.py::test_bad\n" in out
+            assert tool.run(args="--pdb").startswith("error: command denied")
+            assert "[usage error]" in tool.run(args="--no-such-flag") and "pytest output:" in tool.run(args="--no-such-flag")
+            out = tool.run(args="test_slow.py", timeout=1)
+            assert out.startswith("error: tests timed out after 1s") and not worker.alive
+            assert tool.run(args="-q test_mod.py::test_ok").startswith("1 passed in ")
+        finally:
+            worker.stop()
+test("testworker: test tool formats results, obeys safety rules, kills on timeout", test_worker_tool)
+
+# ============================================================
+# 43. SYNTAX FEEDBACK
+# ============================================================
+print("\n=== SYNTAX FEEDBACK ===")
+
+def test_syntax_edit_diff_and_error():
+    from krim.tools.edit import EditTool
+    with tempfile.TemporaryDirectory() as td:
+        path = os.path.join(td, "m.py")
+        with open(path, "w") as f:
+            f.write("def f():\n    return 1\n\n\ndef g():\n    return 2\n")
+        out = EditTool().run(path=path, old="return 2", new="return 3")
+        assert out.splitlines() == [f"edited {path} (exact match)", "@@ -4,3 +4,3 @@", " ", " def g():",
+                                    "-    return 2", "+    return 3"]
+        out = EditTool().run(path=path, old="def g():", new="def g(:")
+        assert "syntax error: " in out and "at line 5\n" in out and "already present" not in out
+        assert "\n4 |\n5 | def g(:\n  |       ^\n6 |     return 3" in out
+        out = EditTool().run(path=path, old="return 1", new="return 0")  # still broken, but not by this edit
+        assert "at line 5 (already present before this change)" in out
+test("syntax: edit returns a diff and new syntax errors with context", test_syntax_edit_diff_and_error)
+
+def test_syntax_formats():
+    from krim import syntax
+    assert syntax.check("a.json", '{"a": 1,\n "b": }').startswith("syntax error: Expecting value at line 2")
+    assert syntax.check("a.json", '{"a": 1}') == ""
+    assert syntax.check("notes.txt", "{{{ not checked") == ""
+    if ".toml" in syntax.CHECKERS:
+        assert syntax.check("p.toml", "[a]\nx = 1\ny = \n").startswith("syntax error: ")
+        assert "at line 3" in syntax.check("p.toml", "[a]\nx = 1\ny = \n")
+    if ".yaml" in syntax.CHECKERS:
+        out = syntax.check("c.yml", "a: 1\nb: [1, 2\nc: 3\n")
+        assert out.startswith("syntax error: ") and " | c: 3" in out
+        assert syntax.check("c.yaml", "a: 1\n---\nb: 2\n") == ""
+test("syntax: json, toml and yaml checks; unknown formats skipped", test_syntax_formats)
+
+def test_syntax_write_and_diff_cap():
+    from krim import syntax
+    from krim.tools.write import WriteTool
+    with tempfile.TemporaryDirectory() as td:
+        path = os.path.join(td, "cfg.json")
+        assert WriteTool().run(path=path, content='{"a": 1}\n') == f"wrote {path} (1 lines)"  # new: no diff
+        out = WriteTool().run(path=path, content='{"a": 2,}\n')
+        assert '-{"a": 1}\n+{"a": 2,}' in out and "syntax error:" in out
+        assert WriteTool().run(path=path, content='{"a": 2,}\n').startswith(f"wrote {path} (1 lines) (unchanged)")
+    before = "".join(f"line {i}\n" for i in range(100))
+    after = "".join(f"LINE {i}\n" for i in range(100))
+    capped = syntax.diff("x.txt", before, after).splitlines()
+    assert len(capped) == syntax.MAX_DIFF_LINES + 1 and capped[-1] == "... (161 more diff lines)"
+test("syntax: write diffs replacements only; long diffs are capped", test_syntax_write_and_diff_cap)
+
+# ============================================================
+# 44. BATCH READ
+# ============================================================
+print("\n=== BATCH READ ===")
+
+def test_read_many_fair_shares():
+    from krim.tools.read_many import fair_shares
+    assert fair_shares([10, 100, 1000], 600) == [10, 100, 490]  # small files whole, the big one gets the rest
+    assert fair_shares([500, 500], 600) == [300, 300]
+    assert fair_shares([5, 5], 600) == [5, 5] and fair_shares([50], -10) == [0]
+test("read_many: budget shared fairly", test_read_many_fair_shares)
+
+def test_read_many_globs_ranges_errors():
+    from krim.tools.read_many import ReadManyTool
+    with tempfile.TemporaryDirectory() as td:
+        os.makedirs(os.path.join(td, "pkg", "sub"))
+        for name in ("pkg/a.py", "pkg/sub/b.py", "notes.txt"):
+            with open(os.path.join(td, name), "w") as f:
+                f.write("".join(f"{name} {i}\n" for i in range(1, 11)))
+        out = ReadManyTool().run(files=[
+            {"path": os.path.join(td, "notes.txt"), "offset": 3, "limit": 2},
+            {"path": os.path.join(td, "pkg/**/*.py")},
+            {"path": os.path.join(td, "pkg/a.py")},  # duplicate of a glob match
+            {"path": os.path.join(td, "missing.py")},
+            {"path": os.path.join(td, "*.rs")},
+        ])
+        assert out.startswith("read 3 file(s), 1 error(s)\nno match: ")
+        heads = [line[4:-4] for line in out.splitlines() if line.startswith("==> ")]
+        assert heads == [os.path.join(td, p) for p in ("notes.txt", "pkg/a.py", "pkg/sub/b.py", "missing.py")]
+        assert "   3\tnotes.txt 3\n   4\tnotes.txt 4\n... (6 more lines, 10 total)" in out
+        assert "error: " + os.path.join(td, "missing.py") + " not found" in out
+test("read_many: globs, ranges, dedupe and per-file errors", test_read_many_globs_ranges_errors)
+
+def test_read_many_glob_skips_ignored():
+    from krim.tools.read_many import ReadManyTool
+    with tempfile.TemporaryDirectory() as td:
+        for name in ("app.py", "build/gen.py", ".venv/lib/site.py", "node_modules/x/y.py"):
+            os.makedirs(os.path.dirname(os.path.join(td, name)), exist_ok=True)
+            with open(os.path.join(td, name), "w") as f:
+                f.write("x = 1\n")
+        with open(os.path.join(td, ".gitignore"), "w") as f:
+            f.write("build/\n")
+        tool = ReadManyTool()
+        tool.root = td
+        out = tool.run(files=["**/*.py"])
+        heads = [line[4:-4] for line in out.splitlines() if line.startswith("==> ")]
+        assert heads == [os.path.join(td, "app.py")], heads
+        out = tool.run(files=["build/*.py"])  # naming an ignored directory still works
+        assert out.startswith("read 1 file(s)")
+test("read_many: globs skip gitignored files, .venv and node_modules", test_read_many_glob_skips_ignored)
+
+def test_read_many_budget_cut():
+    from krim.tools.read_many import ReadManyTool
+    with tempfile.TemporaryDirectory() as td:
+        small, big = os.path.join(td, "small.txt"), os.path.join(td, "big.txt")
+        with open(small, "w") as f:
+            f.write("tiny\n")
+        with open(big, "w") as f:
+            f.write("".join(f"line {i:04d}\n" for i in range(1, 2001)))
+        out = ReadManyTool().run(files=[{"path": big}, {"path": small}], max_chars=2_000)
+        assert len(out) < 2_300 and "   1\ttiny" in out
+        assert out.splitlines()[0] == "read 2 file(s), 1 cut to fit 2,000 chars"
+        cut = next(line for line in out.splitlines() if line.startswith("... [cut"))
+        last = [line for line in out.split(cut)[0].splitlines() if "\tline " in line][-1]
+        assert cut.endswith(f"offset={int(last.split(chr(9))[0]) + 1}]")
+test("read_many: cut at a line boundary with a resume offset", test_read_many_budget_cut)
+
+# ============================================================
+# 45. GLOB + WALKER
+# ============================================================
+print("\n=== GLOB + WALKER ===")
+
+def _tree(td, files, ignores=None):
+    for rel in files:
+        full = os.path.join(td, rel)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w") as f:
+            f.write(rel)
+    for rel, text in (ignores or {}).items():
+        with open(os.path.join(td, rel), "w") as f:
+            f.write(text)
+
+def test_walk_gitignore_rules():
+    from krim.walk import walk
+    with tempfile.TemporaryDirectory() as td:
+        os.makedirs(os.path.join(td, ".git", "info"))
+        _tree(td, [
+            "main.py", "app.log", "keep.log", "build/out.o", "src/build", "src/a.py", "src/gen/x.py",
+            "src/gen/keep.py", "docs/tmp/a.md", "node_modules/p/index.js", "deep/er/secret.txt", "local.env",
+        ], {
+            ".gitignore": "# comment\n*.log\n!keep.log\nbuild/\n/docs/tmp\n**/er/secret.txt\n",
+            "src/.gitignore": "gen/*\n!gen/keep.py\n",
+            ".git/info/exclude": "local.env\n",
+        })
+        got = sorted(e.path for e in walk(td))
+        assert got == [".gitignore", "keep.log", "main.py", "src/.gitignore", "src/a.py",
+                       "src/build", "src/gen/keep.py"], got  # build/ is dir-only: the file src/build stays
+        assert sorted(e.path for e in walk(os.path.join(td, "src"))) == [".gitignore", "a.py", "build", "gen/keep.py"]
+        everything = {e.path for e in walk(td, gitignore=False, skip_noise=False)}
+        assert "node_modules/p/index.js" in everything and not any(p.startswith(".git/") for p in everything)
+        assert sorted(e.path for e in walk(td, max_depth=0)) == [".gitignore", "keep.log", "main.py"]
+test("walk: nested .gitignore, negation, dir-only, anchored, **, info/exclude", test_walk_gitignore_rules)
+
+def test_glob_tool():
+    import time
+    from krim.tools.glob import GlobTool
+    with tempfile.TemporaryDirectory() as td:
+        _tree(td, ["a.py", "pkg/b.py", "pkg/sub/c.py", "pkg/sub/d.txt", "node_modules/m.py"])
+        now = time.time()
+        for i, rel in enumerate(["pkg/sub/c.py", "a.py", "pkg/b.py"]):
+            os.utime(os.path.join(td, rel), (now - 100 + i, now - 100 + i))
+        glob = GlobTool()
+        out = glob.run(pattern="**/*.py", path=td).splitlines()
+        assert out == [f"3 file(s) matching '**/*.py' in {td} (newest first)", "pkg/b.py", "a.py", "pkg/sub/c.py"]
+        assert glob.run(pattern="*.py", path=td).splitlines()[1:] == ["a.py"]  # * does not cross directories
+        out = glob.run(pattern="pkg/**/*", path=td, sort="path", limit=2).splitlines()
+        assert out[0].endswith(f"in {os.path.join(td, 'pkg')} (by path)") and out[1:] == ["b.py", "sub/c.py",
+                                                                                          "... (1 more; narrow the pattern or raise limit)"]
+        assert "node_modules/m.py" in glob.run(pattern="**/*.py", path=td, include_ignored=True)
+        assert glob.run(pattern="**/*.rs", path=td).startswith("no files matching")
+        assert glob.run(pattern="*", path=os.path.join(td, "nope")).startswith("error: ")
+test("glob: patterns, mtime/path order, limit, literal base dir", test_glob_tool)
+
+def test_project_tree_uses_walker():
+    from krim.context import get_project_tree
+    with tempfile.TemporaryDirectory() as td:
+        _tree(td, ["a.py", "dist/bundle.js", "x/y/z/deep.py", "x/y/ok.py", ".venv/lib.py"], {".gitignore": "dist/\n"})
+        old = os.getcwd()
+        os.chdir(td)
+        try:
+            assert get_project_tree().splitlines() == [".gitignore", "a.py", "x/y/ok.py"]
+            assert get_project_tree(max_files=2).splitlines() == [".gitignore", "a.py", "... (1 more files)"]
+        finally:
+            os.chdir(old)
+test("glob: project tree honours .gitignore and depth", test_project_tree_uses_walker)
+
+# ============================================================
+# 46. COMMAND CACHE
+# ============================================================
+print("\n=== COMMAND CACHE ===")
+
+def test_cmdcache_cacheable():
+    from krim.cmdcache import CommandCache
+    from krim.config import KrimConfig
+    cache = CommandCache(KrimConfig().allow_commands)
+    for cmd in ["git diff", "git log --oneline -5", 'grep -rn "def foo(" src', "git diff | wc -l", "ls -la"]:
+        assert cache.cacheable(cmd), cmd
+    for cmd in ["ls > out.txt", "ls; rm x", "cat a && rm b", "cat $(ls)", "find . -delete", "git branch -D old",
+                "git diff --output=p.diff", "python -c 1", "pytest", "cat x | python -c 1", "ls `pwd`", "npm test",
+                "find . -fprint0 out", "find . -fprintf out %p", "find . -okdir rm {} ;", "git branch feature",
+                "git branch -f main HEAD~1", "git branch -vd old", "git branch --track=direct x origin/x"]:
+        assert not cache.cacheable(cmd), cmd
+    for cmd in ["git branch", "git branch -vv", "git branch --list 'feat*'", "git branch -a --contains HEAD",
+                "git branch --merged main", "find . -name '*.py' -print0"]:
+        assert cache.cacheable(cmd), cmd
+    trees = CommandCache(["tree"])
+    assert trees.cacheable("tree -L 2")
+    assert not trees.cacheable("tree -o tree.txt") and not trees.cacheable("tree -L 2 -otree.txt")  # writes FILE
+    assert not CommandCache(["git"]).cacheable("git push")  # allowed, but not read-only
+test("cmdcache: only read-only, allow-listed, operator-free commands", test_cmdcache_cacheable)
+
+def _cached_bash(td):
+    from krim.cmdcache import CommandCache
+    from krim.tools.bash import BashTool
+    bash = BashTool()
+    cache = CommandCache(["cat", "ls", "git status", "git add"])
+    bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False, cwd=td, cache=cache)
+    return bash, cache
+
+def test_cmdcache_hits_and_invalidation():
+    from krim.tools.edit import EditTool
+    from krim.tools.write import WriteTool
+    with tempfile.TemporaryDirectory() as td:
+        bash, cache = _cached_bash(td)
+        path = os.path.join(td, "a.txt")
+        with open(path, "w") as f:
+            f.write("one\n")
+        assert bash.run("cat a.txt") == "one"
+        with open(path, "w") as f:  # behind krim's back: not seen until something invalidates
+            f.write("two\n")
+        hit = bash.run("cat a.txt")
+        assert hit.startswith("one\n[cached result from ") and cache.hits == 1
+        EditTool().run(path=path, old="two", new="three")
+        assert bash.run("cat a.txt") == "three"
+        WriteTool().run(path=path, content="four\n")
+        assert bash.run("cat a.txt") == "four"
+        bash.run("echo five > a.txt")  # not cacheable: invalidates
+        assert bash.run("cat a.txt") == "five"
+        assert bash.run("cat missing.txt").startswith("cat: ")  # failures are cached like any output
+        cache.ttl = 0
+        assert not bash.run("cat a.txt").endswith("nothing has changed since]")
+test("cmdcache: served while unchanged; write, edit, other bash and TTL invalidate", test_cmdcache_hits_and_invalidation)
+
+def test_cmdcache_git_fingerprint():
+    import subprocess
+    from krim import cmdcache
+    with tempfile.TemporaryDirectory() as td:
+        subprocess.run(["git", "init", "-q", td], check=True)
+        bash, cache = _cached_bash(td)
+        with open(os.path.join(td, "f.txt"), "w") as f:
+            f.write("x\n")
+        first = bash.run("git status --short")
+        assert "?? f.txt" in first and bash.run("git status --short").endswith("nothing has changed since]")
+        subprocess.run(["git", "add", "f.txt"], cwd=td, check=True)  # outside krim, but the index changed
+        assert bash.run("git status --short") == "A  f.txt"
+        since = cmdcache.generation()
+        cmdcache.invalidate()  # something changed while a command ran: its result isn't stored
+        cache.put("ls", td, "stale", since)
+        assert cache.get("ls", td) is None
+test("cmdcache: git index changes and mid-run invalidations are respected", test_cmdcache_git_fingerprint)
+
+def test_cmdcache_bypassed_while_job_runs():
+    from krim.tools.job import JobTool
+    with tempfile.TemporaryDirectory() as td:
+        bash, cache = _cached_bash(td)
+        assert bash.run("ls") == "(no output)"
+        started = bash.run("sleep 0.5; echo hi > made_by_job.txt", background=True)
+        job_id = started.split()[2]
+        assert bash.run("ls") == "(no output)" and cache.hits == 0  # job running: not served...
+        assert bash.run("ls") == "(no output)" and cache.hits == 0  # ...nor stored
+        JobTool(bash).run(action="wait", id=job_id, timeout=10)
+        assert bash.run("ls") == "made_by_job.txt"
+        assert bash.run("ls").endswith("nothing has changed since]")
+test("cmdcache: bypassed while a background job runs, invalidated when it exits", test_cmdcache_bypassed_while_job_runs)
+
+# ============================================================
+# 47. WATCHER
+# ============================================================
+print("\n=== WATCHER ===")
+
+def _write(td, rel, text="x"):
+    full = os.path.join(td, rel)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w") as f:
+        f.write(text)
+
+def test_watch_inotify_index():
+    import shutil, subprocess
+    from krim.watch import FileIndex, Watcher
+    with tempfile.TemporaryDirectory() as td:
+        subprocess.run(["git", "init", "-q", td], check=True)
+        _write(td, ".gitignore", "ign/\n")
+        _write(td, "a.txt")
+        watcher = Watcher(td, "inotify")
+        assert watcher.start() == "inotify"
+        try:
+            index = FileIndex(watcher)
+            batches = []
+            watcher.subscribe(batches.append)
+            _write(td, "new/deep/f.py")  # new dirs get watched; files made before the watch still count
+            _write(td, "ign/skip.txt")
+            _write(td, ".krim/sessions/s.jsonl")
+            watcher.sync()
+            assert sorted(index.files) == [".gitignore", "a.txt", "new/deep/f.py"]
+            os.rename(os.path.join(td, "new"), os.path.join(td, "moved"))
+            os.remove(os.path.join(td, "a.txt"))
+            watcher.sync()
+            assert sorted(index.files) == [".gitignore", "moved/deep/f.py"] and index.rebuilds == 1
+            shutil.rmtree(os.path.join(td, "moved"))
+            _write(td, "moved/again.py")
+            watcher.sync()
+            assert sorted(index.files) == [".gitignore", "moved/again.py"]
+            dirty = watcher.take_dirty()
+            assert "a.txt" in dirty and not any(p.startswith((".krim", "ign/")) for p in dirty)
+            assert watcher.take_dirty() == set() and batches
+        finally:
+            watcher.stop()
+test("watch: inotify keeps the file index current, skipping ignored and .krim", test_watch_inotify_index)
+
+def test_watch_poll_and_gitignore_rebuild():
+    import time
+    from krim import watch
+    with tempfile.TemporaryDirectory() as td:
+        _write(td, "a.log")
+        _write(td, "b.py")
+        watcher = watch.Watcher(td, "poll", interval=0.05)
+        assert watcher.start() == "poll"
+        try:
+            index = watch.FileIndex(watcher)
+            seen = []
+            watcher.subscribe(seen.append)
+            _write(td, ".gitignore", "*.log\n")  # rules changed: the index is rebuilt, a.log drops out
+            deadline = time.monotonic() + 5
+            while ".gitignore" not in index.files and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert sorted(index.files) == [".gitignore", "b.py"] and index.rebuilds == 2
+            assert any(".gitignore" in batch for batch in seen if batch)
+        finally:
+            watcher.stop()
+test("watch: polling fallback; .gitignore edits rebuild the index", test_watch_poll_and_gitignore_rebuild)
+
+def test_watch_feeds_caches():
+    from krim.cmdcache import CommandCache
+    from krim.tools.bash import BashTool
+    from krim.tools.glob import GlobTool
+    from krim.watch import FileIndex, Watcher
+    with tempfile.TemporaryDirectory() as td:
+        td = os.path.realpath(td)
+        _write(td, "a.txt", "one\n")
+        watcher = Watcher(td)
+        watcher.start()
+        try:
+            cache = CommandCache(["cat"])
+            cache.watch(watcher)
+            bash = BashTool()
+            bash.configure(deny_patterns=[], allow_commands=[], ask_by_default=False, cwd=td, cache=cache)
+            assert bash.run("cat a.txt") == "one" and cache.ttl == 600
+            assert bash.run("cat a.txt").endswith("nothing has changed since]")
+            _write(td, "a.txt", "two\n")  # behind krim's back: the watcher reports it
+            assert bash.run("cat a.txt") == "two"
+            glob = GlobTool(FileIndex(watcher))
+            _write(td, "pkg/new.py")
+            assert glob.run(pattern="**/*.py", path=td).splitlines()[1:] == ["pkg/new.py"]
+            assert glob.run(pattern="*.py", path=os.path.join(td, "pkg")).splitlines()[1:] == ["new.py"]
+        finally:
+            watcher.stop()
+test("watch: command cache and glob index follow outside changes", test_watch_feeds_caches)
+
+# ============================================================
+# 48. CHECKPOINTS
+# ============================================================
+print("\n=== CHECKPOINTS ===")
+
+def _checkpointed_tools(td):
+    from pathlib import Path
+    from krim.checkpoints import CheckpointStore
+    from krim.tools.edit import EditTool
+    from krim.tools.write import WriteTool
+    store = CheckpointStore(Path(td) / ".krim" / "checkpoints")
+    write, edit = WriteTool(), EditTool()
+    write.checkpoints = edit.checkpoints = store
+    return store, write, edit
+
+def test_checkpoint_rewind():
+    with tempfile.TemporaryDirectory() as td:
+        store, write, edit = _checkpointed_tools(td)
+        a, b = os.path.join(td, "a.py"), os.path.join(td, "new", "b.py")
+        with open(a, "w") as f:
+            f.write("x = 1\n")
+        edit.run(path=a, old="x = 1", new="x = 2")           # 1
+        write.run(path=b, content="y = 1\n")                # 2 (created)
+        edit.run(path=a, old="x = 2", new="x = 3")           # 3
+        edit.run(path=b, old="y = 1", new="y = 2")           # 4
+        assert [cp.id for cp in store.entries] == [1, 2, 3, 4] and store.entries[1].before is None
+        restored = store.rewind(3)
+        assert sorted((os.path.basename(r.path), r.action) for r in restored) == [("a.py", "restored"), ("b.py", "restored")]
+        assert open(a).read() == "x = 2\n" and open(b).read() == "y = 1\n"
+        assert [cp.id for cp in store.entries] == [1, 2]
+        assert [(os.path.basename(r.path), r.action) for r in store.rewind(1)] == [("a.py", "restored"), ("b.py", "deleted")]
+        assert open(a).read() == "x = 1\n" and not os.path.exists(b)
+        assert store.rewind(1) == [] and store.entries == []
+test("checkpoints: rewind restores earlier content and deletes created files", test_checkpoint_rewind)
+
+def test_checkpoint_store_dedupe_persist():
+    import zlib
+    from pathlib import Path
+    from krim.checkpoints import CheckpointStore
+    with tempfile.TemporaryDirectory() as td:
+        store, write, _ = _checkpointed_tools(td)
+        path = os.path.join(td, "big.txt")
+        body = "same line\n" * 5000
+        for i in range(3):
+            with open(path, "w") as f:
+                f.write(body)  # same starting content each time
+            write.run(path=path, content=f"v{i}\n")
+        objects = [p for p in store.objects.rglob("*") if p.is_file()]
+        assert len(objects) == 1 and objects[0].stat().st_size < len(body) // 20
+        assert zlib.decompress(objects[0].read_bytes()).decode() == body
+        assert (Path(td) / ".krim" / "checkpoints" / ".gitignore").read_text() == "*\n"  # never committed
+        reopened = CheckpointStore(store.directory)
+        assert [cp.id for cp in reopened.entries] == [1, 2, 3]
+        with open(path, "w") as f:
+            f.write("edited by hand\n")
+        restored = reopened.rewind(3)
+        assert restored[0].changed_since and open(path).read() == body
+        assert write.run(path=path, content="again\n") and store.entries[-1].id == 4  # ids keep counting
+test("checkpoints: content-addressed, zlib, deduped, persisted", test_checkpoint_store_dedupe_persist)
+
+def test_checkpoint_prune_and_note():
+    from krim.checkpoints import CheckpointStore, format_checkpoints
+    with tempfile.TemporaryDirectory() as td:
+        store, write, _ = _checkpointed_tools(td)
+        path = os.path.join(td, "f.txt")
+        for i in range(6):
+            write.run(path=path, content=f"{i}\n")
+        small = CheckpointStore(store.directory, max_checkpoints=2)
+        assert [cp.id for cp in small.entries] == [5, 6]
+        live = {p.parent.name + p.name for p in small.objects.rglob("*") if p.is_file()}
+        assert live == {cp.before for cp in small.entries}
+        listing = format_checkpoints(small.entries)
+        assert "#5" in listing and f"write    {path}" in listing
+        assert format_checkpoints([]) == "no checkpoints"
+    from krim.agent import Agent
+    agent = Agent(None, "claude", "sys", [], max_turns=1)
+    agent.add_note("[files rewound]")
+    assert [m["role"] for m in agent.messages[-2:]] == ["user", "assistant"]
+test("checkpoints: pruning drops old objects; rewind note keeps roles alternating", test_checkpoint_prune_and_note)
+
 # ============================================================
 # SUMMARY
 # ============================================================